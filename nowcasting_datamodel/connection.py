@@ -1,29 +1,176 @@
 """Database Connection class"""
 
 import logging
+import threading
+import time
+from typing import Dict, List, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
 
 from nowcasting_datamodel.models.base import Base_Forecast
 
 logger = logging.getLogger(__name__)
 
+# how far behind the primary a replica is, in seconds. A replica that has replayed everything
+# it has received is not behind, even if there have been no writes on the primary for a while.
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class PoolMetrics:
+    """Counters of the connection pool events of an engine"""
+
+    counter_names = ["connects", "checkouts", "checkins", "invalidations", "waits", "timeouts"]
+
+    def __init__(self):
+        """Make counters that are all zero"""
+        self.counters = {name: 0 for name in self.counter_names}
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, name: str):
+        """Add one to a counter"""
+        with self.lock:
+            self.counters[name] += 1
+
+    def add_wait(self, seconds: float, timed_out: bool = False):
+        """
+        Add a checkout that had to wait for a connection, as the pool was full
+
+        :param seconds: how long the checkout waited
+        :param timed_out: Optional (default False), if the checkout timed out
+        """
+        with self.lock:
+            self.counters["waits"] += 1
+            if timed_out:
+                self.counters["timeouts"] += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self, engine: Engine) -> dict:
+        """
+        Get the counters, and the current state of the pool
+
+        :param engine: the engine the counters are for
+        :return: dictionary of the metrics
+        """
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics["wait_seconds"] = self.wait_seconds
+            metrics["max_wait_seconds"] = self.max_wait_seconds
+
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            metrics["pool_size"] = pool.size()
+            metrics["checked_in"] = pool.checkedin()
+            metrics["checked_out"] = pool.checkedout()
+            metrics["overflow"] = pool.overflow()
+
+        return metrics
+
+
+class MeteredQueuePool(QueuePool):
+    """Queue pool that times checkouts that wait for a connection, as the pool is full"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    # the number of connections that can be made when the pool is full, the sqlalchemy default
+    max_overflow: int = 10
+
+    def is_full(self) -> bool:
+        """If all the connections, including the overflow, are checked out"""
+        return (
+            (self.max_overflow > -1)
+            and (self.checkedin() == 0)
+            and (self.overflow() >= self.max_overflow)
+        )
+
+    def connect(self):
+        """Check out a connection, timing the checkout if the pool is full"""
+        if (self.metrics is None) or (not self.is_full()):
+            return super().connect()
+
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.add_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.add_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> "MeteredQueuePool":
+        """Recreate the pool, for example after 'engine.dispose()', keeping the metrics"""
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        pool.max_overflow = self.max_overflow
+        return pool
+
 
 class DatabaseConnection:
     """Database connection class"""
 
-    def __init__(self, url, base=Base_Forecast, echo: bool = True):
+    def __init__(
+        self,
+        url,
+        base=Base_Forecast,
+        echo: bool = False,
+        replica_urls: Optional[List[str]] = None,
+        max_replica_lag_seconds: float = 30,
+        replica_lag_check_seconds: float = 5,
+        pool_size: Optional[int] = None,
+        max_overflow: Optional[int] = None,
+        pool_timeout: Optional[float] = None,
+        pool_pre_ping: bool = False,
+        pool_recycle: Optional[int] = None,
+    ):
         """
         Set up database connection
 
         url: the database url, used for connecting
+        echo: Optional (default False), to log all the sql statements
+        pool_size: Optional (default None), the number of connections kept in the pool.
+            None uses the sqlalchemy default, which is 5.
+        max_overflow: Optional (default None), the number of connections that can be made
+            when the pool is full. None uses the sqlalchemy default, which is 10.
+        pool_timeout: Optional (default None), how long to wait for a connection, in seconds,
+            when the pool and the overflow are full. None uses the sqlalchemy default, which is 30.
+        pool_pre_ping: Optional (default False), to test connections when they are checked out,
+            so connections closed by the database are replaced
+        pool_recycle: Optional (default None), the number of seconds after which connections
+            are replaced. None means connections are not replaced.
+        replica_urls: Optional (default None), the urls of read replicas.
+            Sessions from 'get_session(replica=True)' are read only, and use these replicas.
+        max_replica_lag_seconds: Optional (default 30), replicas that are further behind
+            the primary than this are not used
+        replica_lag_check_seconds: Optional (default 5), how often the lag of each replica is
+            checked, so the lag is not queried every time a session is made
         """
         self.url = url
         self.base = base
 
-        self.engine = create_engine(self.url, echo=echo)
+        self.pool_kwargs = dict(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+        )
+        self.engine, self.pool_metrics = create_metered_engine(
+            self.url, echo=echo, **self.pool_kwargs
+        )
 
         self.Session = sessionmaker(bind=self.engine)
 
@@ -31,6 +178,27 @@ class DatabaseConnection:
 
         assert self.url is not None, Exception("Need to set url for database connection")
 
+        # read replicas, the sessions are read only
+        self.replica_urls = replica_urls if replica_urls is not None else []
+        self.replica_engines = []
+        self.replica_pool_metrics = []
+        for replica_url in self.replica_urls:
+            engine, pool_metrics = create_metered_engine(replica_url, echo=echo, **self.pool_kwargs)
+            self.replica_engines.append(engine.execution_options(postgresql_readonly=True))
+            self.replica_pool_metrics.append(pool_metrics)
+        self.ReplicaSessions = [sessionmaker(bind=engine) for engine in self.replica_engines]
+        self.ReadOnlySession = sessionmaker(
+            bind=self.engine.execution_options(postgresql_readonly=True)
+        )
+
+        self.max_replica_lag_seconds = max_replica_lag_seconds
+        self.replica_lag_check_seconds = replica_lag_check_seconds
+
+        # the next replica to use, and the (time checked, lag) of each replica
+        self.replica_index = 0
+        self.replica_lags = {}
+        self.replica_lock = threading.Lock()
+
     def create_all(self):
         """Create all paritions and tables"""
 
@@ -48,6 +216,158 @@ class DatabaseConnection:
 
         self.base.metadata.drop_all(self.engine)
 
-    def get_session(self) -> Session:
-        """Get sqlalamcy session"""
-        return self.Session()
+    def get_session(self, replica: bool = False) -> Session:
+        """
+        Get sqlalamcy session
+
+        :param replica: Optional (default False), to get a read only session for a replica.
+            The replicas are used in turn, and replicas that are too far behind the primary
+            are skipped. If no replica can be used, a read only session for the primary is used.
+        :return: session
+        """
+        if not replica:
+            return self.Session()
+
+        replica_index = self.get_replica_index()
+        if replica_index is None:
+            logger.debug("No replica can be used, so using the primary database for reading")
+            return self.ReadOnlySession()
+
+        return self.ReplicaSessions[replica_index]()
+
+    def get_replica_index(self) -> Optional[int]:
+        """
+        Get the next replica to use, skipping replicas that are too far behind the primary
+
+        :return: the index of the replica, or None if no replica can be used
+        """
+        n_replicas = len(self.replica_engines)
+        with self.replica_lock:
+            start_index = self.replica_index
+            self.replica_index = (self.replica_index + 1) % max(n_replicas, 1)
+
+        for i in range(n_replicas):
+            replica_index = (start_index + i) % n_replicas
+            if self.get_replica_lag(replica_index) <= self.max_replica_lag_seconds:
+                return replica_index
+
+        return None
+
+    def get_pool_metrics(self) -> Dict[str, dict]:
+        """
+        Get the connection pool metrics of the primary and the replicas
+
+        The counters are the number of connections made, checkouts, checkins and invalidations,
+        and the number of checkouts that waited, as the pool was full, with the total and maximum
+        wait time. The current pool size, and number of connections checked in and out are added.
+
+        :return: dictionary of 'primary', 'replica_0', ..., and their metrics
+        """
+        metrics = {"primary": self.pool_metrics.snapshot(self.engine)}
+        for i, engine in enumerate(self.replica_engines):
+            metrics[f"replica_{i}"] = self.replica_pool_metrics[i].snapshot(engine)
+
+        return metrics
+
+    def get_replica_lag(self, replica_index: int) -> float:
+        """
+        Get how far a replica is behind the primary, in seconds
+
+        The lag is only queried every 'replica_lag_check_seconds'.
+        If the replica can not be queried, the lag is infinite, so the replica is not used.
+
+        :param replica_index: the index of the replica
+        :return: the lag in seconds
+        """
+        now = time.monotonic()
+        checked, lag = self.replica_lags.get(replica_index, (None, None))
+        if (checked is not None) and (now - checked < self.replica_lag_check_seconds):
+            return lag
+
+        lag = get_replica_lag(self.replica_engines[replica_index])
+        if lag > self.max_replica_lag_seconds:
+            logger.warning(
+                f"Replica {replica_index} is {lag} seconds behind the primary, so it is not used"
+            )
+
+        self.replica_lags[replica_index] = (now, lag)
+        return lag
+
+
+def create_metered_engine(
+    url: str,
+    echo: bool = False,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_timeout: Optional[float] = None,
+    pool_pre_ping: bool = False,
+    pool_recycle: Optional[int] = None,
+) -> (Engine, PoolMetrics):
+    """
+    Create an engine, with counters of its connection pool events
+
+    See 'DatabaseConnection' for the parameters. Pool options that are None are not given
+    to sqlalchemy, so the defaults of the pool class are used.
+    Databases that do not use a queue pool, like in memory sqlite, do not use the pool options.
+
+    :return: the engine, and its pool metrics
+    """
+    pool_metrics = PoolMetrics()
+
+    kwargs = dict(echo=echo, pool_pre_ping=pool_pre_ping)
+    sa_url = make_url(url)
+    if sa_url.get_dialect().get_pool_class(sa_url) is QueuePool:
+        kwargs["poolclass"] = MeteredQueuePool
+        kwargs["pool_size"] = pool_size
+        kwargs["max_overflow"] = max_overflow
+        kwargs["pool_timeout"] = pool_timeout
+        kwargs["pool_recycle"] = pool_recycle
+    kwargs = {key: value for key, value in kwargs.items() if value is not None}
+
+    engine = create_engine(url, **kwargs)
+    if isinstance(engine.pool, MeteredQueuePool):
+        engine.pool.metrics = pool_metrics
+        if max_overflow is not None:
+            engine.pool.max_overflow = max_overflow
+
+    event.listen(engine, "connect", lambda *args: pool_metrics.add("connects"))
+    event.listen(engine, "checkout", lambda *args: pool_metrics.add("checkouts"))
+    event.listen(engine, "checkin", lambda *args: pool_metrics.add("checkins"))
+    event.listen(engine, "invalidate", lambda *args: pool_metrics.add("invalidations"))
+    event.listen(engine, "soft_invalidate", lambda *args: pool_metrics.add("invalidations"))
+
+    return engine, pool_metrics
+
+
+def get_replica_lag(engine: Engine) -> float:
+    """
+    Get how far a database is behind its primary, in seconds
+
+    :param engine: the engine of the replica
+    :return: the lag in seconds, this is 0 for a primary, and infinite if it can not be queried
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+
+    try:
+        with engine.connect() as connection:
+            return float(connection.execute(text(REPLICA_LAG_SQL)).scalar())
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not get the lag of replica {engine.url!r}: {e}")
+        return float("inf")
+
+
+def make_async_url(url: str) -> str:
+    """
+    Make a database url use an async driver
+
+    For example 'postgresql://...' is changed to 'postgresql+asyncpg://...'
+
+    :param url: the database url
+    :return: the database url with an async driver
+    """
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    if dialect == "postgresql":
+        return f"postgresql+asyncpg://{rest}"
+    return url
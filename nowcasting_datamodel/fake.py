@@ -20,15 +20,26 @@ from nowcasting_datamodel.models.forecast import (
     ForecastValueSQL,
 )
 from nowcasting_datamodel.models.gsp import GSPYieldSQL
-from nowcasting_datamodel.read.read import get_location
+from nowcasting_datamodel.read.read import get_location, get_locations_for_gsp_ids
 from nowcasting_datamodel.read.read_metric import get_datetime_interval
-from nowcasting_datamodel.read.read_models import get_model
+from nowcasting_datamodel.read.read_models import get_model, get_models_for_names
 from nowcasting_datamodel.save.update import change_forecast_value_to_latest
 
 # 2 days in the past + 8 hours forward at 30 mins interval
 N_FAKE_FORECASTS = (24 * 2 + 8) * 2
 TOTAL_MINUTES_IN_ONE_DAY = 24 * 60
 NATIONAL_CAPACITY = 13000
+FAKE_MODEL_VERSION = "0.1.2"
+
+
+def get_fake_capacity(gsp_id: int) -> float:
+    """Get the fake installed capacity of a gsp"""
+    if gsp_id == 0:
+        # national capacity
+        return NATIONAL_CAPACITY
+
+    # gsp capacity (roughly)
+    return 40
 
 
 def make_fake_location(gsp_id: int) -> LocationSQL:
@@ -76,21 +87,18 @@ def make_fake_forecast(
     n_fake_forecasts: Optional[int] = N_FAKE_FORECASTS,
     forecast_creation_time: Optional[datetime] = None,
     initialization_datetime_utc: Optional[datetime] = None,
+    location: Optional[LocationSQL] = None,
+    model: Optional[MLModelSQL] = None,
 ) -> ForecastSQL:
-    """Make one fake forecast"""
-
-    if gsp_id == 0:
-        # national capacity
-        installed_capacity_mw = NATIONAL_CAPACITY
-    else:
-        # gsp capacity (roughly)
-        installed_capacity_mw = 40
+    """Make one fake forecast, the location and model are got from the database if not given"""
 
-    location = get_location(
-        gsp_id=gsp_id, session=session, installed_capacity_mw=installed_capacity_mw
-    )
+    if location is None:
+        location = get_location(
+            gsp_id=gsp_id, session=session, installed_capacity_mw=get_fake_capacity(gsp_id)
+        )
 
-    model = get_model(name=model_name, session=session, version="0.1.2")
+    if model is None:
+        model = get_model(name=model_name, session=session, version=FAKE_MODEL_VERSION)
     input_data_last_updated = make_fake_input_data_last_updated()
 
     if t0_datetime_utc is None:
@@ -154,11 +162,24 @@ def generate_fake_forecasts(
     initialization_datetime_utc: Optional[datetime] = None,
 ) -> List[ForecastSQL]:
     """Generate fake forecasts"""
+
+    # get the locations and model in one go
+    locations = get_locations_for_gsp_ids(
+        session=session,
+        gsp_ids=gsp_ids,
+        installed_capacity_mw={gsp_id: get_fake_capacity(gsp_id) for gsp_id in gsp_ids},
+    )
+    model = get_models_for_names(session=session, names=[model_name], version=FAKE_MODEL_VERSION)[
+        model_name
+    ]
+
     forecasts = []
     for gsp_id in gsp_ids:
         forecasts.append(
             make_fake_forecast(
                 gsp_id=gsp_id,
+                location=locations[gsp_id],
+                model=model,
                 t0_datetime_utc=t0_datetime_utc,
                 session=session,
                 forecast_values=forecast_values,
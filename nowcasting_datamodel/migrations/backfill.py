@@ -0,0 +1,65 @@
+"""App for backfilling the horizon_minutes column of the forecast value tables
+
+The backfill can be stopped at any time, and started again, it carries on where it stopped.
+
+Usage:
+python nowcasting_datamodel/migrations/backfill.py --batch-size 10000 --sleep-seconds 0.1
+"""
+
+import logging
+import os
+
+import click
+
+from nowcasting_datamodel.connection import DatabaseConnection
+from nowcasting_datamodel.save.backfill import backfill_horizon_minutes
+
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOGLEVEL", "INFO"))
+
+
+@click.command()
+@click.option(
+    "--batch-size",
+    default=10000,
+    envvar="BATCH_SIZE",
+    help="The number of rows to update in each batch",
+    type=click.INT,
+)
+@click.option(
+    "--sleep-seconds",
+    default=0.1,
+    envvar="SLEEP_SECONDS",
+    help="How long to sleep after each batch, so the database is not too busy",
+    type=click.FLOAT,
+)
+@click.option(
+    "--max-batches",
+    default=None,
+    envvar="MAX_BATCHES",
+    help="The maximum number of batches to run, the backfill carries on from here next time",
+    type=click.INT,
+)
+def app(batch_size: int, sleep_seconds: float, max_batches: int):
+    """
+    Backfill horizon_minutes in the forecast_value and forecast_value_last_seven_days tables
+
+    :param batch_size: the number of rows to update in each batch
+    :param sleep_seconds: how long to sleep after each batch
+    :param max_batches: the maximum number of batches to run
+    """
+
+    connection = DatabaseConnection(url=os.environ["DB_URL"], echo=False)
+    with connection.get_session() as session:
+        n_rows = backfill_horizon_minutes(
+            session=session,
+            batch_size=batch_size,
+            sleep_seconds=sleep_seconds,
+            max_batches=max_batches,
+        )
+
+    logger.info(f"Backfilled horizon_minutes for {sum(n_rows.values())} rows")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,230 @@
+"""Partition gsp_yield by month on datetime_utc
+
+The old table is renamed, and a new partitioned table is made with a default partition, and
+monthly partitions for the months of the existing data and the next 12 months.
+Later partitions are made by 'update_gsp_yield_partitions' in 'nowcasting_datamodel.save.yields'.
+The gsp_yield_latest trigger is moved to the new table.
+Postgres needs the partition key in the primary key, so the primary key is now
+(id, datetime_utc), and datetime_utc can not be NULL.
+
+The data is then moved chunk by chunk, newest first, and each chunk is committed,
+so the tables are not locked for a long time. If the migration is stopped while moving the data,
+it can be run again, and it carries on where it stopped.
+Once all the data is moved, the old table is dropped.
+Rows without a datetime_utc can not be partitioned, so if there are any, the migration stops
+before dropping the old table. These rows should be fixed or deleted, and the migration run again.
+
+Revision ID: 3f8b1d6e2c95
+Revises: 7c3f2a1b9e54
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from alembic import op
+
+from nowcasting_datamodel.models.gsp import GSP_YIELD_LATEST_TRIGGER_SQL
+
+# revision identifiers, used by Alembic.
+revision = "3f8b1d6e2c95"
+down_revision = "7c3f2a1b9e54"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+table_name = "gsp_yield"
+old_table_name = "gsp_yield_old"
+columns = (
+    "id, datetime_utc, solar_generation_kw, regime, capacity_mwp, pvlive_updated_utc, "
+    "location_id, created_utc"
+)
+index_names = [
+    "ix_gsp_yield_datetime_utc",
+    "ix_gsp_yield_datetime_utc_desc",
+    "ix_gsp_yield_location_id",
+    "ix_gsp_yield_created_utc",
+]
+
+batch_size = 10000
+sleep_seconds = 0.1
+months_ahead = 12
+
+
+def create_indexes():
+    """Create the indexes on gsp_yield"""
+    op.create_index("ix_gsp_yield_datetime_utc", table_name, ["datetime_utc"], unique=False)
+    op.create_index(
+        "ix_gsp_yield_datetime_utc_desc", table_name, [sa.text("datetime_utc DESC")], unique=False
+    )
+    op.create_index("ix_gsp_yield_location_id", table_name, ["location_id"], unique=False)
+    op.create_index(
+        "ix_gsp_yield_created_utc", table_name, [sa.text("created_utc DESC")], unique=False
+    )
+
+
+def create_trigger():
+    """Create the trigger that keeps gsp_yield_latest up to date, the same as the model"""
+    op.execute(GSP_YIELD_LATEST_TRIGGER_SQL)
+
+
+def rename_old_table():
+    """Rename gsp_yield, so the index and key names are free.
+
+    The indexes are renamed, not dropped, so the data can be moved newest first.
+    The sequence is no longer owned by the old table, so it is not dropped with it.
+    """
+    op.execute(f"DROP TRIGGER IF EXISTS gsp_yield_latest_trigger ON {table_name};")
+    op.execute(f"ALTER SEQUENCE {table_name}_id_seq OWNED BY NONE;")
+    for index_name in index_names:
+        old_index_name = index_name.replace(table_name, old_table_name)
+        op.execute(f"ALTER INDEX {index_name} RENAME TO {old_index_name};")
+    op.rename_table(table_name, old_table_name)
+    op.execute(
+        f"ALTER TABLE {old_table_name} RENAME CONSTRAINT {table_name}_pkey "
+        f"TO {old_table_name}_pkey"
+    )
+
+
+def create_table(partitioned: bool):
+    """Create the gsp_yield table, the id is the same sequence as before"""
+    if partitioned:
+        primary_key = sa.PrimaryKeyConstraint("id", "datetime_utc")
+        kwargs = {"postgresql_partition_by": "RANGE(datetime_utc)"}
+    else:
+        primary_key = sa.PrimaryKeyConstraint("id")
+        kwargs = {}
+
+    op.create_table(
+        table_name,
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text(f"nextval('{table_name}_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("datetime_utc", sa.DateTime(), nullable=not partitioned),
+        sa.Column("solar_generation_kw", sa.Float(), nullable=True),
+        sa.Column("regime", sa.String(), nullable=True),
+        sa.Column("capacity_mwp", sa.Float(), nullable=True),
+        sa.Column("pvlive_updated_utc", sa.DateTime(), nullable=True),
+        sa.Column("location_id", sa.Integer(), nullable=True),
+        sa.Column("created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["location_id"],
+            ["location.id"],
+        ),
+        primary_key,
+        **kwargs,
+    )
+    op.execute(f"ALTER SEQUENCE {table_name}_id_seq OWNED BY {table_name}.id;")
+
+
+def create_partitions():
+    """Create the default partition, and the monthly partitions for the data and the next months
+
+    Later partitions are made by 'update_gsp_yield_partitions' in 'nowcasting_datamodel.save.yields'
+    """
+    op.execute(f"CREATE TABLE {table_name}_default PARTITION OF {table_name} DEFAULT;")
+
+    # the months of the data in the old table, and the next 12 months
+    months = set(
+        month.date()
+        for month in op.get_bind()
+        .execute(
+            sa.text(
+                f"SELECT DISTINCT date_trunc('month', datetime_utc) FROM {old_table_name} "
+                f"WHERE datetime_utc IS NOT NULL"
+            )
+        )
+        .scalars()
+    )
+    month = datetime.now(tz=timezone.utc).date().replace(day=1)
+    for _ in range(months_ahead + 1):
+        months.add(month)
+        month = next_month(month)
+
+    logger.info(f"Making {len(months)} monthly partitions of {table_name}")
+    for month in sorted(months):
+        op.execute(
+            f"CREATE TABLE {table_name}_{month.year}_{month.month:02d} PARTITION OF {table_name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}');"
+        )
+
+
+def next_month(month: date) -> date:
+    """Get the first day of the next month"""
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def move_data():
+    """Move the data from the old table to the partitioned table, a chunk at a time
+
+    The rows are moved using their 'ctid', and the chunks are found using the datetime_utc index.
+    Each chunk is committed, as this runs in an autocommit block.
+    """
+    query = sa.text(
+        f"WITH moved AS ("
+        f"DELETE FROM {old_table_name} WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {old_table_name} WHERE datetime_utc IS NOT NULL "
+        f"ORDER BY datetime_utc DESC LIMIT :batch_size"
+        f")) RETURNING {columns}"
+        f") INSERT INTO {table_name} ({columns}) SELECT {columns} FROM moved"
+    )
+
+    n_rows = 0
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            result = connection.execute(query, {"batch_size": batch_size})
+            n_rows += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+            logger.info(f"Moved {n_rows} rows to {table_name}")
+            time.sleep(sleep_seconds)
+
+    logger.info(f"Moved {n_rows} rows to {table_name}, all the data is moved")
+
+
+def upgrade():
+    """Upgrades the database schema to the next revision."""
+
+    # 1. make the partitioned table, unless this was done before the migration was stopped
+    if old_table_name not in sa.inspect(op.get_bind()).get_table_names():
+        rename_old_table()
+        create_table(partitioned=True)
+        create_indexes()
+        create_partitions()
+        create_trigger()
+
+    # 2. move the data, a chunk at a time
+    move_data()
+
+    # 3. drop the old table, only if all the rows were moved
+    n_rows_left = op.get_bind().execute(sa.text(f"SELECT COUNT(*) FROM {old_table_name}")).scalar()
+    if n_rows_left > 0:
+        raise ValueError(
+            f"There are {n_rows_left} rows in {old_table_name} without a datetime_utc, "
+            f"these can not be moved to {table_name}. Please fix or delete them, "
+            f"and run the migration again"
+        )
+    op.drop_table(old_table_name)
+
+
+def downgrade():
+    """Downgrades the database schema to the previous revision."""
+
+    # 1. make an unpartitioned table
+    rename_old_table()
+    create_table(partitioned=False)
+
+    # 2. copy the data, and drop the partitioned table, this drops all the partitions too
+    op.execute(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {old_table_name};")
+    op.drop_table(old_table_name)
+    create_indexes()
+    create_trigger()
@@ -0,0 +1,161 @@
+"""Partition forecast_value_last_seven_days by day on target_time
+
+The old table is renamed, a new partitioned table is made,
+and the last 7 days of data are copied over.
+Daily partitions are made from 8 days ago to 3 days ahead,
+after that 'update_forecast_value_seven_days_partitions' makes new ones and drops old ones.
+
+Revision ID: 5b1e0c7a9d42
+Revises: 3a8ad17b57a3
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+
+import pandas as pd
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "5b1e0c7a9d42"
+down_revision = "3a8ad17b57a3"
+branch_labels = None
+depends_on = None
+
+table_name = "forecast_value_last_seven_days"
+old_table_name = "forecast_value_last_seven_days_old"
+columns = (
+    "created_utc, uuid, target_time, expected_power_generation_megawatts, adjust_mw, "
+    "properties, forecast_id, horizon_minutes"
+)
+
+
+def create_indexes():
+    """Create the indexes on forecast_value_last_seven_days"""
+    op.create_index(
+        "idx_forecast_value_last_seven_days_created_utc",
+        table_name,
+        ["created_utc"],
+        unique=False,
+    )
+    op.create_index(
+        "idx_forecast_value_last_seven_days_target_time",
+        table_name,
+        ["target_time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_forecast_value_seven_days_created_utc",
+        table_name,
+        [sa.text("created_utc DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "ix_forecast_value_last_seven_days_horizon_minutes",
+        table_name,
+        ["horizon_minutes"],
+        unique=False,
+    )
+
+
+def drop_indexes(table: str):
+    """Drop the indexes on forecast_value_last_seven_days"""
+    op.drop_index("idx_forecast_value_last_seven_days_created_utc", table_name=table)
+    op.drop_index("idx_forecast_value_last_seven_days_target_time", table_name=table)
+    op.drop_index("ix_forecast_value_seven_days_created_utc", table_name=table)
+    op.drop_index("ix_forecast_value_last_seven_days_horizon_minutes", table_name=table)
+
+
+def rename_old_table():
+    """Rename forecast_value_last_seven_days, so the index and key names are free"""
+    drop_indexes(table=table_name)
+    op.rename_table(table_name, old_table_name)
+    op.execute(
+        f"ALTER TABLE {old_table_name} RENAME CONSTRAINT {table_name}_pkey "
+        f"TO {old_table_name}_pkey"
+    )
+
+
+def upgrade():
+    """Upgrades the database schema to the next revision."""
+
+    # 1. rename the old table, the index names need to be free for the new table
+    rename_old_table()
+
+    # 2. make the partitioned table
+    op.create_table(
+        table_name,
+        sa.Column("created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "uuid",
+            postgresql.UUID(),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column("target_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expected_power_generation_megawatts", sa.Float(), nullable=True),
+        sa.Column("adjust_mw", sa.Float(), nullable=True),
+        sa.Column("properties", sa.JSON(), nullable=True),
+        sa.Column("forecast_id", sa.Integer(), nullable=True),
+        sa.Column("horizon_minutes", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["forecast_id"],
+            ["forecast.id"],
+        ),
+        sa.PrimaryKeyConstraint("uuid", "target_time"),
+        postgresql_partition_by="RANGE(target_time)",
+    )
+    create_indexes()
+
+    # 3. make the default partition and daily partitions
+    op.execute(f"CREATE TABLE {table_name}_default PARTITION OF {table_name} DEFAULT;")  # noqa
+    now = pd.Timestamp.now(tz="UTC").floor("D")
+    days = pd.date_range(start=now - pd.Timedelta(days=8), end=now + pd.Timedelta(days=3))
+    for day in days:
+        partition_name = f"{table_name}_{day.strftime('%Y_%m_%d')}"
+        day_start = day.strftime("%Y-%m-%d 00:00:00+00")
+        day_end = (day + pd.Timedelta(days=1)).strftime("%Y-%m-%d 00:00:00+00")
+        op.execute(
+            f"CREATE TABLE {partition_name} PARTITION OF {table_name} FOR VALUES FROM ('{day_start}') TO ('{day_end}');"  # noqa
+        )
+
+    # 4. copy the last 7 days of data and drop the old table
+    op.execute(
+        f"INSERT INTO {table_name} ({columns}) "
+        f"SELECT {columns} FROM {old_table_name} "
+        f"WHERE target_time >= NOW() - INTERVAL '7 days';"
+    )
+    op.drop_table(old_table_name)
+
+
+def downgrade():
+    """Downgrades the database schema to the previous revision."""
+
+    # 1. make an unpartitioned table
+    rename_old_table()
+    op.create_table(
+        table_name,
+        sa.Column("created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "uuid",
+            postgresql.UUID(),
+            server_default=sa.text("gen_random_uuid()"),
+            nullable=False,
+        ),
+        sa.Column("target_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expected_power_generation_megawatts", sa.Float(), nullable=True),
+        sa.Column("adjust_mw", sa.Float(), nullable=True),
+        sa.Column("properties", sa.JSON(), nullable=True),
+        sa.Column("forecast_id", sa.Integer(), nullable=True),
+        sa.Column("horizon_minutes", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["forecast_id"],
+            ["forecast.id"],
+        ),
+        sa.PrimaryKeyConstraint("uuid", "target_time"),
+    )
+
+    # 2. copy the data, and drop the partitioned table, this drops all the partitions too
+    op.execute(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {old_table_name};")
+    op.drop_table(old_table_name)
+    create_indexes()
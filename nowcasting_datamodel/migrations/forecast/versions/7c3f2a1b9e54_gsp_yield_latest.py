@@ -0,0 +1,135 @@
+"""Add gsp_yield_latest, kept up to date by a trigger on gsp_yield
+
+The table is filled from gsp_yield, and then the trigger is made.
+When a gsp_yield row in gsp_yield_latest is deleted or updated, the trigger makes the row
+of gsp_yield_latest again from gsp_yield.
+
+Revision ID: 7c3f2a1b9e54
+Revises: 5b1e0c7a9d42
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c3f2a1b9e54"
+down_revision = "5b1e0c7a9d42"
+branch_labels = None
+depends_on = None
+
+latest_query = (
+    "SELECT DISTINCT ON (location_id, regime) id, location_id, regime, datetime_utc, "
+    "created_utc FROM gsp_yield WHERE location_id IS NOT NULL AND regime IS NOT NULL {where} "
+    "ORDER BY location_id, regime, datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST"
+)
+
+trigger_sql = """
+CREATE OR REPLACE FUNCTION update_gsp_yield_latest() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF EXISTS (
+            SELECT 1 FROM gsp_yield_latest AS latest
+            WHERE latest.location_id = OLD.location_id
+                AND latest.regime = OLD.regime
+                AND OLD.id IN (latest.gsp_yield_id, latest.capacity_gsp_yield_id)
+        ) THEN
+            DELETE FROM gsp_yield_latest
+            WHERE location_id = OLD.location_id AND regime = OLD.regime;
+
+            INSERT INTO gsp_yield_latest (location_id, regime, gsp_yield_id, datetime_utc,
+                created_utc, capacity_gsp_yield_id, capacity_datetime_utc, capacity_created_utc)
+            SELECT OLD.location_id, OLD.regime, latest.id, latest.datetime_utc,
+                latest.created_utc, capacity.id, capacity.datetime_utc, capacity.created_utc
+            FROM (
+                SELECT id, datetime_utc, created_utc FROM gsp_yield
+                WHERE location_id = OLD.location_id AND regime = OLD.regime
+                ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1
+            ) latest
+            LEFT JOIN (
+                SELECT id, datetime_utc, created_utc FROM gsp_yield
+                WHERE location_id = OLD.location_id AND regime = OLD.regime
+                    AND capacity_mwp + 1 > capacity_mwp
+                ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1
+            ) capacity ON TRUE;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' OR NEW.location_id IS NULL OR NEW.regime IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO gsp_yield_latest AS latest
+        (location_id, regime, gsp_yield_id, datetime_utc, created_utc)
+    VALUES (NEW.location_id, NEW.regime, NEW.id, NEW.datetime_utc, NEW.created_utc)
+    ON CONFLICT (location_id, regime) DO UPDATE SET
+        gsp_yield_id = EXCLUDED.gsp_yield_id,
+        datetime_utc = EXCLUDED.datetime_utc,
+        created_utc = EXCLUDED.created_utc
+    WHERE ((latest.datetime_utc, latest.created_utc)
+        > (EXCLUDED.datetime_utc, EXCLUDED.created_utc)) IS NOT TRUE;
+
+    IF NEW.capacity_mwp + 1 > NEW.capacity_mwp THEN
+        UPDATE gsp_yield_latest AS latest SET
+            capacity_gsp_yield_id = NEW.id,
+            capacity_datetime_utc = NEW.datetime_utc,
+            capacity_created_utc = NEW.created_utc
+        WHERE latest.location_id = NEW.location_id
+            AND latest.regime = NEW.regime
+            AND ((latest.capacity_datetime_utc, latest.capacity_created_utc)
+                > (NEW.datetime_utc, NEW.created_utc)) IS NOT TRUE;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER gsp_yield_latest_trigger
+AFTER INSERT OR UPDATE OR DELETE ON gsp_yield
+FOR EACH ROW EXECUTE FUNCTION update_gsp_yield_latest();
+"""
+
+
+def upgrade():
+    """Upgrades the database schema to the next revision."""
+
+    # 1. make the table
+    op.create_table(
+        "gsp_yield_latest",
+        sa.Column("location_id", sa.Integer(), nullable=False),
+        sa.Column("regime", sa.String(), nullable=False),
+        sa.Column("gsp_yield_id", sa.Integer(), nullable=True),
+        sa.Column("datetime_utc", sa.DateTime(), nullable=True),
+        sa.Column("created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("capacity_gsp_yield_id", sa.Integer(), nullable=True),
+        sa.Column("capacity_datetime_utc", sa.DateTime(), nullable=True),
+        sa.Column("capacity_created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["location_id"],
+            ["location.id"],
+        ),
+        sa.PrimaryKeyConstraint("location_id", "regime"),
+    )
+
+    # 2. fill the table, with the latest gsp yield and the latest one with a capacity
+    op.execute(
+        "INSERT INTO gsp_yield_latest (location_id, regime, gsp_yield_id, datetime_utc, "
+        "created_utc, capacity_gsp_yield_id, capacity_datetime_utc, capacity_created_utc) "
+        "SELECT latest.location_id, latest.regime, latest.id, latest.datetime_utc, "
+        "latest.created_utc, capacity.id, capacity.datetime_utc, capacity.created_utc "
+        f"FROM ({latest_query.format(where='')}) latest "
+        f"LEFT JOIN ({latest_query.format(where='AND capacity_mwp + 1 > capacity_mwp')}) "
+        "capacity ON capacity.location_id = latest.location_id "
+        "AND capacity.regime = latest.regime"
+    )
+
+    # 3. make the trigger
+    op.execute(trigger_sql)
+
+
+def downgrade():
+    """Downgrades the database schema to the previous revision."""
+    op.execute("DROP TRIGGER IF EXISTS gsp_yield_latest_trigger ON gsp_yield;")
+    op.execute("DROP FUNCTION IF EXISTS update_gsp_yield_latest();")
+    op.drop_table("gsp_yield_latest")
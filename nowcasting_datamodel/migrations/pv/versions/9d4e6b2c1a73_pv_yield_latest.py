@@ -0,0 +1,95 @@
+"""Add pv_yield_latest, kept up to date by a trigger on pv_yield
+
+The table is filled from pv_yield, and then the trigger is made.
+When a pv_yield row in pv_yield_latest is deleted or updated, the trigger makes the row
+of pv_yield_latest again from pv_yield.
+
+Revision ID: 9d4e6b2c1a73
+Revises: 5268d6f39e84
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d4e6b2c1a73"
+down_revision = "5268d6f39e84"
+branch_labels = None
+depends_on = None
+
+trigger_sql = """
+CREATE OR REPLACE FUNCTION update_pv_yield_latest() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF EXISTS (
+            SELECT 1 FROM pv_yield_latest AS latest
+            WHERE latest.pv_system_id = OLD.pv_system_id AND latest.pv_yield_id = OLD.id
+        ) THEN
+            DELETE FROM pv_yield_latest WHERE pv_system_id = OLD.pv_system_id;
+
+            INSERT INTO pv_yield_latest (pv_system_id, pv_yield_id, datetime_utc, created_utc)
+            SELECT pv_system_id, id, datetime_utc, created_utc FROM pv_yield
+            WHERE pv_system_id = OLD.pv_system_id
+            ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' OR NEW.pv_system_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO pv_yield_latest AS latest (pv_system_id, pv_yield_id, datetime_utc, created_utc)
+    VALUES (NEW.pv_system_id, NEW.id, NEW.datetime_utc, NEW.created_utc)
+    ON CONFLICT (pv_system_id) DO UPDATE SET
+        pv_yield_id = EXCLUDED.pv_yield_id,
+        datetime_utc = EXCLUDED.datetime_utc,
+        created_utc = EXCLUDED.created_utc
+    WHERE ((latest.datetime_utc, latest.created_utc)
+        > (EXCLUDED.datetime_utc, EXCLUDED.created_utc)) IS NOT TRUE;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pv_yield_latest_trigger
+AFTER INSERT OR UPDATE OR DELETE ON pv_yield
+FOR EACH ROW EXECUTE FUNCTION update_pv_yield_latest();
+"""
+
+
+def upgrade():
+    """Upgrades the database schema to the next revision."""
+
+    # 1. make the table
+    op.create_table(
+        "pv_yield_latest",
+        sa.Column("pv_system_id", sa.Integer(), nullable=False),
+        sa.Column("pv_yield_id", sa.Integer(), nullable=True),
+        sa.Column("datetime_utc", sa.DateTime(), nullable=True),
+        sa.Column("created_utc", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["pv_system_id"],
+            ["pv_system.id"],
+        ),
+        sa.PrimaryKeyConstraint("pv_system_id"),
+    )
+
+    # 2. fill the table with the latest pv yield of each pv system
+    op.execute(
+        "INSERT INTO pv_yield_latest (pv_system_id, pv_yield_id, datetime_utc, created_utc) "
+        "SELECT DISTINCT ON (pv_system_id) pv_system_id, id, datetime_utc, created_utc "
+        "FROM pv_yield WHERE pv_system_id IS NOT NULL "
+        "ORDER BY pv_system_id, datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST"
+    )
+
+    # 3. make the trigger
+    op.execute(trigger_sql)
+
+
+def downgrade():
+    """Downgrades the database schema to the previous revision."""
+    op.execute("DROP TRIGGER IF EXISTS pv_yield_latest_trigger ON pv_yield;")
+    op.execute("DROP FUNCTION IF EXISTS update_pv_yield_latest();")
+    op.drop_table("pv_yield_latest")
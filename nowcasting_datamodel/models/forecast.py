@@ -16,7 +16,6 @@ from sqlalchemy import (
     JSON,
     Boolean,
     Column,
-    DateTime,
     Float,
     ForeignKey,
     Index,
@@ -25,7 +24,7 @@ from sqlalchemy import (
     func,
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.ext.declarative import DeclarativeMeta, declared_attr
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.ddl import DDL
@@ -33,77 +32,16 @@ from sqlalchemy.sql.ddl import DDL
 from nowcasting_datamodel.models.base import Base_Forecast
 from nowcasting_datamodel.models.gsp import Location
 from nowcasting_datamodel.models.models import InputDataLastUpdated, MLModel
-from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel
+from nowcasting_datamodel.models.utils import (
+    CreatedMixin,
+    EnhancedBaseModel,
+    PartitionByMeta,
+    UTCDateTime,
+)
 from nowcasting_datamodel.utils import datetime_with_timezone
 
 logger = logging.getLogger(__name__)
 
-"""
-Tried to follow the example here
-https://stackoverflow.com/questions/61545680/postgresql-partition-and-sqlalchemy
-"""
-
-
-class PartitionByMeta(DeclarativeMeta):
-    """Partition table meta object"""
-
-    def __new__(cls, clsname, bases, attrs, *, partition_by, partition_type: str = "RANGE"):
-        """Make new partition"""
-
-        @classmethod
-        def get_partition_name(cls_, suffix):
-            """Get the name of the partition table"""
-            return f"{cls_.__tablename__}_{suffix}"
-
-        @classmethod
-        def create_partition(
-            cls_, suffix, year_month_end, subpartition_by=None, subpartition_type=None
-        ):
-            """Create new partitions"""
-            if suffix not in cls_.partitions:
-                partition = PartitionByMeta(
-                    f"{clsname}{suffix}",
-                    bases,
-                    {"__tablename__": cls_.get_partition_name(suffix)},
-                    partition_type=subpartition_type,
-                    partition_by=subpartition_by,
-                )
-
-                partition.__table__.add_is_dependent_on(cls_.__table__)
-
-                event.listen(
-                    partition.__table__,
-                    "after_create",
-                    DDL(
-                        # For non-year ranges, modify the FROM and TO below
-                        # LIST: IN ('first', 'second');
-                        # RANGE: FROM ('{key}-01-01') TO ('{key+1}-01-01')
-                        f"""
-                        ALTER TABLE {cls_.__tablename__}
-                        ATTACH PARTITION {partition.__tablename__}
-                        FOR VALUES FROM ('{suffix}-01') TO ('{year_month_end}-01');
-                        """
-                    ),
-                )
-
-                cls_.partitions[suffix] = partition
-
-            return cls_.partitions[suffix]
-
-        if partition_by is not None:
-            attrs.update(
-                {
-                    "__table_args__": attrs.get("__table_args__", ())
-                    + (dict(postgresql_partition_by=f"{partition_type.upper()}({partition_by})"),),
-                    "partitions": {},
-                    "partitioned_by": partition_by,
-                    "get_partition_name": get_partition_name,
-                    "create_partition": create_partition,
-                }
-            )
-
-        return super().__new__(cls, clsname, bases, attrs)
-
 
 def default_horizon_minutes(context):
     """Make a default horizon minutes for the ForecastValueSQLMixin"""
@@ -132,7 +70,7 @@ class ForecastValueSQLMixin(CreatedMixin):
     """
 
     uuid = Column(UUID, primary_key=True, server_default=func.gen_random_uuid())
-    target_time = Column(DateTime(timezone=True), nullable=False, primary_key=True)
+    target_time = Column(UTCDateTime(timezone=True), nullable=False, primary_key=True)
     expected_power_generation_megawatts = Column(Float)
     adjust_mw = Column(Float, default=0.0)
     # this can be used to store any additional information about the forecast, like p_levels.
@@ -247,7 +185,8 @@ def make_partitions(start_year: int, start_month: int, end_year: int):
                 "after_create",
                 DDL(
                     f"ALTER TABLE forecast_value ATTACH PARTITION forecast_value_{year}_{month} "
-                    f"for VALUES FROM ('{year}-{month}-01') TO ('{year_end}-{month_end}-01');"
+                    f"for VALUES FROM ('{year}-{month}-01 00:00:00+00') "
+                    f"TO ('{year_end}-{month_end}-01 00:00:00+00');"
                 ),
             )
 
@@ -294,7 +233,7 @@ class ForecastValueLatestSQL(Base_Forecast, CreatedMixin):
         ),
     )
 
-    target_time = Column(DateTime(timezone=True), index=True, primary_key=True)
+    target_time = Column(UTCDateTime(timezone=True), index=True, primary_key=True)
     expected_power_generation_megawatts = Column(Float(precision=6))
     gsp_id = Column(Integer, index=True, primary_key=True)
     model_id = Column(Integer, index=True, primary_key=True, default=-1)
@@ -450,7 +389,7 @@ class ForecastSQL(Base_Forecast, CreatedMixin):
     )
 
     id = Column(Integer, primary_key=True)
-    forecast_creation_time = Column(DateTime(timezone=True))
+    forecast_creation_time = Column(UTCDateTime(timezone=True))
 
     # Two distinuise between
     # 1. a Forecast with some forecast values, for that moment,
@@ -466,13 +405,17 @@ class ForecastSQL(Base_Forecast, CreatedMixin):
     location = relationship("LocationSQL", back_populates="forecast")
     location_id = Column(Integer, ForeignKey("location.id"), index=True)
 
-    # one (forecasts) to many (forecast_value)
-    forecast_values = relationship("ForecastValueSQL")
+    # one (forecasts) to many (forecast_value), these are loaded in order of target time
+    forecast_values = relationship("ForecastValueSQL", order_by="ForecastValueSQL.target_time")
     forecast_values_latest = relationship(
-        "ForecastValueLatestSQL", back_populates="forecast_latest"
+        "ForecastValueLatestSQL",
+        back_populates="forecast_latest",
+        order_by="ForecastValueLatestSQL.target_time",
     )
     forecast_values_last_seven_days = relationship(
-        "ForecastValueSevenDaysSQL", back_populates="forecast"
+        "ForecastValueSevenDaysSQL",
+        back_populates="forecast",
+        order_by="ForecastValueSevenDaysSQL.target_time",
     )
 
     # many (forecasts) to one (input_data_last_updated)
@@ -480,7 +423,7 @@ class ForecastSQL(Base_Forecast, CreatedMixin):
     input_data_last_updated_id = Column(
         Integer, ForeignKey("input_data_last_updated.id"), index=True
     )
-    initialization_datetime_utc = Column(DateTime(timezone=True), default=None, nullable=True)
+    initialization_datetime_utc = Column(UTCDateTime(timezone=True), default=None, nullable=True)
     Index("index_forecast_historic", historic)
 
 
@@ -649,11 +592,16 @@ class ManyForecasts(EnhancedBaseModel):
         self.forecasts = [forecast.adjust(limit=limit) for forecast in self.forecasts]
 
 
-class ForecastValueSevenDaysSQL(ForecastValueSQLMixin, Base_Forecast):
+class ForecastValueSevenDaysSQL(
+    ForecastValueSQLMixin, Base_Forecast, metaclass=PartitionByMeta, partition_by="target_time"
+):
     """
     One Forecast of generation at one timestamp
 
     This table will only save the last week of data.
+    The table is partitioned by day on target_time, so that old data can be removed by dropping
+    partitions, see 'update_forecast_value_seven_days_partitions'.
+    Any values that do not have a daily partition go in the default partition.
     """
 
     __tablename__ = "forecast_value_last_seven_days"
@@ -672,6 +620,8 @@ class ForecastValueSevenDaysSQL(ForecastValueSQLMixin, Base_Forecast):
     forecast = relationship("ForecastSQL", back_populates="forecast_values_last_seven_days")
 
 
+ForecastValueSevenDaysSQL.create_partition(suffix="default", default=True)
+
 Index("ix_forecast_created_utc", ForecastSQL.created_utc.desc())
 Index("ix_forecast_value_seven_days_created_utc", ForecastValueSevenDaysSQL.created_utc.desc())
 Index("ix_forecast_value_latest_created_utc", ForecastValueLatestSQL.created_utc.desc())
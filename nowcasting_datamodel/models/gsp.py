@@ -2,6 +2,7 @@
 
 2. Location objects, where the forecast is for
 8. GSP yield for storing GSP yield data
+9. GSP yield latest, for reading the latest GSP yield data quickly
 
 """
 
@@ -10,11 +11,18 @@ from datetime import datetime
 from typing import ClassVar, List, Optional
 
 from pydantic import Field, field_validator
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, Sequence, String, event
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.ddl import DDL
 
 from nowcasting_datamodel.models.base import Base_Forecast
-from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel
+from nowcasting_datamodel.models.utils import (
+    CreatedMixin,
+    EnhancedBaseModel,
+    PartitionByMeta,
+    UTCDateTime,
+)
 from nowcasting_datamodel.utils import datetime_with_timezone
 
 logger = logging.getLogger(__name__)
@@ -72,28 +80,164 @@ class Location(EnhancedBaseModel):
         )
 
 
-class GSPYieldSQL(Base_Forecast, CreatedMixin):
-    """GSP Yield data"""
+class GSPYieldSQLMixin(CreatedMixin):
+    """GSP Yield data
 
-    __tablename__ = "gsp_yield"
+    This Mixin is used to create partition tables
+    """
 
-    id = Column(Integer, primary_key=True)
-    datetime_utc = Column(DateTime, index=True)
+    id = Column(Integer, Sequence("gsp_yield_id_seq"), primary_key=True)
+    datetime_utc = Column(UTCDateTime(timezone=False), nullable=False, primary_key=True)
     solar_generation_kw = Column(Float)
     regime = Column(String, nullable=True)
     capacity_mwp = Column(Float, nullable=True)
-    pvlive_updated_utc = Column(DateTime, nullable=True)
+    pvlive_updated_utc = Column(UTCDateTime(timezone=False), nullable=True)
+
+    @declared_attr
+    def location_id(self):
+        """Link with Location table"""
+        return Column(Integer, ForeignKey("location.id"))
+
+
+class GSPYieldSQL(
+    GSPYieldSQLMixin, Base_Forecast, metaclass=PartitionByMeta, partition_by="datetime_utc"
+):
+    """GSP Yield data
+
+    The table is partitioned by month on datetime_utc, so queries on a range of datetimes only
+    look at the partitions for those months.
+    Only the default partition is made with the table, and any values that do not have a monthly
+    partition go in it. 'update_gsp_yield_partitions' in 'nowcasting_datamodel.save.yields'
+    makes the monthly partitions, and should be run on a schedule.
+
+    Postgres needs the partition key in the primary key, so the primary key is
+    (id, datetime_utc), and datetime_utc can not be NULL. GSP yields must have a datetime_utc.
+    """
+
+    __tablename__ = "gsp_yield"
+
+    __table_args__ = (
+        Index("ix_gsp_yield_datetime_utc", "datetime_utc"),
+        Index("ix_gsp_yield_location_id", "location_id"),
+    )
 
     # many (gsp_yields) to one (location)
     location = relationship("LocationSQL", back_populates="gsp_yields")
-    location_id = Column(Integer, ForeignKey("location.id"), index=True)
 
-    Index("ix_gsp_yield_datetime_utc_desc", datetime_utc.desc())
 
+GSPYieldSQL.create_partition(suffix="default", default=True)
 
+Index("ix_gsp_yield_datetime_utc_desc", GSPYieldSQL.datetime_utc.desc())
 Index("ix_gsp_yield_created_utc", GSPYieldSQL.created_utc.desc())
 
 
+class GSPYieldLatestSQL(Base_Forecast):
+    """The latest GSP yield for each location and regime
+
+    This is kept up to date by a trigger on 'gsp_yield', so the latest GSP yields can be read
+    with a primary key lookup, rather than looking through the whole 'gsp_yield' table.
+    The latest GSP yield is the one with the largest 'datetime_utc', and then 'created_utc'.
+    The 'capacity_' columns are for the latest GSP yield that has a capacity that is not NaN.
+    """
+
+    __tablename__ = "gsp_yield_latest"
+
+    location_id = Column(Integer, ForeignKey("location.id"), primary_key=True)
+    regime = Column(String, primary_key=True)
+
+    gsp_yield_id = Column(Integer, nullable=True)
+    datetime_utc = Column(UTCDateTime(timezone=False), nullable=True)
+    created_utc = Column(UTCDateTime(timezone=True), nullable=True)
+
+    capacity_gsp_yield_id = Column(Integer, nullable=True)
+    capacity_datetime_utc = Column(UTCDateTime(timezone=False), nullable=True)
+    capacity_created_utc = Column(UTCDateTime(timezone=True), nullable=True)
+
+
+# The trigger upserts the row for the location and regime, unless it already has a newer yield.
+# If the yield that is deleted or updated is in the row, the row is made again from gsp_yield.
+# Note 'capacity_mwp + 1 > capacity_mwp' is False for NaN and NULL.
+GSP_YIELD_LATEST_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION update_gsp_yield_latest() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF EXISTS (
+            SELECT 1 FROM gsp_yield_latest AS latest
+            WHERE latest.location_id = OLD.location_id
+                AND latest.regime = OLD.regime
+                AND OLD.id IN (latest.gsp_yield_id, latest.capacity_gsp_yield_id)
+        ) THEN
+            DELETE FROM gsp_yield_latest
+            WHERE location_id = OLD.location_id AND regime = OLD.regime;
+
+            INSERT INTO gsp_yield_latest (location_id, regime, gsp_yield_id, datetime_utc,
+                created_utc, capacity_gsp_yield_id, capacity_datetime_utc, capacity_created_utc)
+            SELECT OLD.location_id, OLD.regime, latest.id, latest.datetime_utc,
+                latest.created_utc, capacity.id, capacity.datetime_utc, capacity.created_utc
+            FROM (
+                SELECT id, datetime_utc, created_utc FROM gsp_yield
+                WHERE location_id = OLD.location_id AND regime = OLD.regime
+                ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1
+            ) latest
+            LEFT JOIN (
+                SELECT id, datetime_utc, created_utc FROM gsp_yield
+                WHERE location_id = OLD.location_id AND regime = OLD.regime
+                    AND capacity_mwp + 1 > capacity_mwp
+                ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1
+            ) capacity ON TRUE;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' OR NEW.location_id IS NULL OR NEW.regime IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO gsp_yield_latest AS latest
+        (location_id, regime, gsp_yield_id, datetime_utc, created_utc)
+    VALUES (NEW.location_id, NEW.regime, NEW.id, NEW.datetime_utc, NEW.created_utc)
+    ON CONFLICT (location_id, regime) DO UPDATE SET
+        gsp_yield_id = EXCLUDED.gsp_yield_id,
+        datetime_utc = EXCLUDED.datetime_utc,
+        created_utc = EXCLUDED.created_utc
+    WHERE ((latest.datetime_utc, latest.created_utc)
+        > (EXCLUDED.datetime_utc, EXCLUDED.created_utc)) IS NOT TRUE;
+
+    IF NEW.capacity_mwp + 1 > NEW.capacity_mwp THEN
+        UPDATE gsp_yield_latest AS latest SET
+            capacity_gsp_yield_id = NEW.id,
+            capacity_datetime_utc = NEW.datetime_utc,
+            capacity_created_utc = NEW.created_utc
+        WHERE latest.location_id = NEW.location_id
+            AND latest.regime = NEW.regime
+            AND ((latest.capacity_datetime_utc, latest.capacity_created_utc)
+                > (NEW.datetime_utc, NEW.created_utc)) IS NOT TRUE;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS gsp_yield_latest_trigger ON gsp_yield;
+CREATE TRIGGER gsp_yield_latest_trigger
+AFTER INSERT OR UPDATE OR DELETE ON gsp_yield
+FOR EACH ROW EXECUTE FUNCTION update_gsp_yield_latest();
+"""
+
+GSPYieldLatestSQL.__table__.add_is_dependent_on(GSPYieldSQL.__table__)
+event.listen(
+    GSPYieldLatestSQL.__table__,
+    "after_create",
+    DDL(GSP_YIELD_LATEST_TRIGGER_SQL).execute_if(dialect="postgresql"),
+)
+event.listen(
+    GSPYieldLatestSQL.__table__,
+    "after_drop",
+    DDL("DROP FUNCTION IF EXISTS update_gsp_yield_latest() CASCADE;").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
 class GSPYield(EnhancedBaseModel):
     """GSP Yield data"""
 
@@ -11,12 +11,12 @@ from datetime import datetime, time
 from typing import ClassVar, Optional
 
 from pydantic import Field, field_validator
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Time
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String, Time
 from sqlalchemy.orm import relationship
 
 from nowcasting_datamodel.models.base import Base_Forecast
 from nowcasting_datamodel.models.gsp import Location
-from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel
+from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel, UTCDateTime
 from nowcasting_datamodel.utils import datetime_with_timezone
 
 ########
@@ -78,8 +78,8 @@ class DatetimeIntervalSQL(Base_Forecast):
     )
 
     id = Column(Integer, primary_key=True)
-    start_datetime_utc = Column(DateTime, index=True)
-    end_datetime_utc = Column(DateTime, index=True)
+    start_datetime_utc = Column(UTCDateTime(timezone=False), index=True)
+    end_datetime_utc = Column(UTCDateTime(timezone=False), index=True)
     elexon_settlement_period = Column(Integer, nullable=True)
     is_primary = Column(Boolean, default=True)
 
@@ -14,11 +14,11 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import Field, field_validator
-from sqlalchemy import Column, DateTime, Index, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from nowcasting_datamodel.models.base import Base_Forecast
-from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel
+from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel, UTCDateTime
 from nowcasting_datamodel.utils import datetime_with_timezone
 
 national_gb_label = "National-GB"
@@ -74,10 +74,10 @@ class InputDataLastUpdatedSQL(Base_Forecast, CreatedMixin):
     __tablename__ = "input_data_last_updated"
 
     id = Column(Integer, primary_key=True)
-    gsp = Column(DateTime(timezone=True))
-    nwp = Column(DateTime(timezone=True))
-    pv = Column(DateTime(timezone=True))
-    satellite = Column(DateTime(timezone=True))
+    gsp = Column(UTCDateTime(timezone=True))
+    nwp = Column(UTCDateTime(timezone=True))
+    pv = Column(UTCDateTime(timezone=True))
+    satellite = Column(UTCDateTime(timezone=True))
 
     forecast = relationship("ForecastSQL", back_populates="input_data_last_updated")
 
@@ -2,6 +2,7 @@
 
 7. PV system for storing PV data (pv.py)
 8. PV yield for storing PV data (pv.py)
+9. PV yield latest, for reading the latest PV yield data quickly (pv.py)
 
 """
 
@@ -10,11 +11,12 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import Field, field_validator
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String, event
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.ddl import DDL
 
 from nowcasting_datamodel.models.base import Base_PV
-from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel
+from nowcasting_datamodel.models.utils import CreatedMixin, EnhancedBaseModel, UTCDateTime
 from nowcasting_datamodel.utils import datetime_with_timezone
 
 logger = logging.getLogger(__name__)
@@ -114,7 +116,7 @@ class PVYieldSQL(Base_PV, CreatedMixin):
     __tablename__ = "pv_yield"
 
     id = Column(Integer, primary_key=True)
-    datetime_utc = Column(DateTime, index=True)
+    datetime_utc = Column(UTCDateTime(timezone=False), index=True)
     solar_generation_kw = Column(Float)
 
     # many (forecasts) to one (location)
@@ -124,6 +126,79 @@ class PVYieldSQL(Base_PV, CreatedMixin):
     Index("ix_datetime_utc", datetime_utc.desc())
 
 
+class PVYieldLatestSQL(Base_PV):
+    """The latest PV yield for each PV system
+
+    This is kept up to date by a trigger on 'pv_yield', so the latest PV yields can be read
+    with a primary key lookup, rather than looking through the whole 'pv_yield' table.
+    The latest PV yield is the one with the largest 'datetime_utc', and then 'created_utc'.
+    """
+
+    __tablename__ = "pv_yield_latest"
+
+    pv_system_id = Column(Integer, ForeignKey("pv_system.id"), primary_key=True)
+    pv_yield_id = Column(Integer, nullable=True)
+    datetime_utc = Column(UTCDateTime(timezone=False), nullable=True)
+    created_utc = Column(UTCDateTime(timezone=True), nullable=True)
+
+
+# The trigger upserts the row for the pv system, unless it already has a newer yield.
+# If the yield that is deleted or updated is in the row, the row is made again from pv_yield.
+PV_YIELD_LATEST_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION update_pv_yield_latest() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF EXISTS (
+            SELECT 1 FROM pv_yield_latest AS latest
+            WHERE latest.pv_system_id = OLD.pv_system_id AND latest.pv_yield_id = OLD.id
+        ) THEN
+            DELETE FROM pv_yield_latest WHERE pv_system_id = OLD.pv_system_id;
+
+            INSERT INTO pv_yield_latest (pv_system_id, pv_yield_id, datetime_utc, created_utc)
+            SELECT pv_system_id, id, datetime_utc, created_utc FROM pv_yield
+            WHERE pv_system_id = OLD.pv_system_id
+            ORDER BY datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST LIMIT 1;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' OR NEW.pv_system_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO pv_yield_latest AS latest (pv_system_id, pv_yield_id, datetime_utc, created_utc)
+    VALUES (NEW.pv_system_id, NEW.id, NEW.datetime_utc, NEW.created_utc)
+    ON CONFLICT (pv_system_id) DO UPDATE SET
+        pv_yield_id = EXCLUDED.pv_yield_id,
+        datetime_utc = EXCLUDED.datetime_utc,
+        created_utc = EXCLUDED.created_utc
+    WHERE ((latest.datetime_utc, latest.created_utc)
+        > (EXCLUDED.datetime_utc, EXCLUDED.created_utc)) IS NOT TRUE;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pv_yield_latest_trigger ON pv_yield;
+CREATE TRIGGER pv_yield_latest_trigger
+AFTER INSERT OR UPDATE OR DELETE ON pv_yield
+FOR EACH ROW EXECUTE FUNCTION update_pv_yield_latest();
+"""
+
+PVYieldLatestSQL.__table__.add_is_dependent_on(PVYieldSQL.__table__)
+event.listen(
+    PVYieldLatestSQL.__table__,
+    "after_create",
+    DDL(PV_YIELD_LATEST_TRIGGER_SQL).execute_if(dialect="postgresql"),
+)
+event.listen(
+    PVYieldLatestSQL.__table__,
+    "after_drop",
+    DDL("DROP FUNCTION IF EXISTS update_pv_yield_latest() CASCADE;").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
 class PVYield(EnhancedBaseModel):
     """PV Yield data"""
 
@@ -1,9 +1,12 @@
 """General Models"""
 
-from datetime import datetime
+from datetime import datetime, timezone
 
 from pydantic import BaseModel
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, event
+from sqlalchemy.ext.declarative import DeclarativeMeta
+from sqlalchemy.sql.ddl import DDL
+from sqlalchemy.types import TypeDecorator
 
 from nowcasting_datamodel.utils import convert_to_camelcase
 
@@ -11,10 +14,54 @@ from nowcasting_datamodel.utils import convert_to_camelcase
 ########
 # 1. Reusable classes
 ########
+class UTCDateTime(TypeDecorator):
+    """DateTime column, that always gives timezone aware datetimes in UTC
+
+    Naive datetimes are assumed to be in UTC. With 'timezone=False' the database column is
+    'timestamp without time zone', and the datetimes are stored as naive UTC.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def __init__(self, timezone: bool = True):
+        """
+        Make the column type
+
+        :param timezone: Optional (default True), if the database column has a timezone
+        """
+        super().__init__(timezone=timezone)
+
+    def process_bind_param(self, value, dialect):
+        """Change datetimes to UTC, naive for columns without a timezone"""
+        if not isinstance(value, datetime):
+            return value
+
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        else:
+            value = value.astimezone(timezone.utc)
+
+        if not self.impl.timezone:
+            value = value.replace(tzinfo=None)
+
+        return value
+
+    def process_result_value(self, value, dialect):
+        """Make datetimes from the database timezone aware in UTC"""
+        if value is None:
+            return value
+
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+
+        return value.astimezone(timezone.utc)
+
+
 class CreatedMixin:
     """Mixin to add created datetime to model"""
 
-    created_utc = Column(DateTime(timezone=True), default=lambda: datetime.utcnow())
+    created_utc = Column(UTCDateTime(timezone=True), default=lambda: datetime.utcnow())
 
 
 class EnhancedBaseModel(BaseModel):
@@ -29,3 +76,96 @@ class EnhancedBaseModel(BaseModel):
         underscore_attrs_are_private = True
         from_attributes = True
         populate_by_name = True
+
+
+########
+# 2. Partitioned tables
+########
+"""
+Tried to follow the example here
+https://stackoverflow.com/questions/61545680/postgresql-partition-and-sqlalchemy
+"""
+
+
+class PartitionByMeta(DeclarativeMeta):
+    """Partition table meta object"""
+
+    def __new__(cls, clsname, bases, attrs, *, partition_by, partition_type: str = "RANGE"):
+        """Make new partition"""
+
+        @classmethod
+        def get_partition_name(cls_, suffix):
+            """Get the name of the partition table"""
+            return f"{cls_.__tablename__}_{suffix}"
+
+        @classmethod
+        def create_partition(
+            cls_,
+            suffix,
+            year_month_end=None,
+            subpartition_by=None,
+            subpartition_type=None,
+            partition_start=None,
+            partition_end=None,
+            default=False,
+        ):
+            """Create new partitions
+
+            By default the partition is for the range '{suffix}-01' to '{year_month_end}-01'.
+            'partition_start' and 'partition_end' can be used to set a different range,
+            and 'default' makes the default partition, which has all values not in other partitions.
+            """
+            if suffix not in cls_.partitions:
+                partition = PartitionByMeta(
+                    f"{clsname}{suffix}",
+                    bases,
+                    {"__tablename__": cls_.get_partition_name(suffix)},
+                    partition_type=subpartition_type,
+                    partition_by=subpartition_by,
+                )
+
+                partition.__table__.add_is_dependent_on(cls_.__table__)
+
+                if default:
+                    partition_values = "DEFAULT"
+                else:
+                    if partition_start is None:
+                        partition_start = f"{suffix}-01"
+                    if partition_end is None:
+                        partition_end = f"{year_month_end}-01"
+                    partition_values = (
+                        f"FOR VALUES FROM ('{partition_start}') TO ('{partition_end}')"
+                    )
+
+                event.listen(
+                    partition.__table__,
+                    "after_create",
+                    DDL(
+                        # For non-year ranges, modify the FROM and TO below
+                        # LIST: IN ('first', 'second');
+                        # RANGE: FROM ('{key}-01-01') TO ('{key+1}-01-01')
+                        f"""
+                        ALTER TABLE {cls_.__tablename__}
+                        ATTACH PARTITION {partition.__tablename__}
+                        {partition_values};
+                        """
+                    ),
+                )
+
+                cls_.partitions[suffix] = partition
+
+            return cls_.partitions[suffix]
+
+        if partition_by is not None:
+            attrs.update(
+                {
+                    "__table_args__": attrs.get("__table_args__", ())
+                    + (dict(postgresql_partition_by=f"{partition_type.upper()}({partition_by})"),),
+                    "partitions": {},
+                    "partitioned_by": partition_by,
+                    "get_partition_name": get_partition_name,
+                    "create_partition": create_partition,
+                }
+            )
+
+        return super().__new__(cls, clsname, bases, attrs)
@@ -0,0 +1,180 @@
+"""Read from the database, using asyncio
+
+These are coroutine versions of the main read functions in 'nowcasting_datamodel.read',
+so they can be used from asyncio services, without running them in a thread pool.
+They take the same parameters as the read functions, apart from 'session'.
+
+Each read uses its own 'AsyncSession', and so its own pooled connection,
+so independent reads can run at the same time, for example
+
+    forecasts, gsp_yields, input_data_last_updated = await asyncio.gather(
+        get_all_gsp_ids_latest_forecast(engine=engine, preload_children=True),
+        get_latest_gsp_yield(engine=engine, gsps=gsps),
+        get_latest_input_data_last_updated(engine=engine),
+    )
+
+The engine should use an async driver, for example 'postgresql+asyncpg://...',
+see 'nowcasting_datamodel.connection.make_async_url'.
+
+The session is closed once the read is done, so only attributes that have been loaded
+can be used on the results, for example use 'preload_children=True' to get the forecast values.
+"""
+
+import logging
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm.session import Session
+
+from nowcasting_datamodel.models import (
+    APIRequestSQL,
+    Forecast,
+    ForecastSQL,
+    ForecastValueLatestSQL,
+    ForecastValueSQL,
+    GSPYield,
+    GSPYieldSQL,
+    InputDataLastUpdatedSQL,
+    LocationSQL,
+    MetricValueSQL,
+    PVSystemSQL,
+    PVYieldSQL,
+    StatusSQL,
+    UserSQL,
+)
+from nowcasting_datamodel.read import read, read_gsp, read_metric, read_pv, read_user
+
+logger = logging.getLogger(__name__)
+
+
+async def run_read(engine: AsyncEngine, read_function: Callable, **kwargs):
+    """
+    Run a read function, with its own async session
+
+    :param engine: async database engine
+    :param read_function: read function, which takes a 'session' and the other kwargs
+    :param kwargs: the other parameters of the read function
+    :return: the results of the read function
+    """
+
+    logger.debug(f"Running {read_function.__name__}")
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+
+        def run(sync_session: Session):
+            return read_function(session=sync_session, **kwargs)
+
+        return await session.run_sync(run)
+
+
+async def get_latest_input_data_last_updated(
+    engine: AsyncEngine, **kwargs
+) -> InputDataLastUpdatedSQL:
+    """Get the latest input data last updated, see 'read.get_latest_input_data_last_updated'"""
+    return await run_read(engine, read.get_latest_input_data_last_updated, **kwargs)
+
+
+async def get_latest_status(engine: AsyncEngine, **kwargs) -> StatusSQL:
+    """Get the latest status, see 'read.get_latest_status'"""
+    return await run_read(engine, read.get_latest_status, **kwargs)
+
+
+async def get_latest_forecast(engine: AsyncEngine, **kwargs) -> ForecastSQL:
+    """Get the latest forecast for one gsp, see 'read.get_latest_forecast'"""
+    return await run_read(engine, read.get_latest_forecast, **kwargs)
+
+
+async def get_all_gsp_ids_latest_forecast(
+    engine: AsyncEngine, **kwargs
+) -> Union[List[ForecastSQL], List[Forecast]]:
+    """Get the latest forecasts for all gsps, see 'read.get_all_gsp_ids_latest_forecast'"""
+    return await run_read(engine, read.get_all_gsp_ids_latest_forecast, **kwargs)
+
+
+async def get_latest_forecast_for_gsps(
+    engine: AsyncEngine, **kwargs
+) -> Union[List[ForecastSQL], List[Forecast]]:
+    """Get the latest forecasts for some gsps, see 'read.get_latest_forecast_for_gsps'"""
+    return await run_read(engine, read.get_latest_forecast_for_gsps, **kwargs)
+
+
+async def get_forecast_values(
+    engine: AsyncEngine, **kwargs
+) -> Union[List[ForecastValueSQL], pd.DataFrame, Dict[str, np.ndarray]]:
+    """Get forecast values, see 'read.get_forecast_values'"""
+    return await run_read(engine, read.get_forecast_values, **kwargs)
+
+
+async def get_forecast_values_latest(engine: AsyncEngine, **kwargs) -> List[ForecastValueLatestSQL]:
+    """Get the latest forecast values, see 'read.get_forecast_values_latest'"""
+    return await run_read(engine, read.get_forecast_values_latest, **kwargs)
+
+
+async def get_latest_national_forecast(engine: AsyncEngine, **kwargs) -> ForecastSQL:
+    """Get the latest national forecast, see 'read.get_latest_national_forecast'"""
+    return await run_read(engine, read.get_latest_national_forecast, **kwargs)
+
+
+async def get_all_locations(engine: AsyncEngine, **kwargs) -> List[LocationSQL]:
+    """Get all the locations, see 'read.get_all_locations'"""
+    return await run_read(engine, read.get_all_locations, **kwargs)
+
+
+async def get_latest_gsp_yield(
+    engine: AsyncEngine, **kwargs
+) -> Union[List[GSPYieldSQL], List[LocationSQL]]:
+    """Get the latest gsp yields, see 'read_gsp.get_latest_gsp_yield'"""
+    return await run_read(engine, read_gsp.get_latest_gsp_yield, **kwargs)
+
+
+async def get_gsp_yield(engine: AsyncEngine, **kwargs) -> List[GSPYieldSQL]:
+    """Get gsp yields, see 'read_gsp.get_gsp_yield'"""
+    return await run_read(engine, read_gsp.get_gsp_yield, **kwargs)
+
+
+async def get_gsp_yield_by_location(engine: AsyncEngine, **kwargs) -> List[LocationSQL]:
+    """Get gsp yields for each location, see 'read_gsp.get_gsp_yield_by_location'"""
+    return await run_read(engine, read_gsp.get_gsp_yield_by_location, **kwargs)
+
+
+async def get_gsp_yield_sum(engine: AsyncEngine, **kwargs) -> List[GSPYield]:
+    """Get the sum of gsp yields, see 'read_gsp.get_gsp_yield_sum'"""
+    return await run_read(engine, read_gsp.get_gsp_yield_sum, **kwargs)
+
+
+async def get_pv_systems(engine: AsyncEngine, **kwargs) -> List[PVSystemSQL]:
+    """Get pv systems, see 'read_pv.get_pv_systems'"""
+    return await run_read(engine, read_pv.get_pv_systems, **kwargs)
+
+
+async def get_latest_pv_yield(
+    engine: AsyncEngine, **kwargs
+) -> Union[List[PVYieldSQL], List[PVSystemSQL]]:
+    """Get the latest pv yields, see 'read_pv.get_latest_pv_yield'"""
+    return await run_read(engine, read_pv.get_latest_pv_yield, **kwargs)
+
+
+async def get_pv_yield(engine: AsyncEngine, **kwargs) -> Union[List[PVYieldSQL], List[PVSystemSQL]]:
+    """Get pv yields, see 'read_pv.get_pv_yield'"""
+    return await run_read(engine, read_pv.get_pv_yield, **kwargs)
+
+
+async def read_latest_me_national(engine: AsyncEngine, **kwargs) -> List[MetricValueSQL]:
+    """Get the latest national ME values, see 'read_metric.read_latest_me_national'"""
+    return await run_read(engine, read_metric.read_latest_me_national, **kwargs)
+
+
+async def get_user(engine: AsyncEngine, **kwargs) -> UserSQL:
+    """Get a user, or make it if it does not exist, see 'read_user.get_user'"""
+    return await run_read(engine, read_user.get_user, **kwargs)
+
+
+async def get_all_last_api_request(engine: AsyncEngine, **kwargs) -> List[APIRequestSQL]:
+    """Get the last api request for each user, see 'read_user.get_all_last_api_request'"""
+    return await run_read(engine, read_user.get_all_last_api_request, **kwargs)
+
+
+async def get_api_requests_for_one_user(engine: AsyncEngine, **kwargs) -> List[APIRequestSQL]:
+    """Get the api requests for one user, see 'read_user.get_api_requests_for_one_user'"""
+    return await run_read(engine, read_user.get_api_requests_for_one_user, **kwargs)
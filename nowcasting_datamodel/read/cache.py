@@ -0,0 +1,177 @@
+"""Cache the results of read functions
+
+The API reads the latest forecasts many times with the same arguments,
+but the data only changes when forecasts are saved.
+A 'ResultCache' can be given to 'get_latest_forecast_for_gsps' and
+'get_all_gsp_ids_latest_forecast', and the results are then cached.
+
+The results are stored as pickled pydantic objects, not sqlalchemy objects,
+so they are not bound to a session, and each read gets its own copy.
+All caches are invalidated for a model, when forecasts for that model are saved.
+
+The caches are invalidated in the process that saves the forecasts.
+Forecasts saved by other processes, for example the forecast services writing to the
+database the API reads from, do not invalidate them, so results can be up to 'ttl_seconds' old.
+Use a smaller 'ttl_seconds' if this is too long.
+
+Other caches, for example using redis, can be made by subclassing 'ResultCache',
+and overwriting 'get', 'set' and 'invalidate'.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import structlog
+
+logger = structlog.stdlib.get_logger()
+
+# the cadence of the forecasts, the time arguments are rounded to this
+CACHE_CADENCE_MINUTES = 30
+
+# all the caches that have been made, so they can be invalidated when forecasts are saved
+_result_caches = weakref.WeakSet()
+
+
+class ResultCache:
+    """In memory cache of read results, with a time to live and least recently used eviction"""
+
+    def __init__(self, max_size: int = 128, ttl_seconds: float = 30 * 60):
+        """
+        Make a result cache
+
+        :param max_size: Optional (default 128), the maximum number of results in the cache.
+            When the cache is full, the least recently used result is removed.
+        :param ttl_seconds: Optional (default 30 minutes), how long a result is kept for.
+            This is the longest a result can be out of date, when forecasts are saved
+            by other processes.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        # key: (expires, model_name, value)
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+        _result_caches.add(self)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get a result from the cache
+
+        :param key: the cache key
+        :return: the result, or None if it is not in the cache, or it has expired
+        """
+        with self.lock:
+            if key not in self.results:
+                return None
+
+            expires, _, value = self.results[key]
+            if time.monotonic() > expires:
+                del self.results[key]
+                return None
+
+            self.results.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, model_name: Optional[str] = None):
+        """
+        Add a result to the cache
+
+        :param key: the cache key
+        :param value: the result
+        :param model_name: Optional (default None), the model name of the result,
+            so it can be invalidated when forecasts for this model are saved
+        """
+        with self.lock:
+            self.results[key] = (time.monotonic() + self.ttl_seconds, model_name, value)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+    def invalidate(self, model_name: Optional[str] = None):
+        """
+        Remove results from the cache
+
+        :param model_name: Optional (default None), only remove results for this model name,
+            and results that were not filtered on model name. If None, all results are removed.
+        """
+        with self.lock:
+            if model_name is None:
+                self.results.clear()
+                return
+
+            for key in list(self.results.keys()):
+                result_model_name = self.results[key][1]
+                if result_model_name in [None, model_name]:
+                    del self.results[key]
+
+
+def invalidate_result_caches(model_names: Optional[List[str]] = None):
+    """
+    Invalidate all the result caches, for some models
+
+    This is called when forecasts are saved.
+
+    :param model_names: Optional (default None), the model names to invalidate.
+        If None, all results are removed.
+    """
+    caches = list(_result_caches)
+    if len(caches) == 0:
+        return
+
+    logger.debug(f"Invalidating {len(caches)} result caches for {model_names=}")
+    for cache in caches:
+        if model_names is None:
+            cache.invalidate()
+        else:
+            for model_name in set(model_names):
+                cache.invalidate(model_name=model_name)
+
+
+def to_utc(value: datetime) -> datetime:
+    """Change a datetime to UTC, naive datetimes are assumed to be UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def floor_to_cadence(value: Optional[datetime]) -> Optional[datetime]:
+    """Floor a datetime to the forecast cadence, in UTC"""
+    if value is None:
+        return None
+    value = to_utc(value)
+    return value.replace(
+        minute=value.minute - value.minute % CACHE_CADENCE_MINUTES, second=0, microsecond=0
+    )
+
+
+def ceil_to_cadence(value: Optional[datetime]) -> Optional[datetime]:
+    """Ceil a datetime to the forecast cadence, in UTC"""
+    if value is None:
+        return None
+    value_floor = floor_to_cadence(value)
+    if value_floor < to_utc(value):
+        value_floor += timedelta(minutes=CACHE_CADENCE_MINUTES)
+    return value_floor
+
+
+def make_cache_key(function_name: str, **kwargs) -> str:
+    """
+    Make a cache key from the function name and its normalized arguments
+
+    :param function_name: the name of the read function
+    :param kwargs: the normalized arguments
+    :return: cache key
+    """
+    arguments = []
+    for name in sorted(kwargs.keys()):
+        value = kwargs[name]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        arguments.append(f"{name}={value}")
+
+    return f"{function_name}:" + ",".join(arguments)
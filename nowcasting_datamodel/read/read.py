@@ -5,12 +5,17 @@
 3. get all forecast values
 """
 
+import pickle
+import weakref
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Union
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Union
 
+import numpy as np
+import pandas as pd
 import structlog
-from sqlalchemy import desc, text
-from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy import Table, desc, insert, text
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
 from sqlalchemy.orm.session import Session
 
 from nowcasting_datamodel import N_GSP
@@ -22,15 +27,57 @@ from nowcasting_datamodel.models import (
     StatusSQL,
     national_gb_label,
 )
+from nowcasting_datamodel.models.base import Base_Forecast
 from nowcasting_datamodel.models.forecast import (
+    Forecast,
     ForecastSQL,
     ForecastValueLatestSQL,
     ForecastValueSevenDaysSQL,
     ForecastValueSQL,
 )
+from nowcasting_datamodel.read.cache import (
+    ResultCache,
+    ceil_to_cadence,
+    floor_to_cadence,
+    make_cache_key,
+    to_utc,
+)
+from nowcasting_datamodel.read.registry import get_registry, location_key
 
 logger = structlog.stdlib.get_logger()
 
+# the columns of 'get_forecast_values' with 'as_frame' or 'as_arrays'
+forecast_value_columns = [
+    "gsp_id",
+    "target_time",
+    "created_utc",
+    "expected_power_generation_megawatts",
+    "adjust_mw",
+    "horizon_minutes",
+]
+
+# the sqlalchemy loaders for each 'load_strategy', used to preload the children of forecasts.
+# 'subqueryload' is not used, as it drops the 'ORDER BY' of the main query,
+# so 'DISTINCT ON' would not select the latest forecasts
+load_strategies = {"joined": joinedload, "selectin": selectinload}
+
+# the longest forecast horizon of our models, forecast values made before a time have target times
+# before this time plus this horizon. This can be given as 'max_forecast_horizon'
+# to 'get_forecast_values', to bound target times for partition pruning.
+MAX_FORECAST_HORIZON = timedelta(days=7)
+
+# the databases where the 'TimeZone' is UTC, so the partition bounds are at the start of UTC months
+utc_databases = weakref.WeakKeyDictionary()
+
+# how long a check of horizon_minutes is remembered, if it found NULL values,
+# or if it was for target times that new forecast values can still be saved for
+HORIZON_MINUTES_BACKFILLED_TTL = timedelta(minutes=10)
+
+# the checks of horizon_minutes, the keys are (database url, table name, start, end),
+# where start and end are of the target times, and None means no bound. The values are
+# (if horizon_minutes is filled, when the check expires), and the check does not expire if None.
+horizon_minutes_backfilled = {}
+
 
 def get_latest_input_data_last_updated(
     session: Session,
@@ -182,70 +229,11 @@ def get_latest_forecast(
 
     forecast = forecasts[0]
 
-    # sort list
-    logger.debug(
-        f"sorting 'forecast_values_latest' values. "
-        f"There are {len(forecast.forecast_values_latest)}"
-    )
-    if forecast.forecast_values_latest is not None:
-        forecast.forecast_values_latest = sorted(
-            forecast.forecast_values_latest, key=lambda d: d.target_time
-        )
-
     logger.debug(f"Found forecasts for gsp id: {gsp_id} {historic=} {forecast=}")
 
-    for forecast_value in forecast.forecast_values:
-        forecast_value.created_utc = forecast_value.created_utc.replace(tzinfo=timezone.utc)
-
-    return forecast
-
-
-def sort_forecast_values(forecast: ForecastSQL):
-    """Sort forecast values"""
-    if forecast.historic:
-        variable = "forecast_values_latest"
-    else:
-        variable = "forecast_values"
-
-    if getattr(forecast, variable) is not None:
-        setattr(
-            forecast, variable, sorted(getattr(forecast, variable), key=lambda d: d.target_time)
-        )
-
     return forecast
 
 
-def sort_all_forecast_value(forecasts: List[ForecastSQL]):
-    """
-    Sorting all forecasts
-
-    This may be possible in the sql query, but so far have found it hard to do it.
-    Can't just add it to ORDER BY items, due to sub query.
-
-    :param forecasts:  list of forecasts
-    :return: list of forecasts, but with sorted forecat values
-    """
-
-    if len(forecasts) == 0:
-        return forecasts
-
-    if forecasts[0].historic:
-        logger.debug("Sorting 'forecast_values_latest' values")
-        logger.debug(
-            f"Will be sorting {len(forecasts[0].forecast_values_latest)} " f"forecast values latest"
-        )
-    else:
-        logger.debug("Sorting 'forecast_values' values")
-        logger.debug(f"Will be sorting {len(forecasts[0].forecast_values)} " f"forecast values")
-
-    for forecast in forecasts:
-        sort_forecast_values(forecast=forecast)
-
-    logger.debug("sorting done")
-
-    return forecasts
-
-
 def get_all_gsp_ids_latest_forecast(
     session: Session,
     start_created_utc: Optional[datetime] = None,
@@ -257,7 +245,9 @@ def get_all_gsp_ids_latest_forecast(
     include_national: bool = True,
     model_name: Optional[bool] = None,
     gsp_ids: Optional[List[int]] = None,
-) -> List[ForecastSQL]:
+    cache: Optional[ResultCache] = None,
+    load_strategy: str = "selectin",
+) -> Union[List[ForecastSQL], List[Forecast]]:
     """
     Read forecasts
 
@@ -273,6 +263,10 @@ def get_all_gsp_ids_latest_forecast(
     :param include_national: Option to include national forecast or not
     :param model_name: Optional to filter on model name
     :param gsp_ids: Optional to filter on gsp ids
+    :param cache: Optional (default None), cache of the results,
+        see 'get_latest_forecast_for_gsps'
+    :param load_strategy: Optional (default 'selectin'), how children are preloaded,
+        see 'get_latest_forecast_for_gsps'
 
     return: List of forecasts objects from database
     """
@@ -295,6 +289,8 @@ def get_all_gsp_ids_latest_forecast(
         historic=historic,
         gsp_ids=gsp_ids,
         model_name=model_name,
+        cache=cache,
+        load_strategy=load_strategy,
     )
 
 
@@ -308,7 +304,9 @@ def get_latest_forecast_for_gsps(
     historic: bool = False,
     gsp_ids: List[int] = None,
     model_name: Optional[int] = None,
-):
+    cache: Optional[ResultCache] = None,
+    load_strategy: str = "selectin",
+) -> Union[List[ForecastSQL], List[Forecast]]:
     """
     Read forecasts
 
@@ -323,10 +321,37 @@ def get_latest_forecast_for_gsps(
     :param historic: Option to load historic values or not
     :param gsp_ids: Option to filter on gsps. If None, then only the lastest forecast is loaded.
     :param model_name: Option to filter on model name
+    :param cache: Optional (default None), cache of the results.
+        If given, pydantic 'Forecast' objects are returned, rather than sqlalchemy objects,
+        and the target time filters are rounded to 30 minutes, so more calls use the same result.
+        For historic forecasts, the latest values are in 'forecast_values'.
+        The cache is invalidated when forecasts are saved.
+    :param load_strategy: Optional (default 'selectin'), how children are preloaded,
+        when 'preload_children' is True. This can be
+        - 'selectin': each child is loaded with one extra query, using the forecast ids
+        - 'joined': the children are joined in the main query
+        The location, model, input data last updated, and forecast values (or the latest
+        forecast values for historic forecasts) are loaded, so the number of queries
+        does not depend on the number of forecasts.
 
     :return: List of forecasts objects from database
 
     """
+    if cache is not None:
+        return get_latest_forecast_for_gsps_from_cache(
+            session=session,
+            cache=cache,
+            start_created_utc=start_created_utc,
+            end_created_utc=end_created_utc,
+            start_target_time=start_target_time,
+            end_target_time=end_target_time,
+            preload_children=preload_children,
+            historic=historic,
+            gsp_ids=gsp_ids,
+            model_name=model_name,
+            load_strategy=load_strategy,
+        )
+
     logger.debug(f"Getting latest forecast for gsps {gsp_ids} {historic=} {model_name=}")
 
     order_by_cols = []
@@ -369,36 +394,189 @@ def get_latest_forecast_for_gsps(
 
     query = query.join(LocationSQL)
 
-    # option to preload values, makes querying quicker
+    # option to preload values, makes querying quicker.
+    # Historic forecast values that are filtered on target time are already loaded
     if preload_children:
-        query = query.options(joinedload(ForecastSQL.location))
-        query = query.options(joinedload(ForecastSQL.model))
-        query = query.options(joinedload(ForecastSQL.input_data_last_updated))
-        if not historic:
-            query = query.options(joinedload(ForecastSQL.forecast_values))
+        query = query.options(
+            *get_preload_options(
+                historic=historic,
+                load_strategy=load_strategy,
+                load_forecast_values=not (historic and (start_target_time is not None)),
+            )
+        )
 
     order_by_cols.append(desc(ForecastSQL.created_utc))
+
+    # historic forecast values that are filtered on target time are loaded in the main query,
+    # so they are ordered there, for each forecast
+    if historic and (start_target_time is not None):
+        order_by_cols.append(ForecastSQL.id)
+        order_by_cols.append(ForecastValueLatestSQL.target_time)
+
     query = query.order_by(*order_by_cols)
 
     forecasts = query.all()
 
     logger.debug(f"Found {len(forecasts)} forecasts")
 
-    forecasts = sort_all_forecast_value(forecasts)
+    return forecasts
 
-    # add utc timezone
-    for forecast in forecasts:
-        forecast.created_utc = forecast.created_utc.replace(tzinfo=timezone.utc)
-        if forecast.historic:
-            for forecast_value in forecast.forecast_values_latest:
-                forecast_value.created_utc = forecast_value.created_utc.replace(tzinfo=timezone.utc)
+
+def get_preload_options(
+    historic: bool, load_strategy: str = "selectin", load_forecast_values: bool = True
+) -> list:
+    """
+    Get the loader options to preload the children of forecasts
+
+    :param historic: if the forecasts are historic, then the latest forecast values are loaded
+    :param load_strategy: Optional (default 'selectin'), either 'joined' or 'selectin'
+    :param load_forecast_values: Optional (default True), to load the forecast values
+    :return: list of sqlalchemy loader options
+    """
+    if load_strategy not in load_strategies:
+        raise ValueError(f"{load_strategy=} should be one of {list(load_strategies.keys())}")
+
+    loader = load_strategies[load_strategy]
+    options = [
+        loader(ForecastSQL.location),
+        loader(ForecastSQL.model),
+        loader(ForecastSQL.input_data_last_updated),
+    ]
+
+    if load_forecast_values:
+        if historic:
+            options.append(loader(ForecastSQL.forecast_values_latest))
         else:
-            for forecast_value in forecast.forecast_values:
-                forecast_value.created_utc = forecast_value.created_utc.replace(tzinfo=timezone.utc)
+            options.append(loader(ForecastSQL.forecast_values))
+
+    return options
+
+
+def get_latest_forecast_for_gsps_from_cache(
+    session: Session,
+    cache: ResultCache,
+    start_created_utc: Optional[datetime] = None,
+    end_created_utc: Optional[datetime] = None,
+    start_target_time: Optional[datetime] = None,
+    end_target_time: Optional[datetime] = None,
+    preload_children: Optional[bool] = False,
+    historic: bool = False,
+    gsp_ids: List[int] = None,
+    model_name: Optional[int] = None,
+    load_strategy: str = "selectin",
+) -> List[Forecast]:
+    """
+    Read forecasts, using a cache
+
+    1. Round the target time filters out to 30 minutes, and make the cache key
+    2. If the result is in the cache, use a copy of it
+    3. Otherwise read the forecasts for the rounded target times, change them to pydantic objects,
+       and add them to the cache
+    4. Filter the historic forecast values back to the exact target times
+
+    The created utc filters are not rounded, so forecasts made after 'end_created_utc'
+    are never returned. The target time filters are rounded out, so the cached result has
+    all the values that are needed, and for historic forecasts, the values are then filtered
+    back to the exact target times. Forecasts that are not historic have all their values,
+    the same as when no cache is used.
+
+    See 'get_latest_forecast_for_gsps' for the parameters.
+
+    :return: List of pydantic forecast objects
+    """
+
+    # 1. round the target times
+    kwargs = dict(
+        start_created_utc=start_created_utc,
+        end_created_utc=end_created_utc,
+        start_target_time=floor_to_cadence(start_target_time),
+        end_target_time=ceil_to_cadence(end_target_time),
+        historic=historic,
+        gsp_ids=None if gsp_ids is None else sorted(set(gsp_ids)),
+        model_name=model_name,
+    )
+    # the created utc filters are in the key exactly, but changed to UTC
+    key_kwargs = dict(kwargs)
+    for name in ["start_created_utc", "end_created_utc"]:
+        if key_kwargs[name] is not None:
+            key_kwargs[name] = to_utc(key_kwargs[name])
+    key = make_cache_key("get_latest_forecast_for_gsps", **key_kwargs)
+
+    # 2. get from cache
+    result = cache.get(key)
+    if result is not None:
+        logger.debug(f"Found {key} in the cache")
+    else:
+        # 3. read forecasts, and add to the cache
+        forecasts = get_latest_forecast_for_gsps(
+            session=session,
+            preload_children=preload_children,
+            load_strategy=load_strategy,
+            **kwargs,
+        )
+        if historic:
+            forecasts = [
+                Forecast.model_validate_latest(forecast, from_attributes=True)
+                for forecast in forecasts
+            ]
+        else:
+            forecasts = [
+                Forecast.model_validate(forecast, from_attributes=True) for forecast in forecasts
+            ]
+
+        result = pickle.dumps(forecasts)
+        cache.set(key, result, model_name=model_name)
+
+    # return a copy, so changes are not made to the cached forecasts
+    forecasts = pickle.loads(result)
+
+    # 4. filter the historic values on the exact target times,
+    # in the same way as 'filter_query_on_target_time'
+    if historic and (start_target_time is not None):
+        forecasts = filter_forecasts_on_target_time(
+            forecasts=forecasts,
+            start_target_time=start_target_time,
+            end_target_time=end_target_time,
+        )
 
     return forecasts
 
 
+def filter_forecasts_on_target_time(
+    forecasts: List[Forecast],
+    start_target_time: datetime,
+    end_target_time: Optional[datetime] = None,
+) -> List[Forecast]:
+    """
+    Filter the values of pydantic forecasts on target time
+
+    Forecasts with no values left are removed.
+
+    :param forecasts: list of pydantic forecasts
+    :param start_target_time: target times only included from this datetime
+    :param end_target_time: Optional (default None), target times only included up to this datetime
+    :return: list of pydantic forecasts
+    """
+    start_target_time = to_utc(start_target_time)
+    if end_target_time is not None:
+        end_target_time = to_utc(end_target_time)
+
+    filtered_forecasts = []
+    for forecast in forecasts:
+        forecast.forecast_values = [
+            forecast_value
+            for forecast_value in forecast.forecast_values
+            if (to_utc(forecast_value.target_time) >= start_target_time)
+            and (
+                (end_target_time is None) or (to_utc(forecast_value.target_time) <= end_target_time)
+            )
+        ]
+        if len(forecast.forecast_values) > 0:
+            filtered_forecasts.append(forecast)
+
+    return filtered_forecasts
+
+
 def filter_query_on_target_time(
     query,
     historic: bool,
@@ -435,8 +613,6 @@ def filter_query_on_target_time(
         if historic:
             query = query.options(contains_eager(join_object)).populate_existing()
 
-        query.order_by(join_object)
-
     return query
 
 
@@ -451,7 +627,10 @@ def get_forecast_values(
     model: Optional[Union[ForecastValueSQL, ForecastValueSevenDaysSQL]] = ForecastValueSQL,
     model_name: Optional[str] = None,
     created_utc_limit: Optional[datetime] = None,
-) -> List[ForecastValueSQL]:
+    as_frame: bool = False,
+    as_arrays: bool = False,
+    max_forecast_horizon: Optional[timedelta] = None,
+) -> Union[List[ForecastValueSQL], pd.DataFrame, Dict[str, np.ndarray]]:
     """
     Get forecast values
 
@@ -473,16 +652,164 @@ def get_forecast_values(
     :param model_name: Optional to filter on model name
     :param created_utc_limit: Optional to filter on created_utc.
         We only get forecast that are made before this time
+    :param as_frame: Optional (default False), to return a pandas DataFrame,
+        with the columns in 'forecast_value_columns', rather than sqlalchemy objects.
+        This is much quicker and uses much less memory for large queries.
+    :param as_arrays: Optional (default False), to return a dictionary of numpy arrays,
+        with the columns in 'forecast_value_columns'.
+        The datetimes are 'datetime64[ns]' in UTC.
+    :param max_forecast_horizon: Optional (default None), the longest forecast horizon.
+        If given, target times are only read up to 'created_utc_limit' (or now) plus this,
+        so postgres only scans the partitions needed, even when 'end_datetime' is not given.
+        Forecast values with longer horizons are not returned, for example use
+        'MAX_FORECAST_HORIZON' for our models.
 
     return: List of forecasts values objects from database
 
     """
 
+    columnar = as_frame or as_arrays
+    query = make_forecast_values_query(
+        session=session,
+        gsp_id=gsp_id,
+        gsp_ids=gsp_ids,
+        start_datetime=start_datetime,
+        end_datetime=end_datetime,
+        forecast_horizon_minutes=forecast_horizon_minutes,
+        only_return_latest=only_return_latest,
+        model=model,
+        model_name=model_name,
+        created_utc_limit=created_utc_limit,
+        columnar=columnar,
+        max_forecast_horizon=max_forecast_horizon,
+    )
+
+    if columnar:
+        return get_forecast_values_columns(
+            session=session, query=query, model=get_query_model(query), as_frame=as_frame
+        )
+
+    # get all results
+    forecasts = query.all()
+
+    return forecasts
+
+
+def iter_forecast_values(
+    session: Session,
+    gsp_ids: Optional[List[int]] = None,
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+    forecast_horizon_minutes: Optional[int] = None,
+    only_return_latest: Optional[bool] = False,
+    model: Optional[Union[ForecastValueSQL, ForecastValueSevenDaysSQL]] = ForecastValueSQL,
+    model_name: Optional[str] = None,
+    created_utc_limit: Optional[datetime] = None,
+    batch_size: int = 10000,
+    as_frame: bool = False,
+    max_forecast_horizon: Optional[timedelta] = None,
+) -> Iterator[Union[List[ForecastValueSQL], pd.DataFrame]]:
+    """
+    Get forecast values in batches, using a server side cursor
+
+    This is the same as 'get_forecast_values', but the rows are streamed from the database,
+    so only one batch is held in memory at a time. This is useful for reading months of data.
+    Note the session should not be committed, until all the batches have been read.
+
+    :param session: database session
+    :param gsp_ids: optional to provide multiple gsp id, to filter query on
+    :param start_datetime: optional to filterer target_time by start_datetime
+    :param end_datetime: optional to filterer target_time by end_datetime
+    :param forecast_horizon_minutes: Optional filter on forecast horizon
+    :param only_return_latest: Optional to only return the latest forecast, not all of them.
+    :param model: Can be 'ForecastValueSQL' or 'ForecastValueSevenDaysSQL'
+    :param model_name: Optional to filter on model name
+    :param created_utc_limit: Optional to filter on created_utc.
+    :param batch_size: Optional (default 10000), the number of forecast values in each batch
+    :param as_frame: Optional (default False), to yield pandas DataFrames,
+        with the columns in 'forecast_value_columns', rather than lists of sqlalchemy objects
+    :param max_forecast_horizon: Optional (default None), the longest forecast horizon,
+        see 'get_forecast_values'
+    :return: iterator of batches of forecast values
+    """
+
+    query = make_forecast_values_query(
+        session=session,
+        gsp_ids=gsp_ids,
+        start_datetime=start_datetime,
+        end_datetime=end_datetime,
+        forecast_horizon_minutes=forecast_horizon_minutes,
+        only_return_latest=only_return_latest,
+        model=model,
+        model_name=model_name,
+        created_utc_limit=created_utc_limit,
+        columnar=as_frame,
+        max_forecast_horizon=max_forecast_horizon,
+    )
+
+    if as_frame:
+        query = query.with_entities(*get_forecast_values_column_entities(get_query_model(query)))
+        result = session.execute(query.statement, execution_options={"yield_per": batch_size})
+        for rows in result.partitions():
+            yield make_forecast_values_frame(rows)
+        return
+
+    forecast_values = iter(query.yield_per(batch_size))
+    while batch := list(islice(forecast_values, batch_size)):
+        yield batch
+
+
+def make_forecast_values_query(
+    session: Session,
+    gsp_id: Optional[int] = None,
+    gsp_ids: Optional[List[int]] = None,
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+    forecast_horizon_minutes: Optional[int] = None,
+    only_return_latest: Optional[bool] = False,
+    model: Optional[Union[ForecastValueSQL, ForecastValueSevenDaysSQL]] = ForecastValueSQL,
+    model_name: Optional[str] = None,
+    created_utc_limit: Optional[datetime] = None,
+    columnar: bool = False,
+    max_forecast_horizon: Optional[timedelta] = None,
+):
+    """
+    Make the query for forecast values, see 'get_forecast_values' for the parameters
+
+    :param columnar: Optional (default False), if the query is used to read columns,
+        then location is always joined, and the forecast and location are not loaded
+    :return: sqlalchemy query
+    """
+
     # start main query
     assert model.__tablename__ in [
         ForecastValueSevenDaysSQL.__tablename__,
         ForecastValueSQL.__tablename__,
     ]
+
+    # bound the target times using all the filters, so only the partitions needed are scanned
+    target_time_start, target_time_end = get_target_time_bounds(
+        start_datetime=start_datetime,
+        end_datetime=end_datetime,
+        created_utc_limit=created_utc_limit,
+        max_forecast_horizon=max_forecast_horizon,
+    )
+
+    use_horizon_minutes = (forecast_horizon_minutes is not None) and is_horizon_minutes_backfilled(
+        session=session,
+        model=model,
+        start_datetime=target_time_start,
+        end_datetime=target_time_end,
+    )
+
+    # read one month straight from its partition, the objects are still 'ForecastValueSQL'
+    partition = get_forecast_value_partition(
+        session=session, model=model, start_datetime=target_time_start, end_datetime=target_time_end
+    )
+    if partition is not None:
+        logger.debug(f"Reading forecast values from {partition.name}")
+        model = aliased(ForecastValueSQL, partition, adapt_on_names=True)
+
     query = session.query(model)
 
     # make distinct and order by columns
@@ -512,15 +839,18 @@ def get_forecast_values(
         query = query.filter(model.created_utc >= created_utc_filter)
         query = query.filter(ForecastSQL.created_utc >= created_utc_filter)
 
-    if end_datetime is not None:
-        query = query.filter(model.target_time <= end_datetime)
+    if target_time_end is not None:
+        query = query.filter(model.target_time <= target_time_end)
 
     if created_utc_limit is not None:
         query = query.filter(model.created_utc <= created_utc_limit)
 
     if forecast_horizon_minutes is not None:
-        # Once horizon_minutes has been filled and is not Null, we can use
-        # query = query.filter(model.horizon_minutes >= forecast_horizon_minutes)
+        if use_horizon_minutes:
+            # use the indexed column, when it has been filled for all the target times.
+            # horizon_minutes is rounded to the minute, so this finds a few more rows, and the
+            # interval filter below removes them, so the same rows are read as without the index
+            query = query.filter(model.horizon_minutes >= forecast_horizon_minutes)
 
         query = query.filter(
             model.target_time - model.created_utc
@@ -533,9 +863,13 @@ def get_forecast_values(
             <= text(f"interval '{forecast_horizon_minutes} minute'")
         )
 
-    if (gsp_id is not None) or (gsp_ids is not None) or (model_name is not None):
+    if (gsp_id is not None) or (gsp_ids is not None) or (model_name is not None) or columnar:
         query = query.join(ForecastSQL)
 
+    # the gsp_id is one of the columns, so location is always needed
+    if columnar and (gsp_id is None) and (gsp_ids is None):
+        query = query.join(LocationSQL)
+
     # filter on gsp_id
     if gsp_id is not None:
         logger.warning('We should now use "gsp_ids" not "gsp_id"')
@@ -548,9 +882,10 @@ def get_forecast_values(
         query = query.filter(LocationSQL.gsp_id.in_(gsp_ids))
 
         # prevent n+1 queries on forecasts after initial query
-        query = query.options(
-            contains_eager(model.forecast, ForecastSQL.location)
-        ).populate_existing()
+        if not columnar:
+            query = query.options(
+                contains_eager(model.forecast, ForecastSQL.location)
+            ).populate_existing()
 
     if model_name is not None:
         query = query.join(MLModelSQL)
@@ -559,14 +894,284 @@ def get_forecast_values(
     # order by target time and created time desc
     query = query.order_by(*order_by_columns)
 
-    # get all results
-    forecasts = query.all()
+    return query
 
-    # add utc timezone
-    for forecast in forecasts:
-        forecast.created_utc = forecast.created_utc.replace(tzinfo=timezone.utc)
 
-    return forecasts
+def get_target_time_bounds(
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+    created_utc_limit: Optional[datetime] = None,
+    max_forecast_horizon: Optional[timedelta] = None,
+) -> (Optional[datetime], Optional[datetime]):
+    """
+    Get the target time bounds of a forecast value query, from all its filters
+
+    The forecast value tables are partitioned by target time, so postgres can only skip partitions
+    using filters on target time. If 'max_forecast_horizon' is given, forecast values are made
+    before 'created_utc_limit', or now, so their target times are before this plus the horizon.
+
+    :param start_datetime: Optional (default None), the start of the target times
+    :param end_datetime: Optional (default None), the end of the target times
+    :param created_utc_limit: Optional (default None), the latest created time
+    :param max_forecast_horizon: Optional (default None), the longest forecast horizon.
+        If None, the end is only from 'end_datetime'.
+    :return: the start and end of the target times, both can be None
+    """
+
+    target_time_end = None if end_datetime is None else to_utc(end_datetime)
+    if max_forecast_horizon is None:
+        return start_datetime, target_time_end
+
+    created_utc_end = datetime.now(tz=timezone.utc)
+    if created_utc_limit is not None:
+        created_utc_end = min(to_utc(created_utc_limit), created_utc_end)
+
+    horizon_end = created_utc_end + max_forecast_horizon
+    if (target_time_end is None) or (horizon_end < target_time_end):
+        target_time_end = horizon_end
+
+    return start_datetime, target_time_end
+
+
+def is_database_timezone_utc(session: Session) -> bool:
+    """
+    Check the database 'TimeZone' is UTC, this is only checked once for each engine
+
+    The partition bounds are made from dates without a timezone, so they are in the 'TimeZone'
+    of the database when the partitions were made.
+
+    :param session: database session
+    :return: True if the 'TimeZone' is UTC
+    """
+    engine = session.get_bind().engine
+    if engine not in utc_databases:
+        database_timezone = session.execute(text("SHOW TimeZone")).scalar()
+        utc_databases[engine] = database_timezone.upper() in ["UTC", "ETC/UTC", "GMT", "ETC/GMT"]
+        if not utc_databases[engine]:
+            logger.warning(
+                f"The database TimeZone is {database_timezone}, not UTC, "
+                f"so forecast value partitions are not read directly"
+            )
+
+    return utc_databases[engine]
+
+
+def get_forecast_value_partition(
+    session: Session,
+    model: Union[ForecastValueSQL, ForecastValueSevenDaysSQL],
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+) -> Optional[Table]:
+    """
+    Get the monthly partition of the forecast_value table, that has all the target times
+
+    The partitions are 'forecast_value_YYYY_MM', with bounds at the start of each month in UTC.
+    The bounds of older partitions are only in UTC if the database 'TimeZone' is UTC,
+    so otherwise no partition is returned, and postgres picks the partitions.
+
+    :param session: database session
+    :param model: Can be 'ForecastValueSQL' or 'ForecastValueSevenDaysSQL'
+    :param start_datetime: Optional (default None), the start of the target times
+    :param end_datetime: Optional (default None), the end of the target times
+    :return: the partition table, or None if the target times are not in one partition
+    """
+
+    if (model.__tablename__ != ForecastValueSQL.__tablename__) or (
+        session.get_bind().dialect.name != "postgresql"
+    ):
+        return None
+
+    if (start_datetime is None) or (end_datetime is None):
+        return None
+
+    start_datetime = to_utc(start_datetime)
+    end_datetime = to_utc(end_datetime)
+    if (start_datetime.year, start_datetime.month) != (end_datetime.year, end_datetime.month):
+        return None
+
+    if not is_database_timezone_utc(session=session):
+        return None
+
+    table_name = (
+        f"{ForecastValueSQL.__tablename__}_{start_datetime.year}_{start_datetime.month:02d}"
+    )
+    return Base_Forecast.metadata.tables.get(table_name)
+
+
+def get_query_model(query):
+    """Get the forecast value model of a query, this is an alias if a partition is read"""
+    return query.column_descriptions[0]["entity"]
+
+
+def is_horizon_minutes_backfilled(
+    session: Session,
+    model: Union[ForecastValueSQL, ForecastValueSevenDaysSQL],
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+) -> bool:
+    """
+    Check if horizon_minutes is filled for all the forecast values between two target times
+
+    Each month is checked using the index on horizon_minutes. New forecast values always have
+    horizon_minutes, so once a month in the past is filled, it is remembered and not checked again.
+    The other checks are remembered for 'HORIZON_MINUTES_BACKFILLED_TTL', so reads do not check
+    the current month and the future target times every time.
+    See 'nowcasting_datamodel.save.backfill' for filling the old forecast values.
+    Rows without a created_utc have no horizon, so they are not checked.
+
+    :param session: database session
+    :param model: Can be 'ForecastValueSQL' or 'ForecastValueSevenDaysSQL'
+    :param start_datetime: Optional (default None), the start of the target times.
+        If None, the whole table is checked.
+    :param end_datetime: Optional (default None), the end of the target times.
+    :return: True if there are no forecast values with a NULL horizon_minutes
+    """
+
+    url = str(session.get_bind().engine.url)
+    table_name = model.__tablename__
+    if horizon_minutes_backfilled.get((url, table_name, None, None)) == (True, None):
+        return True
+
+    now = datetime.now(tz=timezone.utc)
+
+    def has_no_nulls(
+        start: Optional[datetime] = None, end: Optional[datetime] = None, expires: bool = True
+    ) -> bool:
+        key = (url, table_name, start, end)
+        if key in horizon_minutes_backfilled:
+            is_backfilled, expires_utc = horizon_minutes_backfilled[key]
+            if (expires_utc is None) or (expires_utc > now):
+                return is_backfilled
+
+        query = session.query(model.target_time).filter(model.horizon_minutes.is_(None))
+        query = query.filter(model.created_utc.isnot(None))
+        if start is not None:
+            query = query.filter(model.target_time >= start)
+        if end is not None:
+            query = query.filter(model.target_time < end)
+        is_backfilled = query.limit(1).first() is None
+
+        if is_backfilled and not expires:
+            horizon_minutes_backfilled[key] = (True, None)
+        else:
+            horizon_minutes_backfilled[key] = (
+                is_backfilled,
+                now + HORIZON_MINUTES_BACKFILLED_TTL,
+            )
+        return is_backfilled
+
+    # check the whole table
+    if start_datetime is None:
+        return has_no_nulls(expires=False)
+
+    # check each month, up to now, and then the future target times
+    end = now if end_datetime is None else min(to_utc(end_datetime), now)
+    month = to_utc(start_datetime).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= end:
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        if not has_no_nulls(start=month, end=next_month, expires=next_month > now):
+            return False
+        month = next_month
+
+    if (end_datetime is None) or (to_utc(end_datetime) >= month):
+        return has_no_nulls(start=month)
+
+    return True
+
+
+def clear_horizon_minutes_backfilled(session: Optional[Session] = None):
+    """
+    Forget the checks of horizon_minutes, so they are made again by the next read
+
+    :param session: Optional (default None), only forget the checks of this session's database.
+        If None, the checks of all databases are forgotten.
+    """
+    if session is None:
+        horizon_minutes_backfilled.clear()
+        return
+
+    url = str(session.get_bind().engine.url)
+    for key in [key for key in horizon_minutes_backfilled if key[0] == url]:
+        horizon_minutes_backfilled.pop(key)
+
+
+def get_forecast_values_columns(
+    session: Session,
+    query,
+    model: Union[ForecastValueSQL, ForecastValueSevenDaysSQL],
+    as_frame: bool = True,
+) -> Union[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Get the forecast values of a query as columns, rather than sqlalchemy objects
+
+    The query is run as a core select of only the columns in 'forecast_value_columns',
+    so no sqlalchemy objects are made.
+
+    :param session: database session
+    :param query: forecast value query, which is joined to the location table
+    :param model: Can be 'ForecastValueSQL' or 'ForecastValueSevenDaysSQL'
+    :param as_frame: Optional (default True), to return a pandas DataFrame,
+        otherwise a dictionary of numpy arrays is returned
+    :return: DataFrame or dictionary of numpy arrays
+    """
+
+    query = query.with_entities(*get_forecast_values_column_entities(model=model))
+    rows = session.execute(query.statement).all()
+    logger.debug(f"Found {len(rows)} forecast values")
+
+    forecast_values = make_forecast_values_frame(rows)
+
+    if as_frame:
+        return forecast_values
+
+    # numpy has no timezones, so the datetimes are in UTC without a timezone
+    return {
+        column: (
+            forecast_values[column].dt.tz_localize(None).to_numpy()
+            if column in ["target_time", "created_utc"]
+            else forecast_values[column].to_numpy()
+        )
+        for column in forecast_value_columns
+    }
+
+
+def get_forecast_values_column_entities(
+    model: Union[ForecastValueSQL, ForecastValueSevenDaysSQL],
+) -> list:
+    """Get the columns in 'forecast_value_columns', for a forecast value query"""
+    return [
+        LocationSQL.gsp_id,
+        model.target_time,
+        model.created_utc,
+        model.expected_power_generation_megawatts,
+        model.adjust_mw,
+        model.horizon_minutes,
+    ]
+
+
+def make_forecast_values_frame(rows: list) -> pd.DataFrame:
+    """
+    Make a DataFrame of forecast values, from rows of 'forecast_value_columns'
+
+    :param rows: list of rows
+    :return: DataFrame with the datetimes as 'datetime64[ns, UTC]'
+    """
+
+    forecast_values = pd.DataFrame.from_records(rows, columns=forecast_value_columns)
+    forecast_values = forecast_values.astype(
+        {
+            "gsp_id": "int64",
+            "expected_power_generation_megawatts": "float64",
+            "adjust_mw": "float64",
+            "horizon_minutes": "float64",
+        }
+    )
+    for column in ["target_time", "created_utc"]:
+        forecast_values[column] = pd.to_datetime(forecast_values[column], utc=True).astype(
+            "datetime64[ns, UTC]"
+        )
+
+    return forecast_values
 
 
 def get_forecast_values_latest(
@@ -623,9 +1228,6 @@ def get_forecast_values_latest(
     # get all results
     forecast_values_latest = query.all()
 
-    for forecast_value in forecast_values_latest:
-        forecast_value.created_utc = forecast_value.created_utc.replace(tzinfo=timezone.utc)
-
     return forecast_values_latest
 
 
@@ -706,6 +1308,13 @@ def get_location(
 
     """
 
+    # get from the registry, if it has been loaded
+    registry = get_registry(session)
+    if registry is not None:
+        location = registry.get(session=session, table="location", key=location_key(gsp_id))
+        if (location is not None) and (label is None or location.label == label):
+            return location
+
     # start main query
     query = session.query(LocationSQL)
 
@@ -735,9 +1344,86 @@ def get_location(
     else:
         location = locations[0]
 
+    if registry is not None:
+        registry.add("location", location_key(gsp_id), location, overwrite=label is None)
+
     return location
 
 
+def get_locations_for_gsp_ids(
+    session: Session,
+    gsp_ids: List[int],
+    installed_capacity_mw: Optional[Dict[int, float]] = None,
+) -> Dict[int, LocationSQL]:
+    """
+    Get location objects for many gsp ids, and make the ones that do not exist
+
+    This is the same as calling 'get_location' for each gsp id, but
+    1. The locations in the registry are used, if it has been loaded
+    2. The other locations are read in one query
+    3. The missing locations are made in one insert, and committed
+
+    :param session: database session
+    :param gsp_ids: list of gsp ids
+    :param installed_capacity_mw: Optional (default None), dictionary of gsp id to the
+        installed capacity mw, which is used if a new location is made
+    :return: dictionary of gsp id to location object
+    """
+
+    gsp_ids = list(dict.fromkeys(gsp_ids))
+    if installed_capacity_mw is None:
+        installed_capacity_mw = {}
+
+    # 1. get from the registry
+    locations = {}
+    registry = get_registry(session)
+    if registry is not None:
+        for gsp_id in gsp_ids:
+            location = registry.get(session=session, table="location", key=location_key(gsp_id))
+            if location is not None:
+                locations[gsp_id] = location
+
+    # 2. read the rest, the first location for each gsp id is used
+    missing_gsp_ids = [gsp_id for gsp_id in gsp_ids if gsp_id not in locations]
+    if len(missing_gsp_ids) > 0:
+        query = session.query(LocationSQL)
+        query = query.filter(LocationSQL.gsp_id.in_(missing_gsp_ids))
+        query = query.order_by(LocationSQL.id)
+        for location in query.all():
+            if location.gsp_id not in locations:
+                locations[location.gsp_id] = location
+                if registry is not None:
+                    registry.add("location", location_key(location.gsp_id), location)
+
+    # 3. make the missing locations
+    missing_gsp_ids = [gsp_id for gsp_id in gsp_ids if gsp_id not in locations]
+    if len(missing_gsp_ids) > 0:
+        logger.debug(f"Locations for gsp_ids {missing_gsp_ids} do not exist so going to add them")
+        rows = [
+            {
+                "gsp_id": gsp_id,
+                "label": national_gb_label if gsp_id == 0 else f"GSP_{gsp_id}",
+                "installed_capacity_mw": installed_capacity_mw.get(gsp_id),
+            }
+            for gsp_id in missing_gsp_ids
+        ]
+        # render_nulls keeps all the rows in one insert, even if some values are None
+        stmt = insert(LocationSQL).returning(LocationSQL).execution_options(render_nulls=True)
+        new_locations = session.scalars(stmt, rows).all()
+        for location in new_locations:
+            locations[location.gsp_id] = location
+        location_ids = [location.id for location in new_locations]
+        session.commit()
+
+        # only add to the registry once they are committed, they are loaded again in one query
+        if registry is not None:
+            session.query(LocationSQL).filter(LocationSQL.id.in_(location_ids)).all()
+            for location in new_locations:
+                registry.add("location", location_key(location.gsp_id), location)
+
+    return {gsp_id: locations[gsp_id] for gsp_id in gsp_ids}
+
+
 def get_all_locations(session: Session, gsp_ids: List[int] = None) -> List[LocationSQL]:
     """
     Get all location object from gsp id
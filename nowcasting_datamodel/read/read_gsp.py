@@ -1,14 +1,15 @@
 """Read pv functions"""
 
 import logging
-from datetime import datetime, timezone
-from typing import List, Optional, Union
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, List, Optional, Union
 
 import pandas as pd
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func
 from sqlalchemy.orm import Session, contains_eager, joinedload
 
-from nowcasting_datamodel.models import GSPYield, GSPYieldSQL, LocationSQL
+from nowcasting_datamodel.models import GSPYield, GSPYieldLatestSQL, GSPYieldSQL, LocationSQL
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,9 @@ def get_latest_gsp_yield(
     """
     Get the last gsp yield data
 
+    The latest gsp yields are found using the 'gsp_yield_latest' table,
+    which is kept up to date by a trigger when gsp yields are saved.
+
     :param session: database sessions
     :param gsps: list of gsps
     :param append_to_gsps: append gsp yield to pv systems, or return pv systems.
@@ -39,46 +43,44 @@ def get_latest_gsp_yield(
     else:
         gsp_ids = [gsp.gsp_id for gsp in gsps]
 
-    # start main query
+    # the latest gsp yield, or the latest one with a capacity, for each location and regime
+    if allow_nans_in_capacities:
+        latest_gsp_yield_id = GSPYieldLatestSQL.gsp_yield_id
+        latest_datetime_utc = GSPYieldLatestSQL.datetime_utc
+    else:
+        latest_gsp_yield_id = GSPYieldLatestSQL.capacity_gsp_yield_id
+        latest_datetime_utc = GSPYieldLatestSQL.capacity_datetime_utc
+
+    # start main query, the latest gsp yields are found using the primary key of gsp_yield_latest.
+    # gsp_yield is partitioned on datetime_utc, so this is joined on too
     query = session.query(GSPYieldSQL)
-    query = query.join(LocationSQL)
-    query = query.where(
-        LocationSQL.id == GSPYieldSQL.location_id,
+    query = query.join(
+        GSPYieldLatestSQL,
+        and_(
+            GSPYieldSQL.id == latest_gsp_yield_id,
+            GSPYieldSQL.datetime_utc == latest_datetime_utc,
+        ),
     )
+    query = query.join(LocationSQL, LocationSQL.id == GSPYieldLatestSQL.location_id)
+    query = query.options(contains_eager(GSPYieldSQL.location))
 
     # filter on regime
-    query = query.where(GSPYieldSQL.regime == regime)
+    query = query.where(GSPYieldLatestSQL.regime == regime)
 
-    # only select on results per pv system
-    query = query.distinct(LocationSQL.gsp_id)
-
-    # select only th epv systems we want
+    # select only the gsps we want
     query = query.where(LocationSQL.gsp_id.in_(gsp_ids))
 
     if datetime_utc is not None:
         # filter on datetime
         query = query.where(GSPYieldSQL.datetime_utc >= datetime_utc)
 
-    # don't get any nans. (Note nan+1 > nan = False)
-    if not allow_nans_in_capacities:
-        query = query.where(GSPYieldSQL.capacity_mwp + 1 > GSPYieldSQL.capacity_mwp)
-
-    # order by 'created_utc' desc, so we get the latest one
-    query = query.order_by(
-        LocationSQL.gsp_id,
-        desc(GSPYieldSQL.datetime_utc),
-        desc(GSPYieldSQL.created_utc),
-    )
+    query = query.order_by(LocationSQL.gsp_id)
 
     # get all results
     gsp_yields: List[GSPYieldSQL] = query.all()
 
     logger.debug(f"Found {len(gsp_yields)}  latest gsp yields")
 
-    # add utc timezone
-    for gsp_yield in gsp_yields:
-        gsp_yield.datetime_utc = gsp_yield.datetime_utc.replace(tzinfo=timezone.utc)
-
     if not append_to_gsps:
         return gsp_yields
     else:
@@ -129,6 +131,75 @@ def get_gsp_yield(
     :return: list of gsp yields
     """
 
+    query = make_gsp_yield_query(
+        session=session,
+        gsp_ids=gsp_ids,
+        start_datetime_utc=start_datetime_utc,
+        regime=regime,
+        end_datetime_utc=end_datetime_utc,
+        filter_nans=filter_nans,
+    )
+
+    # get all results
+    gsp_yields: List[GSPYieldSQL] = query.all()
+
+    return gsp_yields
+
+
+def iter_gsp_yield(
+    session: Session,
+    gsp_ids: List[int],
+    start_datetime_utc: datetime,
+    regime: Optional[str] = None,
+    end_datetime_utc: Optional[datetime] = None,
+    filter_nans: Optional[bool] = True,
+    batch_size: int = 10000,
+) -> Iterator[List[GSPYieldSQL]]:
+    """
+    Get the gsp yield values in batches, using a server side cursor
+
+    This is the same as 'get_gsp_yield', but the rows are streamed from the database,
+    so only one batch is held in memory at a time.
+    Note the session should not be committed, until all the batches have been read.
+
+    :param session: sqlalmcy sessions
+    :param gsp_ids: list of gsp ids that we filter on
+    :param start_datetime_utc: filter values on this start datetime
+    :param regime: filter query on this regim. Can be "in-day" or "day-after"
+    :param end_datetime_utc: optional end datetime filter
+    :param filter_nans: optional filter out nans. Default is True
+    :param batch_size: Optional (default 10000), the number of gsp yields in each batch
+    :return: iterator of batches of gsp yields
+    """
+
+    query = make_gsp_yield_query(
+        session=session,
+        gsp_ids=gsp_ids,
+        start_datetime_utc=start_datetime_utc,
+        regime=regime,
+        end_datetime_utc=end_datetime_utc,
+        filter_nans=filter_nans,
+    )
+
+    gsp_yields = iter(query.yield_per(batch_size))
+    while batch := list(islice(gsp_yields, batch_size)):
+        yield batch
+
+
+def make_gsp_yield_query(
+    session: Session,
+    gsp_ids: List[int],
+    start_datetime_utc: datetime,
+    regime: Optional[str] = None,
+    end_datetime_utc: Optional[datetime] = None,
+    filter_nans: Optional[bool] = True,
+):
+    """
+    Make the query for gsp yield values, see 'get_gsp_yield' for the parameters
+
+    :return: sqlalchemy query
+    """
+
     # start main query
     query = session.query(GSPYieldSQL)
     query = query.join(LocationSQL)
@@ -163,13 +234,7 @@ def get_gsp_yield(
         desc(GSPYieldSQL.created_utc),
     )
 
-    # get all results
-    gsp_yields: List[GSPYieldSQL] = query.all()
-
-    for gsp_yield in gsp_yields:
-        gsp_yield.datetime_utc = gsp_yield.datetime_utc.replace(tzinfo=timezone.utc)
-
-    return gsp_yields
+    return query
 
 
 def get_gsp_yield_by_location(
@@ -229,10 +294,6 @@ def get_gsp_yield_by_location(
     # get all results
     locations: List[LocationSQL] = query.all()
 
-    for location in locations:
-        for gsp_yield in location.gsp_yields:
-            gsp_yield.datetime_utc = gsp_yield.datetime_utc.replace(tzinfo=timezone.utc)
-
     return locations
 
 
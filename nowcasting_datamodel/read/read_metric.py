@@ -5,12 +5,13 @@
 """
 
 import logging
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import List, Optional
 
 from sqlalchemy.orm.session import Session
 
 from nowcasting_datamodel.models import DatetimeIntervalSQL, MetricSQL, MetricValueSQL, MLModelSQL
+from nowcasting_datamodel.read.registry import datetime_interval_key, get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,13 @@ def get_metric(session: Session, name: str) -> MetricSQL:
 
     """
 
+    # get from the registry, if it has been loaded
+    registry = get_registry(session)
+    if registry is not None:
+        metric = registry.get(session=session, table="metric", key=name)
+        if metric is not None:
+            return metric
+
     # start main query
     query = session.query(MetricSQL)
 
@@ -46,6 +54,9 @@ def get_metric(session: Session, name: str) -> MetricSQL:
     else:
         metric = metrics[0]
 
+    if registry is not None:
+        registry.add("metric", name, metric)
+
     return metric
 
 
@@ -63,6 +74,14 @@ def get_datetime_interval(
 
     """
 
+    # get from the registry, if it has been loaded
+    registry = get_registry(session)
+    key = datetime_interval_key(start_datetime_utc, end_datetime_utc)
+    if registry is not None:
+        datetime_interval = registry.get(session=session, table="datetime_interval", key=key)
+        if datetime_interval is not None:
+            return datetime_interval
+
     # start main query
     query = session.query(DatetimeIntervalSQL)
 
@@ -91,6 +110,9 @@ def get_datetime_interval(
     else:
         datetime_interval = datetime_intervals[0]
 
+    if registry is not None:
+        registry.add("datetime_interval", key, datetime_interval)
+
     return datetime_interval
 
 
@@ -132,14 +154,4 @@ def read_latest_me_national(
     # get all results
     metric_values = query.all()
 
-    # add timezone, show be the same datetime interval for all
-    if len(metric_values) > 0:
-        datetime_interval = metric_values[0].datetime_interval
-        datetime_interval.start_datetime_utc = datetime_interval.start_datetime_utc.replace(
-            tzinfo=timezone.utc
-        )
-        datetime_interval.end_datetime_utc = datetime_interval.end_datetime_utc.replace(
-            tzinfo=timezone.utc
-        )
-
     return metric_values
@@ -1,13 +1,15 @@
 """Read functions for models"""
 
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from nowcasting_datamodel.models import MLModelSQL
 from nowcasting_datamodel.models.forecast import ForecastSQL
 from nowcasting_datamodel.read.read import logger
+from nowcasting_datamodel.read.registry import get_registry, model_key
 
 
 def get_models(
@@ -54,6 +56,13 @@ def get_model(session: Session, name: str, version: Optional[str] = None) -> MLM
 
     """
 
+    # get from the registry, if it has been loaded
+    registry = get_registry(session)
+    if registry is not None:
+        model = registry.get(session=session, table="model", key=model_key(name, version))
+        if model is not None:
+            return model
+
     # start main query
     query = session.query(MLModelSQL)
 
@@ -80,4 +89,78 @@ def get_model(session: Session, name: str, version: Optional[str] = None) -> MLM
     else:
         model = models[0]
 
+    if registry is not None:
+        if len(models) == 0:
+            registry.add_model(model)
+        else:
+            registry.add("model", model_key(name, version), model)
+
     return model
+
+
+def get_models_for_names(
+    session: Session, names: List[str], version: Optional[str] = None
+) -> Dict[str, MLModelSQL]:
+    """
+    Get model objects for many names, and make the ones that do not exist
+
+    This is the same as calling 'get_model' for each name, but
+    1. The models in the registry are used, if it has been loaded
+    2. The other models are read in one query
+    3. The missing models are made in one insert, and committed
+
+    :param session: database session
+    :param names: list of model names
+    :param version: Optional (default None), version of the models.
+        If None, the latest model for each name is used.
+    :return: dictionary of name to model object
+    """
+
+    names = list(dict.fromkeys(names))
+
+    # 1. get from the registry
+    models = {}
+    registry = get_registry(session)
+    if registry is not None:
+        for name in names:
+            model = registry.get(session=session, table="model", key=model_key(name, version))
+            if model is not None:
+                models[name] = model
+
+    # 2. read the rest, the latest model for each name is used
+    missing_names = [name for name in names if name not in models]
+    if len(missing_names) > 0:
+        query = session.query(MLModelSQL)
+        query = query.filter(MLModelSQL.name.in_(missing_names))
+        if version is not None:
+            query = query.filter(MLModelSQL.version == version)
+        query = query.order_by(MLModelSQL.created_utc.desc())
+        for model in query.all():
+            if model.name not in models:
+                models[model.name] = model
+                if registry is not None:
+                    registry.add("model", model_key(model.name, version), model)
+
+    # 3. make the missing models
+    missing_names = [name for name in names if name not in models]
+    if len(missing_names) > 0:
+        logger.debug(
+            f"Models for names {missing_names} and version {version} do not exist "
+            f"so going to add them"
+        )
+        rows = [{"name": name, "version": version} for name in missing_names]
+        # render_nulls keeps all the rows in one insert, even if the version is None
+        stmt = insert(MLModelSQL).returning(MLModelSQL).execution_options(render_nulls=True)
+        new_models = session.scalars(stmt, rows).all()
+        for model in new_models:
+            models[model.name] = model
+        model_ids = [model.id for model in new_models]
+        session.commit()
+
+        # only add to the registry once they are committed, they are loaded again in one query
+        if registry is not None:
+            session.query(MLModelSQL).filter(MLModelSQL.id.in_(model_ids)).all()
+            for model in new_models:
+                registry.add_model(model)
+
+    return {name: models[name] for name in names}
@@ -1,13 +1,15 @@
 """Read pv functions"""
 
 import logging
-from datetime import datetime, timezone
-from typing import List, Optional, Union
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, List, Optional, Union
 
 from sqlalchemy import desc
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from nowcasting_datamodel.models import PVSystemSQL, PVYieldSQL
+from nowcasting_datamodel.models import PVSystemSQL, PVYieldLatestSQL, PVYieldSQL
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +65,12 @@ def get_latest_pv_yield(
     """
     Get the last pv yield data
 
+    The latest pv yields are found using the 'pv_yield_latest' table,
+    which is kept up to date by a trigger when pv yields are saved.
+    The datetime filter is on the latest pv yield of each pv system.
+    If 'start_created_utc' is given, the latest pv yield created after it is found
+    from the 'pv_yield' table, as this may not be the latest pv yield. This is slower.
+
     :param session: database sessions
     :param pv_systems: list of pv systems
     :param append_to_pv_systems: append pv yield to pv systems, or return pv systems.
@@ -75,44 +83,42 @@ def get_latest_pv_yield(
 
     logger.info("Getting latest pv yield")
 
-    pv_systems_ids = [pv_system.id for pv_system in pv_systems]
+    pv_systems_by_id = {pv_system.id: pv_system for pv_system in pv_systems}
 
-    # start main query
     query = session.query(PVYieldSQL)
-    query = query.join(PVSystemSQL)
-    query = query.where(
-        PVSystemSQL.id == PVYieldSQL.pv_system_id,
-    )
-
-    # only select on results per pv system
-    query = query.distinct(PVSystemSQL.id)
+    if start_created_utc is None:
+        # the latest pv yields are found using the primary key of pv_yield_latest
+        query = query.join(PVYieldLatestSQL, PVYieldSQL.id == PVYieldLatestSQL.pv_yield_id)
+    else:
+        # only select one result per pv system, the latest one that matches the filters
+        query = query.distinct(PVYieldSQL.pv_system_id)
+        query = query.filter(PVYieldSQL.created_utc >= start_created_utc)
 
-    # select only th epv systems we want
-    query = query.where(PVSystemSQL.id.in_(pv_systems_ids))
+    # select only the pv systems we want
+    query = query.where(PVYieldSQL.pv_system_id.in_(list(pv_systems_by_id.keys())))
 
     # only select correct data pv systems
     if correct_data is not None:
+        query = query.join(PVSystemSQL, PVSystemSQL.id == PVYieldSQL.pv_system_id)
         query = query.filter(PVSystemSQL.correct_data == correct_data)
 
     # filter on datetime utc
     if start_datetime_utc is not None:
         query = query.filter(PVYieldSQL.datetime_utc >= start_datetime_utc)
 
-    # filter on created utc
-    if start_created_utc is not None:
-        query = query.filter(PVYieldSQL.created_utc >= start_created_utc)
-
-    # order by 'created_utc' desc, so we get the latest one
-    query = query.order_by(
-        PVSystemSQL.id, desc(PVYieldSQL.datetime_utc), desc(PVYieldSQL.created_utc)
-    )
+    if start_created_utc is None:
+        query = query.order_by(PVYieldSQL.pv_system_id)
+    else:
+        query = query.order_by(
+            PVYieldSQL.pv_system_id, desc(PVYieldSQL.datetime_utc), desc(PVYieldSQL.created_utc)
+        )
 
     # get all results
     pv_yields: List[PVYieldSQL] = query.all()
 
-    # add utc timezone
+    # the pv systems are already loaded, so add them to the pv yields, rather than loading them
     for pv_yield in pv_yields:
-        pv_yield.datetime_utc = pv_yield.datetime_utc.replace(tzinfo=timezone.utc)
+        set_committed_value(pv_yield, "pv_system", pv_systems_by_id[pv_yield.pv_system_id])
 
     if not append_to_pv_systems:
         return pv_yields
@@ -127,10 +133,10 @@ def get_latest_pv_yield(
 
             pv_systems_with_pv_yields.append(pv_system)
 
-        # add pv systems that dont have any pv yields
-        pv_systems_with_pv_yields_ids = [pv_system.id for pv_system in pv_systems_with_pv_yields]
+        logger.debug(f"Found {len(pv_systems_with_pv_yields)} pv systems with pv yields")
 
-        logger.debug(f"Found {len(pv_systems_with_pv_yields_ids)} pv systems with pv yields")
+        # add pv systems that dont have any pv yields, using the pv system ids of the pv yields
+        pv_systems_with_pv_yields_ids = {pv_yield.pv_system_id for pv_yield in pv_yields}
 
         pv_systems_with_no_pv_yields = []
         for pv_system in pv_systems:
@@ -168,6 +174,80 @@ def get_pv_yield(
     :return: either list of pv yields, or pv systems
     """
 
+    query = make_pv_yield_query(
+        session=session,
+        pv_systems_ids=pv_systems_ids,
+        start_utc=start_utc,
+        end_utc=end_utc,
+        correct_data=correct_data,
+        providers=providers,
+        distinct=distinct,
+    )
+
+    # get all results
+    pv_yields: List[PVYieldSQL] = query.all()
+
+    return pv_yields
+
+
+def iter_pv_yield(
+    session: Session,
+    pv_systems_ids: Optional[List[int]] = None,
+    start_utc: Optional[datetime] = None,
+    end_utc: Optional[datetime] = None,
+    correct_data: Optional[bool] = None,
+    providers: Optional[List[str]] = None,
+    distinct: Optional[bool] = False,
+    batch_size: int = 10000,
+) -> Iterator[List[PVYieldSQL]]:
+    """
+    Get the pv yield data in batches, using a server side cursor
+
+    This is the same as 'get_pv_yield', but the rows are streamed from the database,
+    so only one batch is held in memory at a time.
+    Note the session should not be committed, until all the batches have been read.
+
+    :param session: database sessions
+    :param pv_systems_ids: list of pv systems ids
+    :param end_utc: search filters < on 'datetime_utc'. Can be None
+    :param start_utc: search filters >= on 'datetime_utc'. Can be None
+    :param correct_data: Filters on incorrect_data in pv_systems
+    :param providers: optional list of provider names
+    :param distinct: if True, only return distinct pv yields
+    :param batch_size: Optional (default 10000), the number of pv yields in each batch
+    :return: iterator of batches of pv yields
+    """
+
+    query = make_pv_yield_query(
+        session=session,
+        pv_systems_ids=pv_systems_ids,
+        start_utc=start_utc,
+        end_utc=end_utc,
+        correct_data=correct_data,
+        providers=providers,
+        distinct=distinct,
+    )
+
+    pv_yields = iter(query.yield_per(batch_size))
+    while batch := list(islice(pv_yields, batch_size)):
+        yield batch
+
+
+def make_pv_yield_query(
+    session: Session,
+    pv_systems_ids: Optional[List[int]] = None,
+    start_utc: Optional[datetime] = None,
+    end_utc: Optional[datetime] = None,
+    correct_data: Optional[bool] = None,
+    providers: Optional[List[str]] = None,
+    distinct: Optional[bool] = False,
+):
+    """
+    Make the query for pv yield data, see 'get_pv_yield' for the parameters
+
+    :return: sqlalchemy query
+    """
+
     # start main query
     query = session.query(PVYieldSQL)
 
@@ -203,10 +283,4 @@ def get_pv_yield(
         PVYieldSQL.created_utc.desc(),
     )
 
-    # get all results
-    pv_yields: List[PVYieldSQL] = query.all()
-
-    for pv_yield in pv_yields:
-        pv_yield.datetime_utc = pv_yield.datetime_utc.replace(tzinfo=timezone.utc)
-
-    return pv_yields
+    return query
@@ -8,6 +8,7 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm.session import Session
 
 from nowcasting_datamodel.models.api import APIRequestSQL, UserSQL
+from nowcasting_datamodel.read.registry import get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,13 @@ def get_user(session: Session, email: str) -> UserSQL:
     return: One Metric SQl object
     """
 
+    # get from the registry, if it has been loaded
+    registry = get_registry(session)
+    if registry is not None:
+        user = registry.get(session=session, table="user", key=email)
+        if user is not None:
+            return user
+
     # start main query
     query = session.query(UserSQL)
     # filter on name
@@ -34,6 +42,10 @@ def get_user(session: Session, email: str) -> UserSQL:
         session.commit()
     else:
         user = users[0]
+
+    if registry is not None:
+        registry.add("user", email, user)
+
     return user
 
 
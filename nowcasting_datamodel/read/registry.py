@@ -0,0 +1,201 @@
+"""Registry of the small dimension tables, held in memory
+
+'get_location', 'get_model', 'get_metric', 'get_datetime_interval' and 'get_user' look up
+(and sometimes make) one row each time they are called. These functions are called in loops,
+for example when making fake forecasts, so lots of small queries are made.
+
+Calling 'load_registry' reads the location, model, metric and datetime_interval tables once,
+and then these functions answer lookups from memory, without querying the database.
+Any rows that are made, or users that are looked up, are added to the registry.
+
+The registry stores the column values, not session-bound objects. Each lookup makes an object
+in the caller's session using 'session.merge(..., load=False)', which does not query the database.
+
+There is one registry for each database url, and it is used by all sessions in this process.
+Rows that are changed or deleted by other processes are not updated in the registry,
+so 'clear_registries' should be called if the dimension tables are changed.
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+import structlog
+from sqlalchemy import inspect
+from sqlalchemy.orm.session import Session, make_transient_to_detached
+
+from nowcasting_datamodel.models.api import UserSQL
+from nowcasting_datamodel.models.gsp import LocationSQL
+from nowcasting_datamodel.models.metric import DatetimeIntervalSQL, MetricSQL
+from nowcasting_datamodel.models.models import MLModelSQL
+from nowcasting_datamodel.read.cache import to_utc
+
+logger = structlog.stdlib.get_logger()
+
+# the registry for each database url
+_registries: Dict[str, "DimensionRegistry"] = {}
+_registries_lock = threading.Lock()
+
+
+class DimensionRegistry:
+    """In memory copy of the location, model, metric, datetime interval and user tables"""
+
+    tables = {
+        "location": LocationSQL,
+        "model": MLModelSQL,
+        "metric": MetricSQL,
+        "datetime_interval": DatetimeIntervalSQL,
+        "user": UserSQL,
+    }
+
+    def __init__(self):
+        """Make an empty registry"""
+        # table name: {key: column values}
+        self.rows: Dict[str, Dict[Hashable, dict]] = {table: {} for table in self.tables}
+        self.lock = threading.Lock()
+
+    def load(self, session: Session):
+        """
+        Load the location, model, metric and datetime_interval tables
+
+        The users table is not loaded, but users are added when they are looked up.
+
+        :param session: database session
+        """
+
+        # 1. locations, the first location for each gsp id is used, like 'get_location'
+        locations = session.query(LocationSQL).order_by(LocationSQL.id).all()
+        for location in locations:
+            if location.gsp_id is not None:
+                self.add("location", location_key(location.gsp_id), location, overwrite=False)
+
+        # 2. models, so the latest model for each name, and name and version is used
+        models = session.query(MLModelSQL).order_by(MLModelSQL.created_utc, MLModelSQL.id).all()
+        for model in models:
+            self.add_model(model)
+
+        # 3. metrics
+        for metric in session.query(MetricSQL).order_by(MetricSQL.id).all():
+            self.add("metric", metric.name, metric, overwrite=False)
+
+        # 4. datetime intervals
+        datetime_intervals = session.query(DatetimeIntervalSQL).order_by(DatetimeIntervalSQL.id)
+        for datetime_interval in datetime_intervals.all():
+            key = datetime_interval_key(
+                datetime_interval.start_datetime_utc, datetime_interval.end_datetime_utc
+            )
+            self.add("datetime_interval", key, datetime_interval, overwrite=False)
+
+        logger.debug(
+            "Loaded dimension registry",
+            **{table: len(rows) for table, rows in self.rows.items()},
+        )
+
+    def add(self, table: str, key: Hashable, obj: Any, overwrite: bool = True):
+        """
+        Add a row to the registry
+
+        :param table: the table name, one of 'DimensionRegistry.tables'
+        :param key: the key to look the row up with
+        :param obj: the sqlalchemy object, which has been saved to the database
+        :param overwrite: Optional (default True), to overwrite a row with the same key
+        """
+        model_class = self.tables[table]
+        values = {
+            column.key: getattr(obj, column.key) for column in inspect(model_class).column_attrs
+        }
+
+        with self.lock:
+            if overwrite or (key not in self.rows[table]):
+                self.rows[table][key] = values
+
+    def add_model(self, model: MLModelSQL):
+        """
+        Add a model, as the latest model for its name, and for its name and version
+
+        :param model: the sqlalchemy model object
+        """
+        self.add("model", model_key(model.name, model.version), model)
+        self.add("model", model_key(model.name, None), model)
+
+    def get(self, session: Session, table: str, key: Hashable) -> Optional[Any]:
+        """
+        Get a row from the registry, as an object in this session
+
+        :param session: database session
+        :param table: the table name, one of 'DimensionRegistry.tables'
+        :param key: the key to look the row up with
+        :return: the sqlalchemy object, or None if it is not in the registry
+        """
+        with self.lock:
+            values = self.rows[table].get(key)
+
+        if values is None:
+            return None
+
+        obj = self.tables[table](**values)
+        make_transient_to_detached(obj)
+
+        # load=False does not query the database, and gives the object already in the session
+        return session.merge(obj, load=False)
+
+
+def location_key(gsp_id: int) -> Hashable:
+    """Registry key for a location"""
+    return gsp_id
+
+
+def model_key(name: str, version: Optional[str] = None) -> Hashable:
+    """Registry key for a model, a version of None is the latest model for the name"""
+    return name, version
+
+
+def datetime_interval_key(start_datetime_utc: datetime, end_datetime_utc: datetime) -> Hashable:
+    """Registry key for a datetime interval, the datetimes are naive UTC like the database"""
+    return (
+        to_utc(start_datetime_utc).replace(tzinfo=None),
+        to_utc(end_datetime_utc).replace(tzinfo=None),
+    )
+
+
+def get_database_url(session: Session) -> str:
+    """Get the database url of a session"""
+    return str(session.get_bind().engine.url)
+
+
+def load_registry(session: Session) -> DimensionRegistry:
+    """
+    Load the dimension tables into a registry for this database
+
+    After this, 'get_location', 'get_model', 'get_metric', 'get_datetime_interval'
+    and 'get_user' use the registry, for all sessions to this database.
+
+    :param session: database session
+    :return: the registry
+    """
+    registry = DimensionRegistry()
+    registry.load(session=session)
+
+    with _registries_lock:
+        _registries[get_database_url(session)] = registry
+
+    return registry
+
+
+def get_registry(session: Session) -> Optional[DimensionRegistry]:
+    """
+    Get the registry for the database of this session
+
+    :param session: database session
+    :return: the registry, or None if 'load_registry' has not been called for this database
+    """
+    if len(_registries) == 0:
+        return None
+
+    return _registries.get(get_database_url(session))
+
+
+def clear_registries():
+    """Remove all the registries, so the dimension tables are read from the database again"""
+    with _registries_lock:
+        _registries.clear()
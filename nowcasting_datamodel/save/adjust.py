@@ -35,8 +35,14 @@ def add_adjust_to_forecasts(
     # get the national forecast only
     forecast_national = [f for f in forecasts_sql if f.location.gsp_id == 0]
 
-    if len(forecast_national) != 1:
-        logger.debug("Could not find single national forecast, tehre fore not adding adjust")
+    if len(forecast_national) == 0:
+        logger.debug("Could not find a national forecast, therefore not adding adjust")
+        return
+
+    if len(forecast_national) > 1:
+        logger.debug(
+            f"Found {len(forecast_national)} national forecasts, so adding adjust to the first one"
+        )
 
     add_adjust_to_national_forecast(
         forecast=forecast_national[0], session=session, max_adjust_percentage=max_adjust_percentage
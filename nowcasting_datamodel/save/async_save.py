@@ -0,0 +1,241 @@
+"""Save forecasts to the database, using asyncio
+
+This has the same stages as 'nowcasting_datamodel.save.save.save', but uses 'AsyncSession',
+so it can be used from asyncio services without blocking the event loop.
+
+1. The adjuster is applied, and the forecasts are inserted and committed, so they get ids
+2. Then these three writes are run at the same time, each on their own connection
+    a. insert the forecast values
+    b. upsert the forecast_value_latest table
+    c. insert the forecast_value_last_seven_days table
+
+The engine should use an async driver, for example 'postgresql+asyncpg://...',
+see 'nowcasting_datamodel.connection.make_async_url'.
+
+Note that the three writes in step 2 are committed separately,
+so if one of them fails, the others may still have been saved.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import Session
+
+from nowcasting_datamodel.models.forecast import ForecastSQL, ForecastValueSQL
+from nowcasting_datamodel.save.adjust import add_adjust_to_forecasts
+from nowcasting_datamodel.save.bulk import make_forecast_value_rows
+from nowcasting_datamodel.save.update import (
+    add_forecast_last_7_days_rows_and_remove_old_data,
+    get_gsp_ids,
+    update_all_forecast_latest_from_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def save(
+    forecasts: List[ForecastSQL],
+    engine: AsyncEngine,
+    update_national: Optional[bool] = True,
+    update_gsp: Optional[bool] = True,
+    apply_adjuster: Optional[bool] = True,
+    save_to_last_seven_days: Optional[bool] = True,
+    remove_non_distinct_last_seven_days: bool = False,
+):
+    """
+    Save forecast to database, using asyncio
+
+    1. Apply the adjuster, and add the forecasts to the database
+    2. Save the forecast values, the latest values and the last seven days values,
+        all at the same time
+
+    Note that apply_adjuster=True can be overwritten by "USE_ADJUSTER" env var.
+    The forecasts should not be attached to a different session.
+
+    :param forecasts: list of sql forecasts
+    :param engine: async database engine
+    :param update_national: Optional (default true), to update the national forecast
+    :param update_gsp: Optional (default true), to update all the GSP forecasts
+    :param apply_adjuster: Optional (default true), to apply the adjuster
+    :param save_to_last_seven_days: Optional (default true), to save to the last seven days table
+    :param remove_non_distinct_last_seven_days: Optional (default False), to only keep distinct
+        forecast values in the forecast_value_last_seven_days table
+    """
+
+    use_adjuster_env_var = bool(os.getenv("USE_ADJUSTER", "True").lower() in ["true", "1"])
+    if apply_adjuster & (not use_adjuster_env_var):
+        logger.warning(
+            "USE_ADJUSTER is set to False, but apply_adjuster is set to True. "
+            "Therefore the adjuster will not be applied to the forecasts."
+        )
+        apply_adjuster = False
+
+    # 1. add adjuster and save forecasts
+    if apply_adjuster:
+        logger.debug("Add Adjust to forecasts")
+        await add_adjust_to_forecasts_async(engine=engine, forecasts=forecasts)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        logger.debug("Saving forecasts")
+        forecast_value_rows = await save_forecasts_without_values(
+            session=session, forecasts=forecasts
+        )
+        await session.commit()
+
+    # 2. save the forecast values, latest values and seven days values at the same time
+    gsp_ids = get_gsp_ids(include_national=update_national, include_gsps=update_gsp)
+    forecasts_latest = [
+        (forecast, rows)
+        for forecast, rows in zip(forecasts, forecast_value_rows)
+        if forecast.location.gsp_id in gsp_ids
+    ]
+    all_rows = [row for rows in forecast_value_rows for row in rows]
+
+    writes = [save_forecast_values(engine=engine, rows=all_rows)]
+    if len(forecasts_latest) > 0:
+        writes.append(update_all_forecast_latest(engine=engine, forecasts_latest=forecasts_latest))
+    else:
+        logger.warning(f"Will not be updating any GSPs as {update_national=} and {update_gsp=}")
+    if save_to_last_seven_days:
+        writes.append(
+            add_forecast_last_7_days_and_remove_old_data(
+                engine=engine,
+                rows=all_rows,
+                remove_non_distinct=remove_non_distinct_last_seven_days,
+            )
+        )
+
+    logger.debug(f"Running {len(writes)} writes at the same time")
+    await asyncio.gather(*writes)
+
+
+async def add_adjust_to_forecasts_async(engine: AsyncEngine, forecasts: List[ForecastSQL]):
+    """
+    Add adjust values to the forecasts, using 'add_adjust_to_forecasts'
+
+    This only reads from the database, so the session is not committed.
+    The adjuster changes the metric values it reads, so autoflush is turned off.
+
+    :param engine: async database engine
+    :param forecasts: list of sql forecasts
+    """
+
+    def add_adjust(session: Session):
+        with session.no_autoflush:
+            add_adjust_to_forecasts(session=session, forecasts_sql=forecasts)
+
+    async with AsyncSession(engine) as session:
+        await session.run_sync(add_adjust)
+
+
+async def save_forecasts_without_values(
+    session: AsyncSession, forecasts: List[ForecastSQL]
+) -> List[List[dict]]:
+    """
+    Add the forecasts to the database, and make the rows of the forecast values
+
+    The forecast values are taken off the forecasts while the forecasts are added,
+    so they can be inserted separately. The uuids are made here, so that
+    the forecast_value and forecast_value_last_seven_days rows have the same uuid.
+    Note this does not commit the session.
+
+    :param session: async database session
+    :param forecasts: list of sql forecasts
+    :return: list of forecast value rows, for each forecast
+    """
+
+    # 1. take forecast values off the forecasts, and add forecasts
+    forecast_values_per_forecast = [list(forecast.forecast_values) for forecast in forecasts]
+    for forecast in forecasts:
+        set_committed_value(forecast, "forecast_values", [])
+    session.add_all(forecasts)
+    await session.flush()
+
+    # 2. make forecast value rows
+    created_utc = datetime.now(tz=timezone.utc)
+    rows_per_forecast = [
+        make_forecast_value_rows(
+            forecast_values=forecast_values, forecast_id=forecast.id, created_utc=created_utc
+        )
+        for forecast, forecast_values in zip(forecasts, forecast_values_per_forecast)
+    ]
+
+    # 3. put the forecast values back on the forecasts
+    for forecast, forecast_values in zip(forecasts, forecast_values_per_forecast):
+        set_committed_value(forecast, "forecast_values", forecast_values)
+
+    return rows_per_forecast
+
+
+async def save_forecast_values(engine: AsyncEngine, rows: List[dict]):
+    """
+    Insert forecast values, on a new connection
+
+    :param engine: async database engine
+    :param rows: forecast value rows
+    """
+
+    logger.debug(f"Saving {len(rows)} forecast values")
+    async with AsyncSession(engine) as session:
+        if len(rows) > 0:
+            await session.execute(insert(ForecastValueSQL.__table__), rows)
+        await session.commit()
+
+
+async def update_all_forecast_latest(
+    engine: AsyncEngine, forecasts_latest: List[tuple], batch_size: int = 10000
+):
+    """
+    Update the forecast_value_latest table, on a new connection
+
+    :param engine: async database engine
+    :param forecasts_latest: list of (forecast, forecast value rows)
+    :param batch_size: Optional (default 10000), the maximum number of rows in each upsert
+    """
+
+    # get the ids now, as the forecasts can not be used in a different session
+    forecasts_data = [
+        {
+            "gsp_id": forecast.location.gsp_id,
+            "location_id": forecast.location_id,
+            "model_id": forecast.model_id,
+            "model_name": forecast.model.name,
+            "input_data_last_updated_id": forecast.input_data_last_updated_id,
+            "rows": rows,
+        }
+        for forecast, rows in forecasts_latest
+    ]
+
+    logger.debug(f"Updating latest for {len(forecasts_data)} forecasts")
+    async with AsyncSession(engine) as session:
+        await session.run_sync(
+            lambda sync_session: update_all_forecast_latest_from_rows(
+                session=sync_session, forecasts_data=forecasts_data, batch_size=batch_size
+            )
+        )
+
+
+async def add_forecast_last_7_days_and_remove_old_data(
+    engine: AsyncEngine, rows: List[dict], remove_non_distinct: bool = False
+):
+    """
+    Add forecast values to the last seven days table and delete old values, on a new connection
+
+    :param engine: async database engine
+    :param rows: forecast value rows
+    :param remove_non_distinct: Optional (default False), to only keep distinct forecast values
+    """
+
+    logger.debug(f"Saving {len(rows)} forecast values to the last seven days table")
+    async with AsyncSession(engine) as session:
+        await session.run_sync(
+            lambda sync_session: add_forecast_last_7_days_rows_and_remove_old_data(
+                session=sync_session, rows=rows, remove_non_distinct=remove_non_distinct
+            )
+        )
@@ -0,0 +1,132 @@
+"""Backfill the horizon_minutes column of the forecast value tables
+
+'horizon_minutes' was added after the forecast value tables had lots of data,
+so old rows have NULL values. New rows always have 'horizon_minutes' set when they are saved.
+
+The backfill goes partition by partition, and updates a batch of rows at a time,
+with a commit and a sleep after each batch, so the database is not locked for a long time.
+Only rows where 'horizon_minutes' is NULL are updated, so the backfill can be stopped and started
+again, and it carries on where it stopped. Rows without a 'target_time' or 'created_utc'
+have no horizon, so they are left as NULL.
+
+Once all the rows for the target times of a query are backfilled,
+'get_forecast_values' filters on the indexed 'horizon_minutes' column.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm.session import Session
+
+from nowcasting_datamodel.models.forecast import ForecastValueSevenDaysSQL, ForecastValueSQL
+from nowcasting_datamodel.read.read import clear_horizon_minutes_backfilled
+from nowcasting_datamodel.save.update import get_partition_names
+
+logger = logging.getLogger(__name__)
+
+# this is the same as 'get_horizon_minutes', casting to an integer rounds to the nearest minute
+HORIZON_MINUTES_SQL = "CAST(EXTRACT(EPOCH FROM target_time - created_utc) / 60 AS INTEGER)"
+
+
+def backfill_horizon_minutes(
+    session: Session,
+    table_names: Optional[List[str]] = None,
+    batch_size: int = 10000,
+    sleep_seconds: float = 0.1,
+    max_batches: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Backfill horizon_minutes for all the partitions of the forecast value tables
+
+    :param session: database session
+    :param table_names: Optional (default None), the tables to backfill.
+        Default is the forecast_value and forecast_value_last_seven_days tables.
+    :param batch_size: Optional (default 10000), the number of rows to update in each batch
+    :param sleep_seconds: Optional (default 0.1), how long to sleep after each batch
+    :param max_batches: Optional (default None), the maximum number of batches that update rows,
+        in total. This can be used to only run the backfill for a while, and carry on later.
+    :return: dictionary of the partition name and the number of rows updated
+    """
+
+    if table_names is None:
+        table_names = [ForecastValueSQL.__tablename__, ForecastValueSevenDaysSQL.__tablename__]
+
+    n_rows = {}
+    n_batches = 0
+    for table_name in table_names:
+        # tables that are not partitioned are backfilled in one go
+        partition_names = get_partition_names(session=session, parent_name=table_name)
+        if len(partition_names) == 0:
+            partition_names = [table_name]
+
+        for partition_name in partition_names:
+            if (max_batches is not None) and (n_batches >= max_batches):
+                logger.info(f"Stopping the backfill after {n_batches} batches")
+                return n_rows
+
+            n_rows[partition_name], n_batches_partition = backfill_horizon_minutes_partition(
+                session=session,
+                table_name=partition_name,
+                batch_size=batch_size,
+                sleep_seconds=sleep_seconds,
+                max_batches=None if max_batches is None else max_batches - n_batches,
+            )
+            n_batches += n_batches_partition
+
+    return n_rows
+
+
+def backfill_horizon_minutes_partition(
+    session: Session,
+    table_name: str,
+    batch_size: int = 10000,
+    sleep_seconds: float = 0.1,
+    max_batches: Optional[int] = None,
+) -> (int, int):
+    """
+    Backfill horizon_minutes for one table, a batch of rows at a time
+
+    Each batch is committed. The rows are found using the index on 'horizon_minutes',
+    and updated using their 'ctid', so each batch does not scan the table.
+
+    :param session: database session
+    :param table_name: the table name, this should be a partition, not a partitioned table
+    :param batch_size: Optional (default 10000), the number of rows to update in each batch
+    :param sleep_seconds: Optional (default 0.1), how long to sleep after each batch
+    :param max_batches: Optional (default None), the maximum number of batches to run
+    :return: the number of rows updated, and the number of batches that updated rows
+    """
+
+    query = text(
+        f"UPDATE {table_name} SET horizon_minutes = {HORIZON_MINUTES_SQL} "
+        f"WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {table_name} WHERE horizon_minutes IS NULL "
+        f"AND target_time IS NOT NULL AND created_utc IS NOT NULL LIMIT :batch_size"
+        f"))"
+    )
+
+    n_rows = 0
+    n_batches = 0
+    while (max_batches is None) or (n_batches < max_batches):
+        result = session.execute(query, {"batch_size": batch_size})
+        session.commit()
+        if result.rowcount == 0:
+            break
+
+        n_rows += result.rowcount
+        n_batches += 1
+        if result.rowcount < batch_size:
+            break
+
+        logger.debug(f"Backfilled {n_rows} rows of {table_name}")
+        time.sleep(sleep_seconds)
+
+    if n_rows > 0:
+        logger.info(f"Backfilled horizon_minutes for {n_rows} rows of {table_name}")
+
+        # the checks in this process are out of date, other processes wait for them to expire
+        clear_horizon_minutes_backfilled(session=session)
+
+    return n_rows, n_batches
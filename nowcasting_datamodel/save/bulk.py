@@ -0,0 +1,220 @@
+"""Bulk save forecasts to the database, using postgres COPY
+
+Adding forecasts with 'session.add_all' makes one INSERT per forecast value,
+which is slow when we save ~349 forecasts with 100+ values each.
+Here the forecasts are inserted by the ORM (so we get the ids back in one batch),
+and then all the forecast values are streamed into 'forecast_value' with COPY.
+"""
+
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import Session
+
+from nowcasting_datamodel.models.forecast import ForecastSQL, ForecastValueSQL
+
+logger = logging.getLogger(__name__)
+
+# the columns we copy into forecast_value. 'uuid' is left to the database default
+forecast_value_copy_columns = [
+    "target_time",
+    "expected_power_generation_megawatts",
+    "adjust_mw",
+    "properties",
+    "forecast_id",
+    "created_utc",
+    "horizon_minutes",
+]
+
+
+def can_use_copy(session: Session) -> bool:
+    """
+    Check if we can use COPY for this session
+
+    COPY is only available for postgres using the psycopg2 driver.
+    For other databases, for example sqlite, we use the normal ORM path.
+
+    :param session: database session
+    :return: bool, if COPY can be used
+    """
+    dialect = session.get_bind().dialect
+    return (dialect.name == "postgresql") and (dialect.driver == "psycopg2")
+
+
+def save_forecasts_with_copy(session: Session, forecasts: List[ForecastSQL]):
+    """
+    Save forecasts using COPY for the forecast values
+
+    1. Take the forecast values off the forecasts
+    2. Add the forecasts to the database, this gets all the forecast ids in one go
+    3. COPY the forecast values into the forecast_value table
+    4. Put the forecast values back on the forecasts
+
+    If COPY can not be used, the forecasts are added with 'session.add_all'.
+    Note that this does not commit the session.
+
+    :param session: database session
+    :param forecasts: list of sql forecasts
+    """
+
+    if not can_use_copy(session=session):
+        logger.debug("Can not use COPY for this database, so adding forecasts using the ORM")
+        session.add_all(forecasts)
+        return
+
+    # 1. take forecast values off the forecasts.
+    # Values that have already been flushed are left alone
+    new_forecast_values_per_forecast = []
+    all_forecast_values_per_forecast = []
+    for forecast in forecasts:
+        forecast_values = list(forecast.forecast_values)
+        all_forecast_values_per_forecast.append(forecast_values)
+
+        new_forecast_values = []
+        flushed_forecast_values = []
+        for forecast_value in forecast_values:
+            state = inspect(forecast_value)
+            if state.identity is None:
+                if state.session_id is not None:
+                    session.expunge(forecast_value)
+                new_forecast_values.append(state.dict)
+            else:
+                flushed_forecast_values.append(forecast_value)
+        new_forecast_values_per_forecast.append(new_forecast_values)
+
+        set_committed_value(forecast, "forecast_values", flushed_forecast_values)
+
+    # 2. add forecasts
+    logger.debug(f"Adding {len(forecasts)} forecasts")
+    session.add_all(forecasts)
+    session.flush()
+
+    # 3. copy forecast values
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    created_utc = datetime.now(tz=timezone.utc)
+    n_rows = 0
+    for forecast, forecast_values in zip(forecasts, new_forecast_values_per_forecast):
+        forecast_id = forecast.id
+        for forecast_value in forecast_values:
+            # these objects are not in the session,
+            # so we can set the values that are going to be in the database directly
+            forecast_value["forecast_id"] = forecast_id
+            if forecast_value.get("created_utc") is None:
+                forecast_value["created_utc"] = created_utc
+            if forecast_value.get("adjust_mw") is None:
+                forecast_value["adjust_mw"] = 0.0
+            if forecast_value.get("horizon_minutes") is None:
+                forecast_value["horizon_minutes"] = get_horizon_minutes(
+                    target_time=forecast_value["target_time"],
+                    created_utc=forecast_value["created_utc"],
+                )
+
+            writer.writerow(make_forecast_value_copy_row(forecast_value))
+            n_rows += 1
+
+    logger.debug(f"Copying {n_rows} forecast values")
+    buffer.seek(0)
+    copy_sql = (
+        f"COPY {ForecastValueSQL.__tablename__} ({', '.join(forecast_value_copy_columns)}) "
+        f"FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+
+    # 4. put the forecast values back on the forecasts
+    for forecast, forecast_values in zip(forecasts, all_forecast_values_per_forecast):
+        set_committed_value(forecast, "forecast_values", forecast_values)
+
+
+def make_forecast_value_copy_row(forecast_value: dict) -> list:
+    """
+    Make one csv row for the COPY statement
+
+    Empty strings are read as NULL by postgres.
+
+    :param forecast_value: dictionary of the forecast value columns
+    :return: list of values, in the order of 'forecast_value_copy_columns'
+    """
+
+    row = []
+    for column in forecast_value_copy_columns:
+        value = forecast_value.get(column)
+        if value is None:
+            value = ""
+        elif column == "properties":
+            value = json.dumps(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row.append(value)
+
+    return row
+
+
+def get_horizon_minutes(target_time: datetime, created_utc: datetime) -> int:
+    """
+    Get the forecast horizon in minutes, same as 'default_horizon_minutes'
+
+    :param target_time: the target time of the forecast value
+    :param created_utc: when the forecast value was created
+    :return: forecast horizon in minutes
+    """
+
+    # make sure they both have tz, or not
+    if target_time.tzinfo is None:
+        created_utc = created_utc.replace(tzinfo=None)
+    elif created_utc.tzinfo is None:
+        created_utc = created_utc.replace(tzinfo=timezone.utc)
+
+    return round((target_time - created_utc).total_seconds() / 60.0)
+
+
+def make_forecast_value_rows(
+    forecast_values: List[ForecastValueSQL],
+    forecast_id: int,
+    created_utc: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Make the rows of the forecast_value table, from forecast value objects
+
+    The uuids are made here, so the same rows can be saved in the
+    forecast_value and forecast_value_last_seven_days tables.
+
+    :param forecast_values: list of forecast value objects
+    :param forecast_id: the id of the forecast
+    :param created_utc: Optional (default now), used if the forecast value has no created_utc
+    :return: list of dictionaries, one for each forecast value
+    """
+
+    if created_utc is None:
+        created_utc = datetime.now(tz=timezone.utc)
+
+    rows = []
+    for forecast_value in forecast_values:
+        row = {
+            "uuid": uuid.uuid4(),
+            "target_time": forecast_value.target_time,
+            "expected_power_generation_megawatts": (
+                forecast_value.expected_power_generation_megawatts
+            ),
+            "adjust_mw": forecast_value.adjust_mw or 0.0,
+            "properties": forecast_value.properties,
+            "forecast_id": forecast_id,
+            "created_utc": forecast_value.created_utc or created_utc,
+        }
+        row["horizon_minutes"] = get_horizon_minutes(
+            target_time=row["target_time"], created_utc=row["created_utc"]
+        )
+        rows.append(row)
+
+    return rows
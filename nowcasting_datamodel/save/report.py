@@ -0,0 +1,109 @@
+"""Report how long each stage of saving forecasts takes
+
+This is used by 'nowcasting_datamodel.save.save.save' when 'report=True'.
+For each stage the wall time, the number of rows and the number of sql statements are recorded.
+Only the statements on the connections of the session are counted, not other sessions or threads.
+The report is logged with structlog, so each stage can be tracked over time.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm.session import Session
+
+logger = structlog.stdlib.get_logger()
+
+
+class SaveReport:
+    """Record the wall time, row counts and statement counts of each stage of a save"""
+
+    def __init__(self, session: Session):
+        """
+        Make a save report, that counts the statements executed using this session
+
+        :param session: database session
+        """
+        self.session = session
+        self.connections: List[Connection] = []
+        self.stages: List[dict] = []
+        self.current_stage: Optional[dict] = None
+        self.start = time.time()
+
+    def count_statement(self, *args, **kwargs):
+        """Add one to the statement count of the current stage"""
+        if self.current_stage is not None:
+            self.current_stage["statements"] += 1
+
+    def listen_to_connection(self, session: Session, transaction, connection: Connection):
+        """Count the statements on a connection, this is called when the session begins one"""
+        if connection not in self.connections:
+            event.listen(connection, "before_cursor_execute", self.count_statement)
+            self.connections.append(connection)
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """
+        Time a stage of saving
+
+        The rows can be set on the stage in the 'with' block, if they are not known before.
+
+        :param name: the name of the stage
+        :param rows: Optional (default None), the number of rows in this stage
+        :return: dictionary of the stage
+        """
+        stage = {"name": name, "seconds": 0.0, "rows": rows, "statements": 0}
+        self.current_stage = stage
+
+        # the session begins a connection when it is first used, or again after a commit.
+        # If the session is already in a transaction, count on its connection too, but don't
+        # begin a transaction here, as the stage might not use the database.
+        event.listen(self.session, "after_begin", self.listen_to_connection)
+        start = time.time()
+        try:
+            if self.session.in_transaction():
+                self.listen_to_connection(
+                    session=self.session, transaction=None, connection=self.session.connection()
+                )
+            yield stage
+        finally:
+            stage["seconds"] = round(time.time() - start, 3)
+            event.remove(self.session, "after_begin", self.listen_to_connection)
+            for connection in self.connections:
+                event.remove(connection, "before_cursor_execute", self.count_statement)
+            self.connections = []
+            self.current_stage = None
+            self.stages.append(stage)
+
+    def to_dict(self) -> dict:
+        """
+        Make a dictionary of the report
+
+        :return: dictionary with the total seconds, and the list of stages
+        """
+        return {"total_seconds": round(time.time() - self.start, 3), "stages": self.stages}
+
+    def log(self) -> dict:
+        """
+        Log the report using structlog
+
+        :return: dictionary of the report
+        """
+        report = self.to_dict()
+        logger.info("Save report", **report)
+        return report
+
+
+@contextmanager
+def stage_without_report(name: str, rows: Optional[int] = None):
+    """
+    The same as 'SaveReport.stage', but nothing is timed or counted, for saves without a report
+
+    :param name: the name of the stage
+    :param rows: Optional (default None), the number of rows in this stage
+    :return: dictionary of the stage
+    """
+    yield {"name": name, "rows": rows}
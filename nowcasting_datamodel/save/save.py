@@ -2,16 +2,25 @@
 
 import logging
 import os
-from typing import List, Optional
+from itertools import islice
+from typing import Iterable, List, Optional
 
 from sqlalchemy.orm.session import Session
 
 from nowcasting_datamodel.models import PVSystem, PVSystemSQL
 from nowcasting_datamodel.models.forecast import ForecastSQL
+from nowcasting_datamodel.read.cache import invalidate_result_caches
 from nowcasting_datamodel.save.adjust import add_adjust_to_forecasts
+from nowcasting_datamodel.save.bulk import save_forecasts_with_copy
+from nowcasting_datamodel.save.report import SaveReport, stage_without_report
 from nowcasting_datamodel.save.update import (
     add_forecast_last_7_days_and_remove_old_data,
+    add_forecast_last_7_days_from_forecast_values_and_remove_old_data,
     change_forecast_value_to_forecast_last_7_days,
+    datetime_with_utc,
+    get_forecast_last_7_days_limit,
+    make_forecast_value_seven_days_partitions,
+    remove_forecast_last_7_days_old_data,
     update_all_forecast_latest,
 )
 
@@ -26,12 +35,18 @@ def save(
     apply_adjuster: Optional[bool] = True,
     save_to_last_seven_days: Optional[bool] = True,
     remove_non_distinct_last_seven_days: bool = False,
-):
+    use_copy: bool = False,
+    batch_update_latest: bool = False,
+    save_last_seven_days_in_database: bool = False,
+    skip_unchanged_latest: bool = False,
+    report: bool = False,
+) -> Optional[dict]:
     """
     Save forecast to database
 
     1. Add sqlalchemy onjects to database
     2. Saves to 'latest' table aswell
+    3. Invalidate the result caches for these models, see 'nowcasting_datamodel.read.cache'
 
     Note that apply_adjuster=True can be overwritten by "USE_ADJUSTER" env var
 
@@ -47,6 +62,19 @@ def save(
         metrics. Another solution to this is to make a forecast <--> forecast_value a
         many-to-many relationship. This means one forecast will still have the full
         range of forecast values assign with it.
+    :param use_copy: Optional (default False), to save the forecast values using postgres COPY.
+        This is much quicker for lots of forecasts. For databases that are not postgres,
+        the normal ORM path is used.
+    :param batch_update_latest: Optional (default False), to update the latest table for all
+        forecasts in a few large upserts, with one commit.
+    :param save_last_seven_days_in_database: Optional (default False), to make the last seven days
+        values in the database from the forecast_value table, rather than sending them again.
+    :param skip_unchanged_latest: Optional (default False), to only write the rows of the
+        forecast_value_latest table that have changed. This writes less to the database,
+        but 'created_utc' is not updated for the rows that have not changed.
+    :param report: Optional (default False), to log and return a report of each stage,
+        with the wall time, the number of rows and the number of sql statements
+    :return: the report as a dictionary, if report=True, otherwise None
     """
 
     use_adjuster_env_var = bool(os.getenv("USE_ADJUSTER", "True").lower() in ["true", "1"])
@@ -57,29 +85,159 @@ def save(
         )
         apply_adjuster = False
 
+    # the report only listens to the session's connections when it is asked for
+    save_report = SaveReport(session=session) if report else None
+    stage = save_report.stage if report else stage_without_report
+    model_names = [forecast.model.name for forecast in forecasts if forecast.model is not None]
+    n_forecast_values = sum([len(forecast.forecast_values) for forecast in forecasts])
+    target_days = {
+        datetime_with_utc(forecast_value.target_time).date()
+        for forecast in forecasts
+        for forecast_value in forecast.forecast_values
+    }
+
     if apply_adjuster:
         logger.debug("Add Adjust to forecasts")
-        add_adjust_to_forecasts(session=session, forecasts_sql=forecasts)
+        with stage("adjuster"):
+            if use_copy:
+                # don't flush the forecasts yet, so they can all be copied in one go
+                with session.no_autoflush:
+                    add_adjust_to_forecasts(session=session, forecasts_sql=forecasts)
+            else:
+                add_adjust_to_forecasts(session=session, forecasts_sql=forecasts)
 
     # save objects to database
     logger.debug("Saving models")
-    session.add_all(forecasts)
-    session.commit()
+    with stage("insert_forecasts", rows=n_forecast_values):
+        if use_copy:
+            save_forecasts_with_copy(session=session, forecasts=forecasts)
+        else:
+            session.add_all(forecasts)
+        session.commit()
 
     logger.debug("Updating to latest")
-    update_all_forecast_latest(
-        session=session, forecasts=forecasts, update_national=update_national, update_gsp=update_gsp
-    )
-    session.commit()
-
-    if save_to_last_seven_days:
-        logger.debug("Saving to last seven days table")
-        save_all_forecast_values_seven_days(
+    with stage("update_latest") as stage_latest:
+        counts = update_all_forecast_latest(
             session=session,
             forecasts=forecasts,
-            remove_non_distinct=remove_non_distinct_last_seven_days,
+            update_national=update_national,
+            update_gsp=update_gsp,
+            batch=batch_update_latest,
+            skip_unchanged=skip_unchanged_latest,
         )
         session.commit()
+        stage_latest["rows"] = counts["written"]
+        stage_latest["rows_skipped"] = counts["skipped"]
+
+    if save_to_last_seven_days:
+        # make the partitions in their own transaction, so they are kept if the save fails,
+        # and the locks they take are not held while the values are saved
+        if session.get_bind().dialect.name == "postgresql":
+            logger.debug("Making last seven days partitions")
+            with stage("make_last_seven_days_partitions"):
+                datetime_limit = get_forecast_last_7_days_limit()
+                make_forecast_value_seven_days_partitions(
+                    session=session,
+                    days=[day for day in target_days if day >= datetime_limit.date()],
+                )
+                session.commit()
+
+        logger.debug("Saving to last seven days table")
+        with stage("insert_last_seven_days", rows=n_forecast_values):
+            save_all_forecast_values_seven_days(
+                session=session,
+                forecasts=forecasts,
+                remove_non_distinct=remove_non_distinct_last_seven_days,
+                in_database=save_last_seven_days_in_database,
+                remove_old_data=False,
+            )
+            session.commit()
+
+        logger.debug("Removing old data from last seven days table")
+        with stage("remove_old_last_seven_days"):
+            remove_forecast_last_7_days_old_data(
+                session=session, datetime_limit=get_forecast_last_7_days_limit()
+            )
+            session.commit()
+
+    # the cached reads for these models are now out of date
+    invalidate_result_caches(model_names=model_names)
+
+    if report:
+        return save_report.log()
+
+
+def save_in_chunks(
+    forecasts: Iterable[ForecastSQL],
+    session: Session,
+    chunk_size: int = 100,
+    **kwargs,
+) -> int:
+    """
+    Save forecasts from an iterator, a chunk at a time
+
+    This is useful for backfills, where the forecasts do not all fit in memory.
+    The forecasts are only taken from the iterator when they are needed.
+
+    1. Take the next chunk of forecasts with the same model from the iterator
+    2. Save them, using 'save'. This updates the latest and last seven days tables too
+    3. Clear the session, so the saved objects can be freed
+
+    Each chunk only has forecasts from one model, as 'save' updates the latest table for one model.
+    A new chunk is started when the model changes, so the forecasts should be ordered by model,
+    otherwise the chunks are smaller than 'chunk_size'.
+
+    Note that the session is cleared after each chunk, so any other objects in the session
+    are detached. The forecasts that are given, should not be kept, so memory stays the same.
+
+    :param forecasts: iterator or generator of sql forecasts
+    :param session: database session
+    :param chunk_size: Optional (default 100), the number of forecasts to save at a time
+    :param kwargs: other options, passed to 'save'
+    :return: the number of forecasts that were saved
+    """
+
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size should be at least 1, not {chunk_size}")
+
+    def get_model_key(forecast: ForecastSQL) -> tuple:
+        if forecast.model is None:
+            return None, None
+        return forecast.model.name, forecast.model.version
+
+    forecasts = iter(forecasts)
+    forecast_next = None
+    n_forecasts = 0
+    while True:
+        # 1. get the next chunk, until the chunk is full or the model changes
+        forecasts_chunk = [] if forecast_next is None else [forecast_next]
+        model_key = None if forecast_next is None else get_model_key(forecast_next)
+        forecast_next = None
+        for forecast in islice(forecasts, chunk_size - len(forecasts_chunk)):
+            if len(forecasts_chunk) == 0:
+                model_key = get_model_key(forecast)
+            elif get_model_key(forecast) != model_key:
+                forecast_next = forecast
+                break
+            forecasts_chunk.append(forecast)
+
+        if len(forecasts_chunk) == 0:
+            break
+
+        # 2. save
+        logger.debug(f"Saving chunk of {len(forecasts_chunk)} forecasts for {model_key}")
+        save(forecasts=forecasts_chunk, session=session, **kwargs)
+        n_forecasts += len(forecasts_chunk)
+
+        # 3. clear the session, the next forecast was made before this, so it is added back
+        session.expunge_all()
+        del forecasts_chunk
+        if forecast_next is not None:
+            session.add(forecast_next)
+
+    logger.debug(f"Saved {n_forecasts} forecasts in chunks of {chunk_size}")
+
+    return n_forecasts
 
 
 def save_pv_system(session: Session, pv_system: PVSystem) -> PVSystemSQL:
@@ -123,7 +281,11 @@ def save_pv_system(session: Session, pv_system: PVSystem) -> PVSystemSQL:
 
 
 def save_all_forecast_values_seven_days(
-    session: Session, forecasts: List[ForecastSQL], remove_non_distinct: bool = False
+    session: Session,
+    forecasts: List[ForecastSQL],
+    remove_non_distinct: bool = False,
+    in_database: bool = False,
+    remove_old_data: bool = True,
 ):
     """
     Save all the forecast values in the last seven days table
@@ -132,8 +294,22 @@ def save_all_forecast_values_seven_days(
     :param forecasts: list of forecasts
     :param remove_non_distinct: Optional (default False), to only keep distinct forecast values
         If the last saved forecast value is the same as the current one, it will not be saved
+    :param in_database: Optional (default False), to copy the forecast values inside the database,
+        using INSERT ... SELECT from the forecast_value table.
+        The forecasts must already be saved.
+    :param remove_old_data: Optional (default True), to remove data older than 7 days
     """
 
+    if in_database:
+        forecast_ids = [forecast.id for forecast in forecasts]
+        add_forecast_last_7_days_from_forecast_values_and_remove_old_data(
+            session=session,
+            forecast_ids=forecast_ids,
+            remove_non_distinct=remove_non_distinct,
+            remove_old_data=remove_old_data,
+        )
+        return
+
     # get all values together
     forecast_values_last_7_days = []
     for forecast in forecasts:
@@ -148,4 +324,5 @@ def save_all_forecast_values_seven_days(
         session=session,
         forecast_values=forecast_values_last_7_days,
         remove_non_distinct=remove_non_distinct,
+        remove_old_data=remove_old_data,
     )
@@ -1,11 +1,12 @@
 """Method to update latest forecast values"""
 
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
 
-from sqlalchemy import delete, inspect
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import JSON, cast, delete, func, inspect, or_, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm.session import Session
 
 from nowcasting_datamodel import N_GSP
@@ -15,6 +16,7 @@ from nowcasting_datamodel.models.forecast import (
     ForecastValueLatestSQL,
     ForecastValueSQL,
 )
+from nowcasting_datamodel.read.cache import invalidate_result_caches
 from nowcasting_datamodel.read.read import (
     get_latest_forecast,
     get_latest_forecast_for_gsps,
@@ -22,6 +24,14 @@ from nowcasting_datamodel.read.read import (
 
 logger = logging.getLogger(__name__)
 
+# the forecast value columns that are used in the forecast_value_latest table
+FORECAST_VALUE_LATEST_COLUMNS = [
+    "target_time",
+    "expected_power_generation_megawatts",
+    "adjust_mw",
+    "properties",
+]
+
 
 def get_historic_forecast(
     session: Session, forecast: ForecastSQL, model_name: Optional[str] = None
@@ -44,14 +54,7 @@ def get_historic_forecast(
     if forecast_historic is None:
         logger.debug("Could not find a historic forecast, so will make one")
 
-        forecast_historic = ForecastSQL(
-            historic=True,
-            forecast_creation_time=datetime.now(timezone.utc),
-            location=forecast.location,
-            input_data_last_updated=forecast.input_data_last_updated,
-            model=forecast.model,
-            initialization_datetime_utc=datetime.now(timezone.utc),
-        )
+        forecast_historic = make_historic_forecast(forecast=forecast)
         session.add(forecast_historic)
         session.commit()
     else:
@@ -60,7 +63,31 @@ def get_historic_forecast(
     return forecast_historic
 
 
-def upsert(session: Session, model, rows: List[dict]):
+def make_historic_forecast(forecast: ForecastSQL) -> ForecastSQL:
+    """
+    Make a new historic forecast, from a forecast
+
+    :param forecast: the forecast, the location, input data and model are used
+    :return: historic forecast, this is not added to the session
+    """
+
+    return ForecastSQL(
+        historic=True,
+        forecast_creation_time=datetime.now(timezone.utc),
+        location=forecast.location,
+        input_data_last_updated=forecast.input_data_last_updated,
+        model=forecast.model,
+        initialization_datetime_utc=datetime.now(timezone.utc),
+    )
+
+
+def upsert(
+    session: Session,
+    model,
+    rows: List[dict],
+    commit: bool = True,
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
     """
 
     Upsert rows into model
@@ -71,6 +98,11 @@ def upsert(session: Session, model, rows: List[dict]):
     :param session: sqlalchemy Session
     :param model: the model
     :param rows: the rows we are going to update
+    :param commit: Optional (default True), to commit the session after the upsert
+    :param skip_unchanged: Optional (default False), to only update rows where the values
+        are different to the ones in the database. 'created_utc' is not compared.
+        This saves writing a new row version for rows that have not changed.
+    :return: dictionary with the number of rows 'written' and 'skipped'
     """
     table = model.__table__
     stmt = insert(table)
@@ -79,9 +111,108 @@ def upsert(session: Session, model, rows: List[dict]):
 
     if not update_dict:
         raise ValueError("insert_or_update resulted in an empty update_dict")
-    stmt = stmt.on_conflict_do_update(index_elements=primary_keys, set_=update_dict)
-    session.execute(stmt, rows)
-    session.commit()
+
+    where = None
+    if skip_unchanged:
+        where = or_(
+            *[
+                make_comparable(table.c[name]).is_distinct_from(make_comparable(excluded))
+                for name, excluded in update_dict.items()
+                if name != "created_utc"
+            ]
+        )
+    stmt = stmt.on_conflict_do_update(index_elements=primary_keys, set_=update_dict, where=where)
+
+    if skip_unchanged and len(rows) > 0:
+        # only the rows that are inserted or updated are returned
+        stmt = stmt.returning(table.c[primary_keys[0]])
+        n_written = len(session.execute(stmt, rows).all())
+    else:
+        session.execute(stmt, rows)
+        n_written = len(rows)
+
+    if commit:
+        session.commit()
+
+    return {"written": n_written, "skipped": len(rows) - n_written}
+
+
+def make_comparable(column):
+    """
+    Make a column comparable with IS DISTINCT FROM
+
+    Postgres has no equality operator for json, so json columns are cast to jsonb.
+
+    :param column: sqlalchemy column
+    :return: column, that can be compared
+    """
+    if isinstance(column.type, JSON):
+        return cast(column, JSONB)
+    return column
+
+
+def upsert_in_batches(
+    session: Session,
+    model,
+    rows: List[dict],
+    batch_size: int = 10000,
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
+    """
+    Upsert rows into model, in a few large statements
+
+    The rows are sorted by the primary keys, so that concurrent upserts lock rows
+    in the same order. Rows with the same primary keys are removed, keeping the last one,
+    as postgres can not update the same row twice in one statement.
+    Note that this does not commit the session.
+
+    :param session: sqlalchemy Session
+    :param model: the model
+    :param rows: the rows we are going to update
+    :param batch_size: the maximum number of rows in each upsert statement
+    :param skip_unchanged: Optional (default False), to only update rows that have changed
+    :return: dictionary with the number of rows 'written' and 'skipped'
+    """
+    primary_keys = [key.name for key in inspect(model.__table__).primary_key]
+
+    # remove duplicates, keeping the last one
+    rows = {tuple(row.get(key) for key in primary_keys): row for row in rows}
+
+    # sort by primary keys, missing primary keys are put at the end
+    rows = [
+        rows[key]
+        for key in sorted(rows.keys(), key=lambda key: [(value is None, value) for value in key])
+    ]
+
+    logger.debug(f"Upserting {len(rows)} rows into {model.__tablename__} in batches")
+    counts = {"written": 0, "skipped": 0}
+    for i in range(0, len(rows), batch_size):
+        counts_batch = upsert(
+            session=session,
+            model=model,
+            rows=rows[i : i + batch_size],
+            commit=False,
+            skip_unchanged=skip_unchanged,
+        )
+        counts = add_counts(counts, counts_batch)
+
+    logger.debug(
+        f"Upserted {model.__tablename__}, "
+        f"{counts['written']} rows written and {counts['skipped']} rows skipped"
+    )
+
+    return counts
+
+
+def add_counts(counts: Dict[str, int], counts_other: Dict[str, int]) -> Dict[str, int]:
+    """
+    Add up two dictionaries of 'written' and 'skipped' row counts
+
+    :param counts: dictionary of counts
+    :param counts_other: other dictionary of counts
+    :return: dictionary of counts
+    """
+    return {key: counts[key] + counts_other[key] for key in ["written", "skipped"]}
 
 
 def update_forecast_latest(
@@ -89,7 +220,8 @@ def update_forecast_latest(
     session: Session,
     forecast_historic: Optional[ForecastSQL] = None,
     model_name: Optional[str] = None,
-):
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
     """
     Update the forecast_values table
 
@@ -100,7 +232,8 @@ def update_forecast_latest(
 
     :param forecast:
     :param model_name: the model name to filter on
-    :return:
+    :param skip_unchanged: Optional (default False), to only update rows that have changed
+    :return: dictionary with the number of rows 'written' and 'skipped'
     """
 
     # 1. get forecast object
@@ -110,26 +243,53 @@ def update_forecast_latest(
         )
 
     # 2. create forecast value latest
-    forecast_values = []
-    for forecast_value in forecast.forecast_values:
-        forecast_value_latest = change_forecast_value_to_latest(
-            forecast_value,
-            gsp_id=forecast.location.gsp_id,
-            forecast_id=forecast_historic.id,
-            model_id=forecast.model_id,
-        )
-        forecast_values.append(forecast_value_latest.__dict__)
+    forecast_values = make_forecast_values_latest_rows(
+        forecast=forecast, forecast_historic=forecast_historic
+    )
 
     # update input_data_last_updated
     forecast_historic.input_data_last_updated_id = forecast.input_data_last_updated_id
 
     # upsert forecast values
-    upsert(session=session, model=ForecastValueLatestSQL, rows=forecast_values)
+    counts = upsert(
+        session=session,
+        model=ForecastValueLatestSQL,
+        rows=forecast_values,
+        skip_unchanged=skip_unchanged,
+    )
 
     # update forecast creation time
     forecast_historic.forecast_creation_time = datetime.now(tz=timezone.utc)
     session.commit()
 
+    return counts
+
+
+def make_forecast_values_latest_rows(
+    forecast: ForecastSQL, forecast_historic: ForecastSQL
+) -> List[dict]:
+    """
+    Make the rows for the ForecastValueLatestSQL table from a forecast
+
+    :param forecast: the forecast with the new forecast values
+    :param forecast_historic: the historic forecast that the latest values are linked to
+    :return: list of dictionaries, one for each forecast value
+    """
+
+    gsp_id = forecast.location.gsp_id
+    forecast_values = []
+    for forecast_value in forecast.forecast_values:
+        forecast_values.append(
+            change_forecast_value_to_latest_dict(
+                forecast_value,
+                gsp_id=gsp_id,
+                forecast_id=forecast_historic.id,
+                model_id=forecast.model_id,
+            )
+        )
+
+    return forecast_values
+
 
 def change_forecast_value_to_latest(
     forecast_value: ForecastValueSQL,
@@ -147,8 +307,31 @@ def change_forecast_value_to_latest(
     :return: forecast value latest object
     """
 
+    forecast_value_dict = change_forecast_value_to_latest_dict(
+        forecast_value, gsp_id=gsp_id, forecast_id=forecast_id, model_id=model_id
+    )
+
+    return ForecastValueLatestSQL(**forecast_value_dict)
+
+
+def change_forecast_value_to_latest_dict(
+    forecast_value: ForecastValueSQL,
+    gsp_id: int,
+    forecast_id: Optional[int] = None,
+    model_id: Optional[int] = None,
+) -> dict:
+    """
+    Make a dictionary of the ForecastValueLatestSQL columns from a ForecastValueQL object
+
+    :param forecast_value: forecast value object
+    :param gsp_id: gsp id
+    :param forecast_id: forecast joining id
+    :param model_id: model joining id
+    :return: dictionary of the forecast value latest columns
+    """
+
     forecast_value_dict = {}
-    for v in ["target_time", "expected_power_generation_megawatts", "adjust_mw", "properties"]:
+    for v in FORECAST_VALUE_LATEST_COLUMNS:
         forecast_value_dict[v] = getattr(forecast_value, v)
 
     forecast_value_dict["gsp_id"] = gsp_id
@@ -158,7 +341,7 @@ def change_forecast_value_to_latest(
     if model_id is not None:
         forecast_value_dict["model_id"] = model_id
 
-    return ForecastValueLatestSQL(**forecast_value_dict)
+    return forecast_value_dict
 
 
 def update_all_forecast_latest(
@@ -167,7 +350,10 @@ def update_all_forecast_latest(
     update_national: Optional[bool] = True,
     update_gsp: Optional[bool] = True,
     filter_datetime: Optional[datetime] = None,
-):
+    batch: bool = False,
+    batch_size: int = 10000,
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
     """
     Update all latest forecasts
 
@@ -178,6 +364,15 @@ def update_all_forecast_latest(
     :param update_gsp: Optional (default true), to update all the GSP forecasts
     :param filter_datetime: Optional (default None), to remove all forecasts before this.
         Default is now minus 3 days
+    :param batch: Optional (default False), to upsert the latest values for all the forecasts
+        in a few large statements, and commit once at the end.
+        Otherwise each forecast is upserted and committed separately.
+    :param batch_size: Optional (default 10000), the maximum number of rows in each upsert,
+        when batch=True
+    :param skip_unchanged: Optional (default False), to only update rows where the values are
+        different to the ones in the database. Note that 'created_utc' is then not updated for
+        the rows that are skipped.
+    :return: dictionary with the number of rows 'written' and 'skipped'
     """
 
     if filter_datetime is None:
@@ -196,7 +391,7 @@ def update_all_forecast_latest(
     gsp_ids = get_gsp_ids(include_national=update_national, include_gsps=update_gsp)
     if len(gsp_ids) == 0:
         logger.warning(f"Will not be updating any GSPs as {update_national=} and {update_gsp=}")
-        return
+        return {"written": 0, "skipped": 0}
     logger.debug(f"Will be update GSPs from {min(gsp_ids)} to {max(gsp_ids)}")
 
     # get all latest forecasts
@@ -215,6 +410,8 @@ def update_all_forecast_latest(
 
     logger.debug(f"There are {len(forecasts)} forecasts that we will update")
 
+    forecasts_and_historic = []
+    counts = {"written": 0, "skipped": 0}
     for forecast in forecasts:
         # chose the correct forecast historic
         logger.debug("Getting gsp")
@@ -246,20 +443,308 @@ def update_all_forecast_latest(
 
             logger.debug(f"Found historic for GSP id {gsp_id}")
 
-        update_forecast_latest(
-            forecast=forecast,
+        if batch:
+            forecasts_and_historic.append([forecast, forecast_historic])
+        else:
+            counts_forecast = update_forecast_latest(
+                forecast=forecast,
+                session=session,
+                forecast_historic=forecast_historic,
+                model_name=forecast.model.name,
+                skip_unchanged=skip_unchanged,
+            )
+            counts = add_counts(counts, counts_forecast)
+            session.commit()
+
+    if batch:
+        add_missing_historic_forecasts(
+            forecasts_and_historic=forecasts_and_historic, session=session, model_name=model_name
+        )
+        counts = update_forecast_latest_in_batches(
+            forecasts_and_historic=forecasts_and_historic,
             session=session,
-            forecast_historic=forecast_historic,
-            model_name=forecast.model.name,
+            batch_size=batch_size,
+            skip_unchanged=skip_unchanged,
         )
-        session.commit()
 
     # Delete forecasts older than 3 days from the forecast_latest table
+    remove_forecast_latest_old_data(session=session, filter_datetime=filter_datetime)
+    session.commit()
+    invalidate_result_caches(model_names=[model_name])
+
+    logger.info(
+        f"Updated forecast_value_latest, "
+        f"{counts['written']} rows written and {counts['skipped']} rows skipped"
+    )
+
+    return counts
+
+
+def remove_forecast_latest_old_data(session: Session, filter_datetime: Optional[datetime] = None):
+    """
+    Delete old values from the forecast_value_latest table
+
+    Note this does not commit the session.
+
+    :param session: database session
+    :param filter_datetime: Optional (default now minus 3 days), delete values before this
+    """
+    if filter_datetime is None:
+        filter_datetime = datetime.now(timezone.utc) - timedelta(days=3)
+
     stmt = delete(ForecastValueLatestSQL).where(
         ForecastValueLatestSQL.target_time < filter_datetime
     )
     session.execute(stmt)
+
+
+def add_missing_historic_forecasts(
+    forecasts_and_historic: List[List[Optional[ForecastSQL]]],
+    session: Session,
+    model_name: Optional[str] = None,
+):
+    """
+    Get or make the historic forecasts, that have not been found yet
+
+    The historic forecasts are loaded from the database in one query,
+    and any that are still missing are made. Only one historic forecast is made for each gsp.
+
+    :param forecasts_and_historic: list of [forecast, historic forecast] pairs.
+        The historic forecast can be None, and then it is filled in.
+    :param session: sqlalchemy session
+    :param model_name: the model name to filter on
+    """
+
+    missing_gsp_ids = [
+        forecast.location.gsp_id
+        for forecast, forecast_historic in forecasts_and_historic
+        if forecast_historic is None
+    ]
+    if len(missing_gsp_ids) == 0:
+        return
+
+    logger.debug(f"Getting historic forecasts for {len(missing_gsp_ids)} gsps")
+    forecasts_historic = get_latest_forecast_for_gsps(
+        session=session, historic=True, gsp_ids=missing_gsp_ids, model_name=model_name
+    )
+
+    # take the first one, as they are ordered by created_utc desc
+    forecasts_historic_per_gsp = {}
+    for forecast_historic in forecasts_historic:
+        forecasts_historic_per_gsp.setdefault(forecast_historic.location.gsp_id, forecast_historic)
+
+    for forecast_and_historic in forecasts_and_historic:
+        forecast, forecast_historic = forecast_and_historic
+        if forecast_historic is not None:
+            continue
+
+        gsp_id = forecast.location.gsp_id
+        if gsp_id not in forecasts_historic_per_gsp:
+            logger.debug(f"Could not find historic, so will be creating one (GSP id {gsp_id})")
+            forecasts_historic_per_gsp[gsp_id] = make_historic_forecast(forecast=forecast)
+            session.add(forecasts_historic_per_gsp[gsp_id])
+
+        forecast_and_historic[1] = forecasts_historic_per_gsp[gsp_id]
+
+
+def update_forecast_latest_in_batches(
+    forecasts_and_historic: List[List[ForecastSQL]],
+    session: Session,
+    batch_size: int = 10000,
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
+    """
+    Update the forecast_values_latest table for many forecasts at once
+
+    1. Flush any new historic forecasts, so they get ids
+    2. Make the ForecastValueLatestSQL rows for all forecasts
+    3. Upsert them in a few large statements
+    4. Update the historic forecasts, and commit once
+
+    :param forecasts_and_historic: list of [forecast, historic forecast] pairs
+    :param session: sqlalchemy session
+    :param batch_size: the maximum number of rows in each upsert
+    :param skip_unchanged: Optional (default False), to only update rows that have changed
+    :return: dictionary with the number of rows 'written' and 'skipped'
+    """
+
+    # 1. get ids for the new historic forecasts
+    session.flush()
+
+    # 2. make all the rows
+    forecast_values = []
+    for forecast, forecast_historic in forecasts_and_historic:
+        forecast_values += make_forecast_values_latest_rows(
+            forecast=forecast, forecast_historic=forecast_historic
+        )
+
+    # 3. upsert the rows
+    counts = upsert_in_batches(
+        session=session,
+        model=ForecastValueLatestSQL,
+        rows=forecast_values,
+        batch_size=batch_size,
+        skip_unchanged=skip_unchanged,
+    )
+
+    # 4. update the historic forecasts
+    now = datetime.now(tz=timezone.utc)
+    for forecast, forecast_historic in forecasts_and_historic:
+        forecast_historic.input_data_last_updated_id = forecast.input_data_last_updated_id
+        forecast_historic.forecast_creation_time = now
+
+    session.commit()
+
+    return counts
+
+
+def get_historic_forecast_ids(
+    session: Session, gsp_ids: List[int], model_name: Optional[str] = None
+) -> Dict[int, int]:
+    """
+    Get the ids of the latest historic forecasts for some gsps
+
+    This only loads the ids, not the forecasts and their latest values.
+
+    :param session: database session
+    :param gsp_ids: the gsp ids to get the historic forecasts for
+    :param model_name: Optional (default None), the model name to filter on
+    :return: dictionary of gsp id to historic forecast id
+    """
+
+    query = (
+        select(LocationSQL.gsp_id, ForecastSQL.id)
+        .join(LocationSQL, ForecastSQL.location_id == LocationSQL.id)
+        .where(ForecastSQL.historic.is_(True))
+        .where(LocationSQL.gsp_id.in_(gsp_ids))
+        .order_by(LocationSQL.gsp_id, ForecastSQL.created_utc.desc())
+    )
+    if model_name is not None:
+        query = query.join(MLModelSQL, ForecastSQL.model_id == MLModelSQL.id)
+        query = query.where(MLModelSQL.name == model_name)
+
+    # take the first one, as they are ordered by created_utc desc
+    forecast_historic_ids = {}
+    for gsp_id, forecast_id in session.execute(query):
+        forecast_historic_ids.setdefault(gsp_id, forecast_id)
+
+    return forecast_historic_ids
+
+
+def update_all_forecast_latest_from_rows(
+    session: Session,
+    forecasts_data: List[dict],
+    batch_size: int = 10000,
+    skip_unchanged: bool = False,
+) -> Dict[str, int]:
+    """
+    Update the forecast_value_latest table from forecast value rows
+
+    This is the same as 'update_all_forecast_latest' with batch=True,
+    but uses ids and rows, so it can be used with forecasts from a different session.
+
+    1. Get or make the historic forecasts, for each model
+    2. Upsert the latest forecast values
+    3. Update the historic forecasts
+    4. Delete latest forecast values older than 3 days
+
+    The forecasts can be from different models, as the historic forecasts are found by model.
+
+    :param session: database session
+    :param forecasts_data: list of dictionaries with gsp_id, location_id, model_id, model_name,
+        input_data_last_updated_id and the forecast value rows
+    :param batch_size: Optional (default 10000), the maximum number of rows in each upsert
+    :param skip_unchanged: Optional (default False), to only update rows that have changed
+    :return: dictionary with the number of rows 'written' and 'skipped'
+    """
+
+    if len(forecasts_data) == 0:
+        logger.debug("No forecasts, so not updating the latest values")
+        return {"written": 0, "skipped": 0}
+
+    now = datetime.now(tz=timezone.utc)
+
+    # 1. get historic forecast ids for each model, and make the forecasts if they are missing
+    forecast_historic_ids = {}
+    model_names = sorted({forecast_data["model_name"] for forecast_data in forecasts_data})
+    for model_name in model_names:
+        gsp_ids = [
+            forecast_data["gsp_id"]
+            for forecast_data in forecasts_data
+            if forecast_data["model_name"] == model_name
+        ]
+        forecast_historic_ids_model = get_historic_forecast_ids(
+            session=session, gsp_ids=gsp_ids, model_name=model_name
+        )
+        for gsp_id, forecast_id in forecast_historic_ids_model.items():
+            forecast_historic_ids[(model_name, gsp_id)] = forecast_id
+
+    forecasts_historic_new = {}
+    for forecast_data in forecasts_data:
+        key = (forecast_data["model_name"], forecast_data["gsp_id"])
+        if key not in forecast_historic_ids:
+            logger.debug(
+                f"Could not find historic, so will be creating one "
+                f"(GSP id {key[1]}, model {key[0]})"
+            )
+            forecasts_historic_new[key] = ForecastSQL(
+                historic=True,
+                forecast_creation_time=now,
+                location_id=forecast_data["location_id"],
+                input_data_last_updated_id=forecast_data["input_data_last_updated_id"],
+                model_id=forecast_data["model_id"],
+                initialization_datetime_utc=now,
+            )
+    session.add_all(forecasts_historic_new.values())
+    session.flush()
+    for key, forecast_historic in forecasts_historic_new.items():
+        forecast_historic_ids[key] = forecast_historic.id
+
+    # 2. upsert latest values
+    forecast_values_latest = []
+    for forecast_data in forecasts_data:
+        forecast_historic_id = forecast_historic_ids[
+            (forecast_data["model_name"], forecast_data["gsp_id"])
+        ]
+        for row in forecast_data["rows"]:
+            forecast_value_latest = {
+                column: row[column] for column in FORECAST_VALUE_LATEST_COLUMNS
+            }
+            forecast_value_latest["gsp_id"] = forecast_data["gsp_id"]
+            forecast_value_latest["forecast_id"] = forecast_historic_id
+            forecast_value_latest["model_id"] = forecast_data["model_id"]
+            forecast_values_latest.append(forecast_value_latest)
+
+    counts = upsert_in_batches(
+        session=session,
+        model=ForecastValueLatestSQL,
+        rows=forecast_values_latest,
+        batch_size=batch_size,
+        skip_unchanged=skip_unchanged,
+    )
+
+    # 3. update historic forecasts, sorted by id, so concurrent updates lock in the same order
+    historic_updates = sorted(
+        [
+            {
+                "id": forecast_historic_ids[(forecast_data["model_name"], forecast_data["gsp_id"])],
+                "input_data_last_updated_id": forecast_data["input_data_last_updated_id"],
+                "forecast_creation_time": now,
+            }
+            for forecast_data in forecasts_data
+        ],
+        key=lambda historic_update: historic_update["id"],
+    )
+    session.execute(update(ForecastSQL), historic_updates)
+
+    # 4. Delete forecasts older than 3 days from the forecast_latest table
+    remove_forecast_latest_old_data(session=session)
     session.commit()
+    invalidate_result_caches(
+        model_names=[forecast_data["model_name"] for forecast_data in forecasts_data]
+    )
+
+    return counts
 
 
 def get_gsp_ids(include_national: bool = True, include_gsps: bool = True) -> List[int]:
@@ -299,7 +784,10 @@ def change_forecast_value_to_forecast_last_7_days(
 
 
 def remove_non_distinct_forecast_values(
-    session: Session, start_datetime: datetime, end_datetime: datetime
+    session: Session,
+    start_datetime: datetime,
+    end_datetime: Optional[datetime] = None,
+    target_times: Optional[List[datetime]] = None,
 ):
     """
     Remove any non-distinct forecast values
@@ -311,24 +799,45 @@ def remove_non_distinct_forecast_values(
     - expected_power_generation_megawatts
 
     We keep the first value, and remove and values from later on.
+    This is done in one statement, by numbering the values in each group with a window function,
+    and deleting any value that is not the first one.
 
     :param session: database session
     :param start_datetime: start datetime
-    :param end_datetime: end_dateimte
+    :param end_datetime: Optional end datetime
+    :param target_times: Optional list of target times. If given, only these target times are
+        looked at. This is useful to only look at the target times that have just been saved.
     """
 
-    logger.debug(f"Removing non distinct forecast values for {start_datetime} to {end_datetime}")
-
-    # 1. sub query, these are the values we want to keep
-    sub_query = session.query(ForecastValueSevenDaysSQL.uuid)
+    logger.debug(
+        f"Removing non distinct forecast values for {start_datetime} to {end_datetime}, "
+        f"for {'all' if target_times is None else len(target_times)} target times"
+    )
 
-    # distinct
-    sub_query = sub_query.distinct(
-        ForecastValueSevenDaysSQL.target_time,
-        ForecastSQL.location_id,
-        MLModelSQL.name,
-        ForecastValueSevenDaysSQL.expected_power_generation_megawatts,
+    def filter_on_time(query):
+        """Filter the query on target time"""
+        query = query.filter(ForecastValueSevenDaysSQL.target_time >= start_datetime)
+        if end_datetime is not None:
+            query = query.filter(ForecastValueSevenDaysSQL.target_time < end_datetime)
+        if target_times is not None:
+            query = query.filter(ForecastValueSevenDaysSQL.target_time.in_(target_times))
+        return query
+
+    # 1. sub query, number the values in each distinct group, the first one is kept
+    row_number = (
+        func.row_number()
+        .over(
+            partition_by=[
+                ForecastValueSevenDaysSQL.target_time,
+                ForecastSQL.location_id,
+                MLModelSQL.name,
+                ForecastValueSevenDaysSQL.expected_power_generation_megawatts,
+            ],
+            order_by=ForecastValueSevenDaysSQL.created_utc,  # get the first one
+        )
+        .label("row_number")
     )
+    sub_query = session.query(ForecastValueSevenDaysSQL.uuid, row_number)
 
     # join
     sub_query = sub_query.join(ForecastSQL)
@@ -336,29 +845,21 @@ def remove_non_distinct_forecast_values(
     sub_query = sub_query.join(MLModelSQL)
 
     # filter on time
-    sub_query = sub_query.filter(ForecastValueSevenDaysSQL.target_time >= start_datetime)
-    sub_query = sub_query.filter(ForecastValueSevenDaysSQL.target_time < end_datetime)
-
-    # order by
-    sub_query = sub_query.order_by(
-        ForecastValueSevenDaysSQL.target_time,
-        ForecastSQL.location_id,
-        MLModelSQL.name,
-        ForecastValueSevenDaysSQL.expected_power_generation_megawatts,
-        ForecastValueSevenDaysSQL.created_utc,  # get the first one
-    )
+    sub_query = filter_on_time(sub_query)
 
     sub_query = sub_query.subquery()
 
+    # these are the values we want to remove
+    remove_query = select(sub_query.c.uuid).where(sub_query.c.row_number > 1)
+
     # 2. main query
     query = session.query(ForecastValueSevenDaysSQL)
 
-    # filter on tiem
-    query = query.filter(ForecastValueSevenDaysSQL.target_time >= start_datetime)
-    query = query.filter(ForecastValueSevenDaysSQL.target_time < end_datetime)
+    # filter on time
+    query = filter_on_time(query)
 
-    # select uuid not in subquery
-    query = query.filter(ForecastValueSevenDaysSQL.uuid.notin_(sub_query))
+    # select uuid in subquery
+    query = query.filter(ForecastValueSevenDaysSQL.uuid.in_(remove_query))
 
     # delete all results
     query.delete()
@@ -368,34 +869,409 @@ def add_forecast_last_7_days_and_remove_old_data(
     forecast_values: List[ForecastValueSevenDaysSQL],
     session: Session,
     remove_non_distinct: bool = False,
+    remove_old_data: bool = True,
 ):
     """
     Add forecast values and delete old values
 
+    For postgres, the table is partitioned by day on target_time,
+    so old data is removed by dropping the partitions that have expired.
+    The partition for the day of 'now - 7 days' is kept until the whole day has expired,
+    so the table can have up to 8 days of data.
+
     :param forecast_values:
     :param session:
     :param remove_non_distinct: Optional (default False), to only keep distinct forecast values
         If the last saved forecast value is the same as the current one, it will not be saved
+    :param remove_old_data: Optional (default True), to remove data older than 7 days
     :return:
     """
 
+    now_minus_7_days = get_forecast_last_7_days_limit()
+
+    # make sure there are partitions for the forecast values we are adding
+    if session.get_bind().dialect.name == "postgresql":
+        days = {
+            datetime_with_utc(forecast_value.target_time).date()
+            for forecast_value in forecast_values
+        }
+        make_forecast_value_seven_days_partitions(
+            session=session,
+            days=[day for day in days if day >= now_minus_7_days.date()],
+        )
+
     # add forecast
     session.add_all(forecast_values)
 
-    # remove old data
-    now_minus_7_days = datetime.now(tz=timezone.utc) - timedelta(days=7)
-    now_minus_7_days = now_minus_7_days.replace(minute=0, second=0, microsecond=0)
+    # remove any duplicate forecast values,
+    # only the target times we have just added can have new duplicates
+    if remove_non_distinct:
+        target_times = list({forecast_value.target_time for forecast_value in forecast_values})
+        remove_non_distinct_forecast_values(
+            session=session, start_datetime=now_minus_7_days, target_times=target_times
+        )
+
+    if remove_old_data:
+        remove_forecast_last_7_days_old_data(session=session, datetime_limit=now_minus_7_days)
+
+    session.commit()
+
+
+def add_forecast_last_7_days_from_forecast_values_and_remove_old_data(
+    forecast_ids: List[int],
+    session: Session,
+    remove_non_distinct: bool = False,
+    remove_old_data: bool = True,
+):
+    """
+    Copy forecast values from the forecast_value table to the seven days table, and delete old data
+
+    The values are copied inside the database, using
+    'INSERT INTO forecast_value_last_seven_days SELECT ... FROM forecast_value',
+    so the forecast values don't have to be made and sent to the database again.
+    Only values from the last 7 days are copied.
+
+    1. Get the target time range of the forecast values
+    2. Make partitions for these days
+    3. Copy the forecast values
+    4. Remove non-distinct values, if needed
+    5. Remove old data, if needed
+
+    :param forecast_ids: list of forecast ids, the forecast values of these are copied.
+        The forecast values must already be in the forecast_value table
+    :param session: database session
+    :param remove_non_distinct: Optional (default False), to only keep distinct forecast values
+        If the last saved forecast value is the same as the current one, it will not be saved
+    :param remove_old_data: Optional (default True), to remove data older than 7 days
+    """
+
+    now_minus_7_days = get_forecast_last_7_days_limit()
 
-    # remove any duplicate forecast values
+    if len(forecast_ids) == 0:
+        logger.debug("No forecasts to add to the seven days table")
+        return
+
+    # 1. get target time range
+    query = select(func.min(ForecastValueSQL.target_time), func.max(ForecastValueSQL.target_time))
+    query = query.where(ForecastValueSQL.forecast_id.in_(forecast_ids))
+    query = query.where(ForecastValueSQL.target_time >= now_minus_7_days)
+    start_target_time, end_target_time = session.execute(query).one()
+    if start_target_time is None:
+        logger.debug("No forecast values in the last 7 days to add to the seven days table")
+        if remove_old_data:
+            remove_forecast_last_7_days_old_data(session=session, datetime_limit=now_minus_7_days)
+        session.commit()
+        return
+
+    # 2. make partitions
+    if session.get_bind().dialect.name == "postgresql":
+        start_day = datetime_with_utc(start_target_time).date()
+        end_day = datetime_with_utc(end_target_time).date()
+        days = [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+        make_forecast_value_seven_days_partitions(session=session, days=days)
+
+    # 3. copy forecast values
+    columns = [
+        column
+        for column in ForecastValueSevenDaysSQL.__table__.columns.keys()
+        if column in ForecastValueSQL.__table__.columns.keys()
+    ]
+    select_query = select(*[ForecastValueSQL.__table__.c[column] for column in columns])
+    select_query = select_query.where(ForecastValueSQL.forecast_id.in_(forecast_ids))
+    select_query = select_query.where(ForecastValueSQL.target_time >= now_minus_7_days)
+    insert_query = ForecastValueSevenDaysSQL.__table__.insert().from_select(columns, select_query)
+    result = session.execute(insert_query)
+    logger.debug(f"Copied {result.rowcount} forecast values to the seven days table")
+
+    # 4. remove any duplicate forecast values
     if remove_non_distinct:
-        for i in range(0, 24 * 10):
-            start_datetime = now_minus_7_days + timedelta(hours=i)
-            end_datetime = start_datetime + timedelta(hours=1)
-            remove_non_distinct_forecast_values(session, start_datetime, end_datetime)
+        remove_non_distinct_forecast_values(session=session, start_datetime=start_target_time)
 
-    logger.debug(f"Removing data before {now_minus_7_days}")
-    query = session.query(ForecastValueSevenDaysSQL)
-    query = query.where(ForecastValueSevenDaysSQL.target_time < now_minus_7_days)
-    query.delete()
+    # 5. remove old data
+    if remove_old_data:
+        remove_forecast_last_7_days_old_data(session=session, datetime_limit=now_minus_7_days)
 
     session.commit()
+
+
+def add_forecast_last_7_days_rows_and_remove_old_data(
+    session: Session,
+    rows: List[dict],
+    remove_non_distinct: bool = False,
+):
+    """
+    Add forecast value rows to the last seven days table and delete old values
+
+    This is the same as 'add_forecast_last_7_days_and_remove_old_data',
+    but inserts rows, rather than sqlalchemy objects.
+
+    :param session: database session
+    :param rows: forecast value rows
+    :param remove_non_distinct: Optional (default False), to only keep distinct forecast values
+    """
+
+    now_minus_7_days = get_forecast_last_7_days_limit()
+    rows = [row for row in rows if datetime_with_utc(row["target_time"]) >= now_minus_7_days]
+
+    if len(rows) > 0:
+        if session.get_bind().dialect.name == "postgresql":
+            days = {datetime_with_utc(row["target_time"]).date() for row in rows}
+            make_forecast_value_seven_days_partitions(session=session, days=days)
+
+        session.execute(insert(ForecastValueSevenDaysSQL.__table__), rows)
+
+        if remove_non_distinct:
+            target_times = list({row["target_time"] for row in rows})
+            remove_non_distinct_forecast_values(
+                session=session, start_datetime=now_minus_7_days, target_times=target_times
+            )
+
+    remove_forecast_last_7_days_old_data(session=session, datetime_limit=now_minus_7_days)
+    session.commit()
+
+
+def get_forecast_last_7_days_limit() -> datetime:
+    """
+    Get the datetime before which data is removed from the last seven days table
+
+    :return: now minus 7 days, floored to the hour
+    """
+    now_minus_7_days = datetime.now(tz=timezone.utc) - timedelta(days=7)
+    return now_minus_7_days.replace(minute=0, second=0, microsecond=0)
+
+
+def remove_forecast_last_7_days_old_data(session: Session, datetime_limit: datetime):
+    """
+    Remove old data from the forecast_value_last_seven_days table
+
+    For postgres, the expired partitions are dropped,
+    for other databases the old values are deleted.
+    Note this does not commit the session.
+
+    :param session: database session
+    :param datetime_limit: remove data before this datetime
+    """
+
+    logger.debug(f"Removing data before {datetime_limit}")
+    if session.get_bind().dialect.name == "postgresql":
+        drop_forecast_value_seven_days_partitions(session=session, datetime_limit=datetime_limit)
+    else:
+        query = session.query(ForecastValueSevenDaysSQL)
+        query = query.where(ForecastValueSevenDaysSQL.target_time < datetime_limit)
+        query.delete()
+
+
+def datetime_with_utc(datetime_value: datetime) -> datetime:
+    """Make sure a datetime has a timezone, naive datetimes are assumed to be UTC"""
+    if datetime_value.tzinfo is None:
+        return datetime_value.replace(tzinfo=timezone.utc)
+    return datetime_value.astimezone(timezone.utc)
+
+
+def get_partition_names(session: Session, parent_name: str) -> List[str]:
+    """
+    Get the names of the partitions of a table, in postgres
+
+    :param session: database session
+    :param parent_name: the name of the partitioned table
+    :return: sorted list of the partition table names, empty if the table is not partitioned
+    """
+
+    query = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent_name"
+    )
+    return sorted(session.execute(query, {"parent_name": parent_name}).scalars().all())
+
+
+def get_forecast_value_seven_days_partitions(session: Session) -> Dict[date, str]:
+    """
+    Get the daily partitions of the forecast_value_last_seven_days table
+
+    The default partition is not included.
+
+    :param session: database session
+    :return: dictionary of the day of the partition and the partition table name
+    """
+
+    parent_name = ForecastValueSevenDaysSQL.__tablename__
+    partition_names = get_partition_names(session=session, parent_name=parent_name)
+
+    partitions = {}
+    for partition_name in partition_names:
+        suffix = partition_name[len(parent_name) + 1 :]
+        try:
+            day = datetime.strptime(suffix, "%Y_%m_%d").date()
+        except ValueError:
+            # this is the default partition, or a partition made by something else
+            continue
+        partitions[day] = partition_name
+
+    return partitions
+
+
+def make_forecast_value_seven_days_partitions(session: Session, days: Iterable[date]):
+    """
+    Make daily partitions of the forecast_value_last_seven_days table, if they don't exist
+
+    Any values in the default partition for these days are moved to the new partition.
+    Note this does not commit the session. 'save' runs this in its own transaction,
+    before the values are saved, so the partitions are kept if the save fails.
+
+    :param session: database session
+    :param days: the days to make partitions for
+    """
+
+    # flush, so any pending values are in the database before they are moved
+    session.flush()
+    existing_partitions = get_forecast_value_seven_days_partitions(session=session)
+    connection = session.connection()
+    parent_name = ForecastValueSevenDaysSQL.__tablename__
+
+    for day in sorted(set(days)):
+        if day in existing_partitions:
+            continue
+
+        logger.debug(f"Making partition of {parent_name} for {day}")
+        day_start = datetime.combine(day, datetime.min.time(), timezone.utc)
+        create_partition_from_default(
+            connection=connection,
+            model=ForecastValueSevenDaysSQL,
+            partition_name=ForecastValueSevenDaysSQL.get_partition_name(day.strftime("%Y_%m_%d")),
+            start=day_start,
+            end=day_start + timedelta(days=1),
+        )
+
+
+def create_partition_from_default(
+    connection: Connection, model, partition_name: str, start: datetime, end: datetime
+):
+    """
+    Make a partition, if it does not exist, and move any values for it out of the default partition
+
+    The partition is made with 'CREATE TABLE ... PARTITION OF', not from a sqlalchemy model,
+    so partitions made while running are not added to the metadata, and can be dropped and
+    made again. Postgres can not make a partition if the default partition has values in its
+    range, so these values are moved to a temporary table, and put back once the partition is made.
+    Note this does not commit.
+
+    :param connection: database connection
+    :param model: the partitioned sqlalchemy model, which has a default partition
+    :param partition_name: the name of the partition table
+    :param start: the start of the partition
+    :param end: the end of the partition (exclusive)
+    """
+
+    parent_name = model.__tablename__
+    default_name = model.get_partition_name("default")
+    temp_name = f"moved_{parent_name}"
+    columns = ", ".join(model.__table__.columns.keys())
+
+    # 1. move any values in the range out of the default partition
+    in_partition = f"{model.partitioned_by} >= :start AND {model.partitioned_by} < :end"
+    parameters = {"start": start, "end": end}
+    n_values = connection.execute(
+        text(f"SELECT COUNT(*) FROM {default_name} WHERE {in_partition}"),
+        parameters,
+    ).scalar()
+    if n_values > 0:
+        logger.debug(f"Moving {n_values} values from {default_name}")
+        connection.execute(text(f"CREATE TEMP TABLE {temp_name} (LIKE {parent_name})"))
+        connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default_name} WHERE {in_partition} "
+                f"RETURNING {columns}) "
+                f"INSERT INTO {temp_name} ({columns}) SELECT {columns} FROM moved"
+            ),
+            parameters,
+        )
+
+    # 2. make the partition
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name} PARTITION OF {parent_name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+
+    # 3. put the moved values back
+    if n_values > 0:
+        connection.execute(
+            text(f"INSERT INTO {parent_name} ({columns}) SELECT {columns} FROM {temp_name}")
+        )
+        connection.execute(text(f"DROP TABLE {temp_name}"))
+
+
+def drop_forecast_value_seven_days_partitions(session: Session, datetime_limit: datetime):
+    """
+    Drop the daily partitions of forecast_value_last_seven_days that are before a datetime
+
+    A partition is only dropped if all of the day is before 'datetime_limit'.
+    Values in the default partition that are before 'datetime_limit' are deleted.
+    Note this does not commit the session.
+
+    :param session: database session
+    :param datetime_limit: drop all data before this datetime
+    """
+
+    datetime_limit = datetime_with_utc(datetime_limit)
+    session.flush()
+    connection = session.connection()
+
+    # 1. drop old partitions
+    existing_partitions = get_forecast_value_seven_days_partitions(session=session)
+    for day, partition_name in sorted(existing_partitions.items()):
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), timezone.utc)
+        if day_end > datetime_limit:
+            continue
+
+        logger.debug(f"Dropping partition {partition_name}")
+        connection.execute(text(f"DROP TABLE {partition_name}"))
+
+    # 2. remove old data from the default partition
+    default_name = ForecastValueSevenDaysSQL.get_partition_name("default")
+    connection.execute(
+        text(f"DELETE FROM {default_name} WHERE target_time < :datetime_limit"),
+        {"datetime_limit": datetime_limit},
+    )
+
+
+def update_forecast_value_seven_days_partitions(
+    session: Session,
+    now: Optional[datetime] = None,
+    make_days_ahead: int = 2,
+    retention_days: int = 7,
+):
+    """
+    Make upcoming partitions and drop expired partitions of forecast_value_last_seven_days
+
+    1. Make daily partitions from 'now - retention_days' to 'now + make_days_ahead'
+    2. Drop the partitions that are all before 'now - retention_days'
+
+    This can be run on a schedule, so that partitions are made before they are needed.
+    Note this does not commit the session.
+
+    :param session: database session
+    :param now: Optional (default now), the datetime to make and drop partitions from
+    :param make_days_ahead: Optional (default 2), number of days ahead to make partitions for
+    :param retention_days: Optional (default 7), number of days of data to keep
+    """
+
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+    now = datetime_with_utc(now)
+
+    datetime_limit = now - timedelta(days=retention_days)
+    datetime_limit = datetime_limit.replace(minute=0, second=0, microsecond=0)
+
+    # 1. make partitions
+    days = [
+        (datetime_limit + timedelta(days=i)).date()
+        for i in range(retention_days + make_days_ahead + 1)
+    ]
+    make_forecast_value_seven_days_partitions(session=session, days=days)
+
+    # 2. drop old partitions
+    drop_forecast_value_seven_days_partitions(session=session, datetime_limit=datetime_limit)
@@ -0,0 +1,180 @@
+"""Keep the yield tables, and their latest tables, up to date
+
+The gsp_yield table is partitioned by month, and the monthly partitions are made here.
+The gsp_yield_latest and pv_yield_latest tables are kept up to date by postgres triggers,
+and the functions here make them again from the yield tables, when the triggers are not run.
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm.session import Session
+
+from nowcasting_datamodel.models.gsp import GSPYieldSQL
+from nowcasting_datamodel.save.update import (
+    create_partition_from_default,
+    datetime_with_utc,
+    get_partition_names,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_gsp_yield_partitions(session: Session) -> Dict[date, str]:
+    """
+    Get the monthly partitions of the gsp_yield table
+
+    The default partition is not included.
+
+    :param session: database session
+    :return: dictionary of the first day of the month of the partition and the partition name
+    """
+
+    parent_name = GSPYieldSQL.__tablename__
+    partition_names = get_partition_names(session=session, parent_name=parent_name)
+
+    partitions = {}
+    for partition_name in partition_names:
+        suffix = partition_name[len(parent_name) + 1 :]
+        try:
+            month = datetime.strptime(suffix, "%Y_%m").date()
+        except ValueError:
+            # this is the default partition, or a partition made by something else
+            continue
+        partitions[month] = partition_name
+
+    return partitions
+
+
+def make_gsp_yield_month_partitions(session: Session, months: Iterable[date]):
+    """
+    Make monthly partitions of the gsp_yield table, if they don't exist
+
+    Any values in the default partition for these months are moved to the new partition.
+    Note this does not commit the session.
+
+    :param session: database session
+    :param months: the months to make partitions for, any day in the month can be given
+    """
+
+    session.flush()
+    existing_partitions = get_gsp_yield_partitions(session=session)
+    connection = session.connection()
+
+    for month in sorted({month.replace(day=1) for month in months}):
+        if month in existing_partitions:
+            continue
+
+        logger.debug(f"Making partition of {GSPYieldSQL.__tablename__} for {month}")
+        next_month = (month + timedelta(days=32)).replace(day=1)
+
+        # datetime_utc does not have a timezone
+        create_partition_from_default(
+            connection=connection,
+            model=GSPYieldSQL,
+            partition_name=GSPYieldSQL.get_partition_name(month.strftime("%Y_%m")),
+            start=datetime.combine(month, datetime.min.time()),
+            end=datetime.combine(next_month, datetime.min.time()),
+        )
+
+
+def update_gsp_yield_partitions(
+    session: Session,
+    now: Optional[datetime] = None,
+    make_months_ahead: int = 12,
+):
+    """
+    Make the monthly partitions of gsp_yield that are needed
+
+    1. Make partitions for the months that have values in the default partition
+    2. Make partitions from the month of 'now' to 'make_months_ahead' months after
+
+    Only the default partition is made with the table, so this should be run on a schedule,
+    for example daily, so partitions are made before they are needed. Values saved before their
+    partition is made go in the default partition, which is slower to query, and they are moved
+    to their partition when it is made. Old partitions are kept.
+    Note this does not commit the session.
+
+    :param session: database session
+    :param now: Optional (default now), the datetime to make partitions from
+    :param make_months_ahead: Optional (default 12), number of months ahead to make partitions for
+    """
+
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+
+    # 1. get the months of the values in the default partition
+    session.flush()
+    default_name = GSPYieldSQL.get_partition_name("default")
+    months = [
+        month.date()
+        for month in session.execute(
+            text(f"SELECT DISTINCT date_trunc('month', datetime_utc) FROM {default_name}")
+        ).scalars()
+    ]
+
+    # 2. add the months from now
+    month = datetime_with_utc(now).date().replace(day=1)
+    for _ in range(make_months_ahead + 1):
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+
+    make_gsp_yield_month_partitions(session=session, months=months)
+
+
+def refresh_gsp_yield_latest(session: Session):
+    """
+    Make the gsp_yield_latest table again from the gsp_yield table
+
+    The gsp_yield_latest table is kept up to date by a trigger when gsp yields are inserted,
+    updated or deleted. This can be used to fill the table the first time, or after the gsp_yield
+    table is truncated, as postgres does not run row triggers for TRUNCATE.
+    Note this does not commit the session.
+
+    :param session: database session
+    """
+
+    latest_query = (
+        "SELECT DISTINCT ON (location_id, regime) id, location_id, regime, datetime_utc, "
+        "created_utc FROM gsp_yield WHERE location_id IS NOT NULL AND regime IS NOT NULL {where} "
+        "ORDER BY location_id, regime, datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST"
+    )
+
+    session.execute(text("DELETE FROM gsp_yield_latest"))
+    session.execute(
+        text(
+            "INSERT INTO gsp_yield_latest (location_id, regime, gsp_yield_id, datetime_utc, "
+            "created_utc, capacity_gsp_yield_id, capacity_datetime_utc, capacity_created_utc) "
+            "SELECT latest.location_id, latest.regime, latest.id, latest.datetime_utc, "
+            "latest.created_utc, capacity.id, capacity.datetime_utc, capacity.created_utc "
+            f"FROM ({latest_query.format(where='')}) latest "
+            f"LEFT JOIN ({latest_query.format(where='AND capacity_mwp + 1 > capacity_mwp')}) "
+            "capacity ON capacity.location_id = latest.location_id "
+            "AND capacity.regime = latest.regime"
+        )
+    )
+
+
+def refresh_pv_yield_latest(session: Session):
+    """
+    Make the pv_yield_latest table again from the pv_yield table
+
+    The pv_yield_latest table is kept up to date by a trigger when pv yields are inserted,
+    updated or deleted. This can be used to fill the table the first time, or after the pv_yield
+    table is truncated, as postgres does not run row triggers for TRUNCATE.
+    Note this does not commit the session.
+
+    :param session: database session, for the pv database
+    """
+
+    session.execute(text("DELETE FROM pv_yield_latest"))
+    session.execute(
+        text(
+            "INSERT INTO pv_yield_latest (pv_system_id, pv_yield_id, datetime_utc, created_utc) "
+            "SELECT DISTINCT ON (pv_system_id) pv_system_id, id, datetime_utc, created_utc "
+            "FROM pv_yield WHERE pv_system_id IS NOT NULL "
+            "ORDER BY pv_system_id, datetime_utc DESC NULLS LAST, created_utc DESC NULLS LAST"
+        )
+    )
@@ -1,9 +1,36 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-from nowcasting_datamodel.models.gsp import GSPYield
+from sqlalchemy import text
+
+from nowcasting_datamodel.models.gsp import GSPYield, GSPYieldSQL, LocationSQL
+from nowcasting_datamodel.read.read_gsp import get_gsp_yield
 
 
 def test_gsp_validation():
     gsp_yield_1 = GSPYield(datetime_utc=datetime(2022, 1, 1), solar_generation_kw=-10)
 
     assert gsp_yield_1.solar_generation_kw == 0
+
+
+def test_gsp_yield_datetime_utc(db_session):
+    location = LocationSQL(gsp_id=1, label="GSP_1")
+    tz = timezone(timedelta(hours=1))
+    gsp_yield = GSPYieldSQL(
+        datetime_utc=datetime(2022, 1, 1, 13, tzinfo=tz), solar_generation_kw=1, regime="in-day"
+    )
+    gsp_yield.location = location
+    db_session.add(gsp_yield)
+    db_session.commit()
+
+    # the column has no timezone, so the datetime is stored as naive UTC
+    stored = db_session.execute(text("SELECT datetime_utc FROM gsp_yield")).scalar_one()
+    assert stored == datetime(2022, 1, 1, 12)
+
+    # and read as timezone aware UTC, without making the object dirty
+    db_session.expire_all()
+    gsp_yields = get_gsp_yield(
+        session=db_session, gsp_ids=[1], start_datetime_utc=datetime(2022, 1, 1)
+    )
+    assert gsp_yields[0].datetime_utc == datetime(2022, 1, 1, 12, tzinfo=timezone.utc)
+    assert gsp_yields[0].datetime_utc.tzinfo == timezone.utc
+    assert len(db_session.dirty) == 0
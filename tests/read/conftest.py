@@ -1,6 +1,7 @@
 from datetime import datetime
 
 import pytest
+from sqlalchemy import event
 
 from nowcasting_datamodel.models import PVSystem, PVSystemSQL, PVYield
 
@@ -59,3 +60,17 @@ def pv_yields_and_systems(db_session_pv):
         "pv_yields": [pv_yield_1_sql, pv_yield_2_sql, pv_yield_3_sql],
         "pv_systems": [pv_system_sql_1, pv_system_sql_2],
     }
+
+
+@pytest.fixture()
+def statements(db_session):
+    """List of the sql statements executed"""
+    statements = []
+
+    def add_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", add_statement)
+    yield statements
+    event.remove(bind, "before_cursor_execute", add_statement)
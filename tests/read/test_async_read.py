@@ -0,0 +1,86 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from nowcasting_datamodel.connection import make_async_url
+from nowcasting_datamodel.fake import N_FAKE_FORECASTS, make_fake_forecasts
+from nowcasting_datamodel.models import GSPYield, InputDataLastUpdatedSQL
+from nowcasting_datamodel.read.async_read import (
+    get_all_gsp_ids_latest_forecast,
+    get_forecast_values,
+    get_latest_forecast,
+    get_latest_gsp_yield,
+    get_latest_input_data_last_updated,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("DB_URL", "").startswith("postgresql"), reason="async read needs postgres"
+)
+
+
+@pytest.fixture()
+def forecasts_committed(db_connection):
+    """Make fake forecasts and gsp yields that are committed, as the async reads use new connections"""
+    with db_connection.get_session() as session:
+        forecasts = make_fake_forecasts(gsp_ids=list(range(0, 10)), session=session)
+        gsp_yield = GSPYield(
+            datetime_utc=datetime(2022, 1, 2), solar_generation_kw=1, capacity_mwp=1
+        ).to_orm()
+        gsp_yield.location = forecasts[1].location
+        session.add_all(forecasts)
+        session.add(gsp_yield)
+        session.commit()
+
+
+async def async_read(db_connection, read_functions_and_kwargs: list) -> list:
+    """Run the read functions at the same time"""
+    engine = create_async_engine(make_async_url(db_connection.url))
+    try:
+        return await asyncio.gather(
+            *[
+                read_function(engine=engine, **kwargs)
+                for read_function, kwargs in read_functions_and_kwargs
+            ]
+        )
+    finally:
+        await engine.dispose()
+
+
+def test_async_read(db_connection, forecasts_committed):
+    forecasts, gsp_yields, input_data_last_updated, forecast = asyncio.run(
+        async_read(
+            db_connection=db_connection,
+            read_functions_and_kwargs=[
+                (get_all_gsp_ids_latest_forecast, dict(preload_children=True)),
+                (get_latest_gsp_yield, dict(gsps=[1])),
+                (get_latest_input_data_last_updated, dict()),
+                (get_latest_forecast, dict(gsp_id=1)),
+            ],
+        )
+    )
+
+    # the children are preloaded, so they can be used after the session is closed
+    assert len(forecasts) == 10
+    assert [forecast.location.gsp_id for forecast in forecasts] == list(range(0, 10))
+    assert len(forecasts[0].forecast_values) == N_FAKE_FORECASTS
+
+    assert len(gsp_yields) == 1
+    assert gsp_yields[0].solar_generation_kw == 1
+    assert gsp_yields[0].datetime_utc == datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+    assert isinstance(input_data_last_updated, InputDataLastUpdatedSQL)
+    assert forecast.location_id == forecasts[1].location_id
+
+
+def test_async_read_forecast_values(db_connection, forecasts_committed):
+    (forecast_values,) = asyncio.run(
+        async_read(
+            db_connection=db_connection,
+            read_functions_and_kwargs=[(get_forecast_values, dict(gsp_ids=[1], as_frame=True))],
+        )
+    )
+
+    assert len(forecast_values) == N_FAKE_FORECASTS
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timezone
+
+from nowcasting_datamodel.read.cache import (
+    ResultCache,
+    ceil_to_cadence,
+    floor_to_cadence,
+    invalidate_result_caches,
+    make_cache_key,
+)
+
+
+def test_result_cache_get_set():
+    cache = ResultCache()
+    assert cache.get("key") is None
+
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+
+
+def test_result_cache_ttl():
+    cache = ResultCache(ttl_seconds=0.01)
+    cache.set("key", b"value")
+
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert len(cache.results) == 0
+
+
+def test_result_cache_lru():
+    cache = ResultCache(max_size=2)
+    cache.set("key_1", b"value_1")
+    cache.set("key_2", b"value_2")
+
+    # use key_1, so key_2 is the least recently used
+    assert cache.get("key_1") == b"value_1"
+    cache.set("key_3", b"value_3")
+
+    assert cache.get("key_1") == b"value_1"
+    assert cache.get("key_2") is None
+    assert cache.get("key_3") == b"value_3"
+
+
+def test_result_cache_invalidate_model_name():
+    cache = ResultCache()
+    cache.set("key_1", b"value_1", model_name="model_1")
+    cache.set("key_2", b"value_2", model_name="model_2")
+    cache.set("key_3", b"value_3")
+
+    invalidate_result_caches(model_names=["model_1"])
+
+    assert cache.get("key_1") is None
+    assert cache.get("key_2") == b"value_2"
+    assert cache.get("key_3") is None
+
+    invalidate_result_caches()
+    assert cache.get("key_2") is None
+
+
+def test_round_to_cadence():
+    value = datetime(2024, 1, 1, 12, 10, 5, tzinfo=timezone.utc)
+    assert floor_to_cadence(value) == datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert ceil_to_cadence(value) == datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+
+    # naive datetimes are assumed to be UTC, and exact times are not changed
+    value = datetime(2024, 1, 1, 12, 30)
+    assert floor_to_cadence(value) == datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+    assert ceil_to_cadence(value) == datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+
+    assert floor_to_cadence(None) is None
+
+
+def test_make_cache_key():
+    key_1 = make_cache_key("f", gsp_ids=[1, 2], start=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    key_2 = make_cache_key("f", start=datetime(2024, 1, 1, tzinfo=timezone.utc), gsp_ids=[1, 2])
+    key_3 = make_cache_key("f", gsp_ids=[1, 3], start=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert key_1 == key_2
+    assert key_1 != key_3
@@ -1,6 +1,8 @@
 import logging
 from datetime import datetime, timedelta, timezone
 
+import numpy as np
+import pandas as pd
 import pytest
 from freezegun import freeze_time
 
@@ -24,21 +26,25 @@ from nowcasting_datamodel.models.forecast import (
     ForecastValueLatestSQL,
     ForecastValueSQL,
 )
+from nowcasting_datamodel.read.cache import ResultCache, invalidate_result_caches
 from nowcasting_datamodel.read.read import (
+    forecast_value_columns,
     get_all_gsp_ids_latest_forecast,
     get_all_locations,
     get_forecast_values,
     get_forecast_values_latest,
     get_latest_forecast,
     get_latest_forecast_created_utc,
+    get_latest_forecast_for_gsps,
     get_latest_input_data_last_updated,
     get_latest_national_forecast,
     get_latest_status,
     get_location,
     get_pv_system,
+    iter_forecast_values,
     update_latest_input_data_last_updated,
 )
-from nowcasting_datamodel.save.save import save_pv_system
+from nowcasting_datamodel.save.save import save, save_pv_system
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +126,56 @@ def test_get_forecast_values(db_session, forecasts):
     assert forecast_values_read[0] == forecasts[-1].forecast_values[0]
 
 
+def test_get_forecast_values_as_frame(db_session, forecasts):
+    forecast_values = get_forecast_values(session=db_session, gsp_ids=[1, 2], as_frame=True)
+    forecast_values_orm = get_forecast_values(session=db_session, gsp_ids=[1, 2])
+
+    assert list(forecast_values.columns) == forecast_value_columns
+    assert len(forecast_values) == 2 * N_FAKE_FORECASTS
+    assert set(forecast_values["gsp_id"]) == {1, 2}
+    assert str(forecast_values["target_time"].dt.tz) == "UTC"
+    assert forecast_values["expected_power_generation_megawatts"].tolist() == [
+        fv.expected_power_generation_megawatts for fv in forecast_values_orm
+    ]
+
+    # all gsps
+    forecast_values = get_forecast_values(session=db_session, as_frame=True)
+    assert len(forecast_values) == 10 * N_FAKE_FORECASTS
+
+
+def test_get_forecast_values_as_arrays(db_session, forecasts):
+    forecast_values = get_forecast_values(
+        session=db_session, gsp_ids=[1], as_arrays=True, only_return_latest=True
+    )
+
+    assert list(forecast_values.keys()) == forecast_value_columns
+    assert len(forecast_values["gsp_id"]) == N_FAKE_FORECASTS
+    assert forecast_values["gsp_id"].dtype == "int64"
+    assert forecast_values["target_time"].dtype == "datetime64[ns]"
+    assert forecast_values["expected_power_generation_megawatts"].dtype == "float64"
+
+
+def test_iter_forecast_values(db_session, forecasts):
+    forecast_values = get_forecast_values(session=db_session, gsp_ids=[1, 2])
+
+    batches = list(iter_forecast_values(session=db_session, gsp_ids=[1, 2], batch_size=100))
+    assert [len(batch) for batch in batches][:-1] == [100] * (len(batches) - 1)
+    assert [f.uuid for batch in batches for f in batch] == [f.uuid for f in forecast_values]
+    assert batches[0][0].created_utc.tzinfo == timezone.utc
+    assert len(db_session.dirty) == 0
+
+
+def test_iter_forecast_values_as_frame(db_session, forecasts):
+    forecast_values = get_forecast_values(session=db_session, gsp_ids=[1, 2], as_frame=True)
+
+    batches = list(
+        iter_forecast_values(session=db_session, gsp_ids=[1, 2], batch_size=100, as_frame=True)
+    )
+    assert len(batches) == int(np.ceil(len(forecast_values) / 100))
+    assert list(batches[0].columns) == forecast_value_columns
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), forecast_values)
+
+
 def test_get_forecast_values_gsp_id(db_session, forecasts):
     forecast_values_read = get_forecast_values(
         session=db_session, gsp_id=forecasts[0].location.gsp_id
@@ -306,6 +362,107 @@ def test_get_all_gsp_ids_latest_forecast_historic(db_session):
     assert forecast_values_read[0] == f1[0]
 
 
+def test_get_all_gsp_ids_latest_forecast_cache(db_session):
+    f1 = make_fake_forecasts(gsp_ids=[0, 1], session=db_session)
+    db_session.add_all(f1)
+
+    cache = ResultCache()
+    forecasts = get_all_gsp_ids_latest_forecast(session=db_session, cache=cache)
+    assert len(forecasts) == 2
+    assert isinstance(forecasts[0], Forecast)
+    assert forecasts[1].location.gsp_id == 1
+    assert len(cache.results) == 1
+
+    # the second read comes from the cache, even though there is a newer forecast
+    f2 = make_fake_forecasts(gsp_ids=[0, 1], session=db_session)
+    db_session.add_all(f2)
+    forecasts_cached = get_all_gsp_ids_latest_forecast(session=db_session, cache=cache)
+    assert forecasts_cached == forecasts
+    assert forecasts_cached[0] is not forecasts[0]
+
+    # saving invalidates the cache
+    save(forecasts=f2, session=db_session, apply_adjuster=False)
+    assert len(cache.results) == 0
+    forecasts = get_all_gsp_ids_latest_forecast(session=db_session, cache=cache)
+    assert forecasts[0].forecast_creation_time == f2[0].forecast_creation_time
+
+
+def test_get_all_gsp_ids_latest_forecast_historic_cache(db_session):
+    f1 = make_fake_forecasts(gsp_ids=[1, 2], session=db_session, historic=True, add_latest=True)
+    db_session.add_all(f1)
+
+    cache = ResultCache()
+    forecasts = get_all_gsp_ids_latest_forecast(
+        session=db_session, historic=True, model_name="fake_model", cache=cache
+    )
+    assert len(forecasts) == 2
+    assert len(forecasts[0].forecast_values) == len(f1[0].forecast_values_latest)
+
+    invalidate_result_caches(model_names=["other_model"])
+    assert len(cache.results) == 1
+    invalidate_result_caches(model_names=["fake_model"])
+    assert len(cache.results) == 0
+
+
+def test_get_latest_forecast_for_gsps_cache_exact_filters(db_session):
+    f1 = make_fake_forecasts(gsp_ids=[1], session=db_session)
+    f1[0].created_utc = datetime(2024, 1, 1, 12, 5, tzinfo=timezone.utc)
+    f2 = make_fake_forecasts(
+        gsp_ids=[1], session=db_session, t0_datetime_utc=datetime(2024, 1, 2, tzinfo=timezone.utc)
+    )
+    f2[0].created_utc = datetime(2024, 1, 1, 12, 10, tzinfo=timezone.utc)
+    db_session.add_all(f1 + f2)
+    db_session.commit()
+
+    # the created utc filter is not rounded, so the later forecast is not read
+    cache = ResultCache()
+    forecasts = get_latest_forecast_for_gsps(
+        session=db_session,
+        gsp_ids=[1],
+        end_created_utc=datetime(2024, 1, 1, 12, 6, tzinfo=timezone.utc),
+        cache=cache,
+    )
+    assert len(forecasts) == 1
+    assert forecasts[0].forecast_creation_time == f1[0].forecast_creation_time
+
+
+def test_get_latest_forecast_for_gsps_cache_historic_target_time(db_session):
+    f1 = make_fake_forecasts(gsp_ids=[1], session=db_session, historic=True, add_latest=True)
+    db_session.add_all(f1)
+    db_session.commit()
+
+    # the fake forecast values are every 30 minutes, from 2023-12-30 00:00
+    cache = ResultCache()
+    kwargs = dict(session=db_session, gsp_ids=[1], historic=True, cache=cache)
+    forecasts = get_latest_forecast_for_gsps(
+        **kwargs,
+        start_target_time=datetime(2023, 12, 30, 0, 0, tzinfo=timezone.utc),
+        end_target_time=datetime(2023, 12, 30, 1, 50, tzinfo=timezone.utc),
+    )
+    target_times = [forecast_value.target_time for forecast_value in forecasts[0].forecast_values]
+    assert target_times == [
+        datetime(2023, 12, 30, 0, 0, tzinfo=timezone.utc),
+        datetime(2023, 12, 30, 0, 30, tzinfo=timezone.utc),
+        datetime(2023, 12, 30, 1, 0, tzinfo=timezone.utc),
+        datetime(2023, 12, 30, 1, 30, tzinfo=timezone.utc),
+    ]
+
+    # the rounded target times are the same, so the cached result is used,
+    # but the values are filtered on the exact target times
+    forecasts = get_latest_forecast_for_gsps(
+        **kwargs,
+        start_target_time=datetime(2023, 12, 30, 0, 10, tzinfo=timezone.utc),
+        end_target_time=datetime(2023, 12, 30, 1, 40, tzinfo=timezone.utc),
+    )
+    assert len(cache.results) == 1
+    target_times = [forecast_value.target_time for forecast_value in forecasts[0].forecast_values]
+    assert target_times == [
+        datetime(2023, 12, 30, 0, 30, tzinfo=timezone.utc),
+        datetime(2023, 12, 30, 1, 0, tzinfo=timezone.utc),
+        datetime(2023, 12, 30, 1, 30, tzinfo=timezone.utc),
+    ]
+
+
 def test_get_all_gsp_ids_latest_forecast_pre_load(db_session):
     f1 = make_fake_forecasts(gsp_ids=[1, 2], session=db_session)
 
@@ -316,6 +473,46 @@ def test_get_all_gsp_ids_latest_forecast_pre_load(db_session):
     assert len(forecasts[0].forecast_values) == N_FAKE_FORECASTS
 
 
+def test_get_all_gsp_ids_latest_forecast_values_ordered(db_session):
+    # reverse the target times, so the forecast values are saved in reverse order
+    f1 = make_fake_forecasts(gsp_ids=[1, 2], session=db_session)
+    for forecast in f1:
+        target_times = [value.target_time for value in forecast.forecast_values]
+        for value, target_time in zip(forecast.forecast_values, target_times[::-1]):
+            value.target_time = target_time
+    db_session.add_all(f1)
+    db_session.commit()
+    db_session.expire_all()
+
+    forecasts = get_all_gsp_ids_latest_forecast(session=db_session, preload_children=True)
+    assert len(forecasts) == 2
+    for forecast in forecasts:
+        target_times = [value.target_time for value in forecast.forecast_values]
+        assert len(target_times) == N_FAKE_FORECASTS
+        assert target_times == sorted(target_times)
+
+
+def test_get_all_gsp_ids_latest_forecast_historic_values_ordered(db_session):
+    f1 = make_fake_forecasts(gsp_ids=[1, 2], session=db_session, historic=True, add_latest=True)
+    for forecast in f1:
+        target_times = [value.target_time for value in forecast.forecast_values_latest]
+        for value, target_time in zip(forecast.forecast_values_latest, target_times[::-1]):
+            value.target_time = target_time
+    db_session.add_all(f1)
+    db_session.commit()
+    db_session.expire_all()
+
+    for start_target_time in [None, datetime(2020, 1, 1, tzinfo=timezone.utc)]:
+        forecasts = get_all_gsp_ids_latest_forecast(
+            session=db_session, historic=True, start_target_time=start_target_time
+        )
+        assert len(forecasts) == 2
+        for forecast in forecasts:
+            target_times = [value.target_time for value in forecast.forecast_values_latest]
+            assert len(target_times) == N_FAKE_FORECASTS
+            assert target_times == sorted(target_times)
+
+
 @freeze_time("2023-01-01")
 def test_get_all_gsp_ids_latest_forecast_filter(db_session):
     f1 = make_fake_forecasts(
@@ -3,8 +3,10 @@ from datetime import datetime, timezone
 
 from freezegun import freeze_time
 
+from sqlalchemy import text
+
 from nowcasting_datamodel.fake import make_fake_forecast
-from nowcasting_datamodel.read.read import get_forecast_values
+from nowcasting_datamodel.read.read import get_forecast_values, make_forecast_values_query
 
 logger = logging.getLogger(__name__)
 
@@ -107,3 +109,28 @@ def test_get_latest_forecast_created_utc_multi_gsp(db_session):
 
     assert forecast_values[-1].target_time == datetime(2023, 1, 1, 19, 30, tzinfo=timezone.utc)
     assert forecast_values[-1].forecast.location.gsp_id == 2
+
+
+@freeze_time("2023-01-01 12:00:00")
+def test_get_forecast_values_horizon_uses_index(db_session):
+    f1 = make_fake_forecast(
+        gsp_id=1, session=db_session, t0_datetime_utc=datetime(2023, 1, 1, 12, tzinfo=timezone.utc)
+    )
+    db_session.add(f1)
+    db_session.commit()
+
+    query = make_forecast_values_query(session=db_session, forecast_horizon_minutes=120)
+    statement = query.statement.compile(
+        dialect=db_session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+
+    # the table is small, so make postgres use an index if it can,
+    # and analyze it, so postgres knows the horizon filter is more selective than the target time
+    db_session.execute(text("SET LOCAL enable_seqscan = off"))
+    db_session.execute(text("ANALYZE forecast_value"))
+    plan = db_session.execute(text(f"EXPLAIN {statement}")).scalars().all()
+    plan = "\n".join(plan)
+
+    assert "Index Cond: (horizon_minutes >= 120)" in plan
+    assert "ix_forecast_value_2023_01_horizon_minutes" in plan
+    assert "Seq Scan" not in plan
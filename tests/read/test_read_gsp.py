@@ -1,16 +1,27 @@
 import logging
+import re
 from datetime import datetime, timezone
 
 import numpy as np
-
-from nowcasting_datamodel.models import GSPYield, Location, LocationSQL, LocationWithGSPYields
+from sqlalchemy import event, text
+
+from nowcasting_datamodel.models import (
+    GSPYield,
+    GSPYieldLatestSQL,
+    GSPYieldSQL,
+    Location,
+    LocationSQL,
+    LocationWithGSPYields,
+)
 from nowcasting_datamodel.read.read_gsp import (
     get_gsp_yield,
     get_gsp_yield_by_location,
     get_latest_gsp_yield,
     get_gsp_yield_sum,
     get_latest_gsp_capacities,
+    iter_gsp_yield,
 )
+from nowcasting_datamodel.save.yields import refresh_gsp_yield_latest, update_gsp_yield_partitions
 
 logger = logging.getLogger(__name__)
 
@@ -130,6 +141,25 @@ def test_get_gsp_yield(db_session):
     gsp_yields[0].location.id = gsps[0].id
 
 
+def test_iter_gsp_yield(db_session):
+    _ = setup_gsp_yields(db_session)
+
+    batches = list(
+        iter_gsp_yield(
+            session=db_session,
+            gsp_ids=[1],
+            start_datetime_utc=datetime(2022, 1, 1),
+            batch_size=1,
+        )
+    )
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert batches[0][0].datetime_utc == datetime(2022, 1, 2, tzinfo=timezone.utc)
+    assert batches[0][0].location.gsp_id == 1
+
+    # setting the timezone does not change the objects in the session
+    assert len(db_session.dirty) == 0
+
+
 def test_get_gsp_yield_regime(db_session):
     gsp_yield_1 = GSPYield(
         datetime_utc=datetime(2022, 1, 1), solar_generation_kw=1, regime="in-day"
@@ -285,3 +315,184 @@ def test_get_latest_gsp_capacities_one(db_session):
 
     gsp_capacities = get_latest_gsp_capacities(session=db_session, gsp_ids=[2])
     assert len(gsp_capacities) == 1
+
+
+def test_gsp_yield_latest_trigger(db_session):
+    gsp_sql_1, _ = setup_gsp_yields(db_session)
+
+    latest = db_session.query(GSPYieldLatestSQL).order_by(GSPYieldLatestSQL.location_id).all()
+    assert len(latest) == 2
+    assert latest[0].location_id == gsp_sql_1.id
+    assert latest[0].regime == "in-day"
+    assert latest[0].datetime_utc == datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+    # an older gsp yield does not change the latest one
+    gsp_yield_old = GSPYield(
+        datetime_utc=datetime(2021, 12, 31), solar_generation_kw=4, capacity_mwp=4
+    ).to_orm()
+    gsp_yield_old.location = gsp_sql_1
+    db_session.add(gsp_yield_old)
+    db_session.commit()
+
+    gsp_yields = get_latest_gsp_yield(session=db_session, gsps=[1])
+    assert len(gsp_yields) == 1
+    assert gsp_yields[0].solar_generation_kw == 1
+
+    # a newer gsp yield, with a nan capacity, is the latest, but not for the capacities
+    gsp_yield_new = GSPYield(
+        datetime_utc=datetime(2022, 1, 3), solar_generation_kw=5, capacity_mwp=np.nan
+    ).to_orm()
+    gsp_yield_new.location = gsp_sql_1
+    db_session.add(gsp_yield_new)
+    db_session.commit()
+
+    gsp_yields = get_latest_gsp_yield(session=db_session, gsps=[1])
+    assert gsp_yields[0].solar_generation_kw == 5
+    assert gsp_yields[0].location.gsp_id == 1
+
+    gsp_capacities = get_latest_gsp_capacities(session=db_session, gsp_ids=[1])
+    assert gsp_capacities[1] == 1
+
+    # other regimes are kept separately
+    gsp_yields = get_latest_gsp_yield(session=db_session, gsps=[1], regime="day-after")
+    assert len(gsp_yields) == 0
+
+
+def test_gsp_yield_latest_trigger_delete_and_update(db_session):
+    gsp_sql_1, gsp_sql_2 = setup_gsp_yields(db_session)
+
+    def get_latest_rows():
+        latest = db_session.query(GSPYieldLatestSQL).order_by(GSPYieldLatestSQL.location_id)
+        return [
+            (row.location_id, row.gsp_yield_id, row.datetime_utc, row.capacity_gsp_yield_id)
+            for row in latest.all()
+        ]
+
+    query = db_session.query(GSPYieldSQL.id)
+    query = query.filter(GSPYieldSQL.location_id == gsp_sql_1.id)
+    query = query.order_by(GSPYieldSQL.datetime_utc.desc())
+    yield_id_1, yield_id_2 = [row.id for row in query.all()]
+
+    # moving the latest yield backwards, makes the other yield the latest
+    db_session.execute(
+        text("UPDATE gsp_yield SET datetime_utc = '2021-12-31' WHERE id = :id"), {"id": yield_id_1}
+    )
+    db_session.commit()
+    latest_rows = get_latest_rows()
+    assert latest_rows[0][:2] == (gsp_sql_1.id, yield_id_2)
+    assert latest_rows[0][3] == yield_id_2
+
+    # deleting the latest yield, makes the next one the latest
+    db_session.execute(text("DELETE FROM gsp_yield WHERE id = :id"), {"id": yield_id_2})
+    db_session.commit()
+    latest_rows = get_latest_rows()
+    assert latest_rows[0][:2] == (gsp_sql_1.id, yield_id_1)
+
+    # this is the same as making the table again
+    refresh_gsp_yield_latest(session=db_session)
+    assert get_latest_rows() == latest_rows
+
+    # deleting the only yield, removes the row
+    db_session.execute(
+        text("DELETE FROM gsp_yield WHERE location_id = :location_id"),
+        {"location_id": gsp_sql_2.id},
+    )
+    db_session.commit()
+    assert [row[0] for row in get_latest_rows()] == [gsp_sql_1.id]
+
+
+def test_refresh_gsp_yield_latest(db_session):
+    _ = setup_gsp_yields(db_session)
+
+    def get_latest_rows():
+        latest = db_session.query(GSPYieldLatestSQL).order_by(GSPYieldLatestSQL.location_id)
+        return [
+            (row.location_id, row.regime, row.gsp_yield_id, row.capacity_gsp_yield_id)
+            for row in latest.all()
+        ]
+
+    latest_rows = get_latest_rows()
+
+    db_session.query(GSPYieldLatestSQL).delete()
+    assert get_latest_rows() == []
+
+    refresh_gsp_yield_latest(session=db_session)
+    assert get_latest_rows() == latest_rows
+
+
+def get_scanned_gsp_yield_partitions(db_session, read_function, **kwargs) -> set:
+    """Run a read function, and get the gsp_yield partitions in the query plans"""
+    statements = []
+
+    def add_statement(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", add_statement)
+    try:
+        results = read_function(session=db_session, **kwargs)
+    finally:
+        event.remove(bind, "before_cursor_execute", add_statement)
+
+    plan = []
+    connection = db_session.connection()
+    for statement, parameters in statements:
+        plan += connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).scalars().all()
+
+    assert len(results) > 0
+    return set(re.findall(r" on (gsp_yield_\d{4}_\d{2}|gsp_yield_default)", "\n".join(plan)))
+
+
+def setup_gsp_yield_partitions(db_session):
+    """Make the monthly partitions from 2021-12 to 2022-03, the gsp yields are in 2022-01"""
+    update_gsp_yield_partitions(
+        session=db_session, now=datetime(2021, 12, 1, tzinfo=timezone.utc), make_months_ahead=3
+    )
+    db_session.commit()
+
+
+def test_gsp_yield_partitions_are_pruned(db_session):
+    _ = setup_gsp_yields(db_session)
+    setup_gsp_yield_partitions(db_session)
+
+    kwargs = dict(gsp_ids=[1, 2], start_datetime_utc=datetime(2022, 1, 1))
+    for read_function in [get_gsp_yield, get_gsp_yield_by_location, get_gsp_yield_sum]:
+        # one month
+        partitions = get_scanned_gsp_yield_partitions(
+            db_session, read_function, **kwargs, end_datetime_utc=datetime(2022, 1, 2)
+        )
+        assert partitions == {"gsp_yield_2022_01"}
+
+        # two months
+        partitions = get_scanned_gsp_yield_partitions(
+            db_session, read_function, **kwargs, end_datetime_utc=datetime(2022, 2, 10)
+        )
+        assert partitions == {"gsp_yield_2022_01", "gsp_yield_2022_02"}
+
+    # no end datetime, so all the later partitions are scanned, but not the earlier ones
+    partitions = get_scanned_gsp_yield_partitions(db_session, get_gsp_yield, **kwargs)
+    assert "gsp_yield_2022_01" in partitions
+    assert "gsp_yield_2021_12" not in partitions
+
+
+def test_gsp_yield_partitions(db_session):
+    _ = setup_gsp_yields(db_session)
+
+    # before the monthly partitions are made, gsp yields go in the default partition
+    gsp_yields = db_session.execute(text("SELECT datetime_utc FROM gsp_yield_default")).all()
+    assert len(gsp_yields) == 3
+
+    setup_gsp_yield_partitions(db_session)
+
+    # the gsp yields are moved to the partition for their month
+    gsp_yields = db_session.execute(text("SELECT datetime_utc FROM gsp_yield_2022_01")).all()
+    assert len(gsp_yields) == 3
+
+    # and ones outside the monthly partitions go in the default partition
+    gsp_yield = GSPYield(datetime_utc=datetime(2035, 1, 1), solar_generation_kw=1).to_orm()
+    gsp_yield.location = db_session.query(LocationSQL).first()
+    db_session.add(gsp_yield)
+    db_session.commit()
+
+    gsp_yields = db_session.execute(text("SELECT datetime_utc FROM gsp_yield_default")).all()
+    assert len(gsp_yields) == 1
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from nowcasting_datamodel import N_GSP
+from nowcasting_datamodel.fake import N_FAKE_FORECASTS, make_fake_forecasts
+from nowcasting_datamodel.read.read import (
+    get_all_gsp_ids_latest_forecast,
+    get_preload_options,
+    load_strategies,
+)
+
+gsp_ids = list(range(0, N_GSP + 1))
+
+
+@pytest.fixture()
+def forecasts_all_gsps(db_session):
+    forecasts = make_fake_forecasts(gsp_ids=gsp_ids, session=db_session)
+    forecasts += make_fake_forecasts(
+        gsp_ids=gsp_ids, session=db_session, historic=True, add_latest=True
+    )
+    db_session.add_all(forecasts)
+    db_session.commit()
+    db_session.expunge_all()
+
+
+def get_children(forecasts, historic: bool) -> int:
+    """Get all the children of the forecasts, returns the number of forecast values"""
+    n_forecast_values = 0
+    for forecast in forecasts:
+        assert forecast.location.gsp_id is not None
+        assert forecast.model.name is not None
+        assert forecast.input_data_last_updated.gsp is not None
+        if historic:
+            n_forecast_values += len(forecast.forecast_values_latest)
+        else:
+            n_forecast_values += len(forecast.forecast_values)
+    return n_forecast_values
+
+
+def test_get_all_gsp_ids_latest_forecast_load_strategy(db_session, forecasts_all_gsps, statements):
+    # the number of queries does not depend on the number of gsps
+    for load_strategy in load_strategies.keys():
+        for historic, start_target_time in [
+            (False, None),
+            (True, None),
+            (True, datetime(2020, 1, 1, tzinfo=timezone.utc)),
+        ]:
+            db_session.expunge_all()
+            statements.clear()
+
+            forecasts = get_all_gsp_ids_latest_forecast(
+                session=db_session,
+                preload_children=True,
+                historic=historic,
+                start_target_time=start_target_time,
+                load_strategy=load_strategy,
+            )
+            n_statements = len(statements)
+
+            # one query for the forecasts, and one for each child, unless they are joined.
+            # Historic values filtered on target time are loaded in the main query
+            if load_strategy == "joined":
+                assert n_statements == 1
+            elif start_target_time is not None:
+                assert n_statements == 4
+            else:
+                assert n_statements == 5
+
+            # getting the children does not make any more queries
+            assert len(forecasts) == N_GSP + 1
+            n_forecast_values = get_children(forecasts, historic=historic)
+            assert n_forecast_values == (N_GSP + 1) * N_FAKE_FORECASTS
+            assert len(statements) == n_statements
+
+
+def test_get_preload_options_error():
+    with pytest.raises(ValueError):
+        get_preload_options(historic=False, load_strategy="lazy")
+
+    # this would not load the children of the latest forecasts
+    with pytest.raises(ValueError):
+        get_preload_options(historic=False, load_strategy="subquery")
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 from nowcasting_datamodel.models import DatetimeIntervalSQL, MetricSQL
 from nowcasting_datamodel.read.read_metric import get_datetime_interval, get_metric
@@ -31,8 +31,8 @@ def test_get_datetime_interval(db_session):
     datetime_interval = get_datetime_interval(
         session=db_session, start_datetime_utc=start_datetime, end_datetime_utc=end_datetime
     )
-    assert datetime_interval.start_datetime_utc == start_datetime
-    assert datetime_interval.end_datetime_utc == end_datetime
+    assert datetime_interval.start_datetime_utc == start_datetime.replace(tzinfo=timezone.utc)
+    assert datetime_interval.end_datetime_utc == end_datetime.replace(tzinfo=timezone.utc)
     assert len(db_session.query(DatetimeIntervalSQL).all()) == 1
 
 
@@ -47,6 +47,6 @@ def test_get_new_datetime_interval(db_session):
     datetime_interval = get_datetime_interval(
         session=db_session, start_datetime_utc=start_datetime, end_datetime_utc=end_datetime
     )
-    assert datetime_interval.start_datetime_utc == start_datetime
-    assert datetime_interval.end_datetime_utc == end_datetime
+    assert datetime_interval.start_datetime_utc == start_datetime.replace(tzinfo=timezone.utc)
+    assert datetime_interval.end_datetime_utc == end_datetime.replace(tzinfo=timezone.utc)
     assert len(db_session.query(DatetimeIntervalSQL).all()) == 1
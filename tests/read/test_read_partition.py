@@ -0,0 +1,200 @@
+import re
+from datetime import datetime, timezone
+
+from freezegun import freeze_time
+from sqlalchemy import text
+
+from nowcasting_datamodel.fake import make_fake_forecast
+from nowcasting_datamodel.models.forecast import ForecastValueSevenDaysSQL, ForecastValueSQL
+from nowcasting_datamodel.read.read import (
+    MAX_FORECAST_HORIZON,
+    get_forecast_value_partition,
+    get_forecast_values,
+    get_target_time_bounds,
+    make_forecast_values_query,
+    utc_databases,
+)
+
+
+def get_scanned_partitions(session, query) -> set:
+    """Get the forecast_value partitions in the query plan"""
+    statement = query.statement.compile(
+        dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = session.execute(text(f"EXPLAIN {statement}")).scalars().all()
+    return set(re.findall(r" on (forecast_value_\d{4}_\d{2})", "\n".join(plan)))
+
+
+def test_get_target_time_bounds():
+    start = datetime(2023, 1, 2, tzinfo=timezone.utc)
+    end = datetime(2023, 1, 3, tzinfo=timezone.utc)
+
+    assert get_target_time_bounds(start_datetime=start, end_datetime=end) == (start, end)
+
+    # there is no end, unless the max forecast horizon is given
+    assert get_target_time_bounds(created_utc_limit=start) == (None, None)
+
+    # then the end comes from the created utc limit
+    _, target_time_end = get_target_time_bounds(
+        created_utc_limit=start, max_forecast_horizon=MAX_FORECAST_HORIZON
+    )
+    assert target_time_end == datetime(2023, 1, 9, tzinfo=timezone.utc)
+
+    # or from now
+    with freeze_time("2023-01-01"):
+        _, target_time_end = get_target_time_bounds(max_forecast_horizon=MAX_FORECAST_HORIZON)
+    assert target_time_end == datetime(2023, 1, 8, tzinfo=timezone.utc)
+
+
+def test_get_forecast_value_partition(db_session):
+    start = datetime(2023, 1, 2, tzinfo=timezone.utc)
+
+    partition = get_forecast_value_partition(
+        session=db_session,
+        model=ForecastValueSQL,
+        start_datetime=start,
+        end_datetime=datetime(2023, 1, 31, 23, 30, tzinfo=timezone.utc),
+    )
+    assert partition.name == "forecast_value_2023_01"
+
+    # more than one month
+    assert (
+        get_forecast_value_partition(
+            session=db_session,
+            model=ForecastValueSQL,
+            start_datetime=start,
+            end_datetime=datetime(2023, 2, 1, tzinfo=timezone.utc),
+        )
+        is None
+    )
+
+    # the seven days table is partitioned by day
+    assert (
+        get_forecast_value_partition(
+            session=db_session,
+            model=ForecastValueSevenDaysSQL,
+            start_datetime=start,
+            end_datetime=start,
+        )
+        is None
+    )
+
+
+@freeze_time("2023-01-04 12:00:00")
+def test_get_forecast_values_one_month_reads_partition(db_session):
+    t0_datetime_utc = datetime(2023, 1, 4, 12, tzinfo=timezone.utc)
+    f1 = make_fake_forecast(gsp_id=1, session=db_session, t0_datetime_utc=t0_datetime_utc)
+    db_session.add(f1)
+    db_session.commit()
+
+    kwargs = dict(
+        session=db_session,
+        gsp_ids=[1],
+        start_datetime=datetime(2023, 1, 4, tzinfo=timezone.utc),
+        end_datetime=datetime(2023, 1, 5, tzinfo=timezone.utc),
+    )
+
+    # the query goes straight to the partition, not the partitioned table
+    query = make_forecast_values_query(**kwargs)
+    assert get_scanned_partitions(db_session, query) == {"forecast_value_2023_01"}
+    assert "forecast_value_2023_01" in str(query.statement)
+
+    forecast_values = get_forecast_values(**kwargs)
+    assert len(forecast_values) == 40
+    assert isinstance(forecast_values[0], ForecastValueSQL)
+    assert forecast_values[0].forecast.location.gsp_id == 1
+    assert forecast_values[0].target_time == datetime(2023, 1, 4, tzinfo=timezone.utc)
+    assert forecast_values[-1].target_time == datetime(2023, 1, 4, 19, 30, tzinfo=timezone.utc)
+
+    forecast_values = get_forecast_values(**kwargs, as_frame=True)
+    assert len(forecast_values) == 40
+
+
+@freeze_time("2023-01-20 12:00:00")
+def test_get_forecast_values_partitions_are_pruned(db_session):
+    # two months
+    query = make_forecast_values_query(
+        session=db_session,
+        start_datetime=datetime(2022, 12, 20, tzinfo=timezone.utc),
+        end_datetime=datetime(2023, 1, 10, tzinfo=timezone.utc),
+    )
+    assert get_scanned_partitions(db_session, query) == {
+        "forecast_value_2022_12",
+        "forecast_value_2023_01",
+    }
+
+    # no target times, so the end comes from the created utc limit
+    query = make_forecast_values_query(
+        session=db_session,
+        forecast_horizon_minutes=60,
+        created_utc_limit=datetime(2022, 10, 10, tzinfo=timezone.utc),
+        max_forecast_horizon=MAX_FORECAST_HORIZON,
+    )
+    assert get_scanned_partitions(db_session, query) == {
+        "forecast_value_2022_08",
+        "forecast_value_2022_09",
+        "forecast_value_2022_10",
+    }
+
+    # no filters, so the end comes from now
+    query = make_forecast_values_query(
+        session=db_session, max_forecast_horizon=MAX_FORECAST_HORIZON
+    )
+    partitions = get_scanned_partitions(db_session, query)
+    assert "forecast_value_2023_01" in partitions
+    assert "forecast_value_2023_02" not in partitions
+
+    # without the max forecast horizon, all the later partitions are scanned
+    query = make_forecast_values_query(session=db_session)
+    partitions = get_scanned_partitions(db_session, query)
+    assert "forecast_value_2023_02" in partitions
+
+
+def test_get_forecast_values_longer_than_max_forecast_horizon(db_session):
+    # forecast values 10 days ahead are returned, unless the max forecast horizon is given
+    t0_datetime_utc = datetime(2023, 1, 14, tzinfo=timezone.utc)
+    with freeze_time("2023-01-02"):
+        forecast = make_fake_forecast(gsp_id=1, session=db_session, t0_datetime_utc=t0_datetime_utc)
+        db_session.add(forecast)
+        db_session.commit()
+
+    kwargs = dict(
+        session=db_session,
+        gsp_ids=[1],
+        start_datetime=datetime(2023, 1, 12, tzinfo=timezone.utc),
+        created_utc_limit=datetime(2023, 1, 2, 1, tzinfo=timezone.utc),
+    )
+    with freeze_time("2023-01-02 01:00"):
+        forecast_values = get_forecast_values(**kwargs)
+        assert len(forecast_values) > 0
+
+        forecast_values = get_forecast_values(**kwargs, max_forecast_horizon=MAX_FORECAST_HORIZON)
+        assert len(forecast_values) == 0
+
+
+def test_get_forecast_value_partition_bounds_are_utc(db_session):
+    bounds = db_session.execute(
+        text(
+            "SELECT pg_get_expr(relpartbound, oid) FROM pg_class "
+            "WHERE relname = 'forecast_value_2023_01'"
+        )
+    ).scalar()
+    assert "2023-01-01 00:00:00+00" in bounds
+    assert "2023-02-01 00:00:00+00" in bounds
+
+
+def test_get_forecast_value_partition_not_utc(db_session):
+    kwargs = dict(
+        session=db_session,
+        model=ForecastValueSQL,
+        start_datetime=datetime(2023, 1, 2, tzinfo=timezone.utc),
+        end_datetime=datetime(2023, 1, 3, tzinfo=timezone.utc),
+    )
+
+    # the partition bounds may not be in UTC, so postgres picks the partitions
+    utc_databases.clear()
+    db_session.execute(text("SET LOCAL TimeZone = 'Europe/London'"))
+    try:
+        assert get_forecast_value_partition(**kwargs) is None
+    finally:
+        utc_databases.clear()
@@ -1,9 +1,25 @@
 import logging
 from datetime import datetime, timezone
 
-from nowcasting_datamodel.models import PVSystem, PVSystemSQL, pv_output, solar_sheffield_passiv
-from nowcasting_datamodel.read.read_pv import get_latest_pv_yield, get_pv_systems, get_pv_yield
+from sqlalchemy import text
+
+from nowcasting_datamodel.models import (
+    PVSystem,
+    PVSystemSQL,
+    PVYield,
+    PVYieldLatestSQL,
+    PVYieldSQL,
+    pv_output,
+    solar_sheffield_passiv,
+)
+from nowcasting_datamodel.read.read_pv import (
+    get_latest_pv_yield,
+    get_pv_systems,
+    get_pv_yield,
+    iter_pv_yield,
+)
 from nowcasting_datamodel.save.save import save_pv_system
+from nowcasting_datamodel.save.yields import refresh_pv_yield_latest
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +114,31 @@ def test_get_latest_pv_yield_filter(db_session_pv, pv_yields_and_systems):
     pv_yields[0].pv_system.id = pv_systems[0].id
 
 
+def test_get_latest_pv_yield_start_created_utc(db_session_pv, pv_yields_and_systems):
+    [pv_system_sql_1, _] = pv_yields_and_systems["pv_systems"]
+
+    # the latest pv yield, but it was created a long time ago
+    pv_yield = PVYield(datetime_utc=datetime(2022, 1, 3), solar_generation_kw=4).to_orm()
+    pv_yield.pv_system = pv_system_sql_1
+    pv_yield.created_utc = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    db_session_pv.add(pv_yield)
+    db_session_pv.commit()
+
+    pv_yields = get_latest_pv_yield(session=db_session_pv, pv_systems=[pv_system_sql_1])
+    assert len(pv_yields) == 1
+    assert pv_yields[0].solar_generation_kw == 4
+
+    # the latest pv yield created after 'start_created_utc' is used
+    pv_yields = get_latest_pv_yield(
+        session=db_session_pv,
+        pv_systems=[pv_system_sql_1],
+        start_created_utc=datetime(2022, 1, 1, tzinfo=timezone.utc),
+    )
+    assert len(pv_yields) == 1
+    assert pv_yields[0].solar_generation_kw == 2
+    assert pv_yields[0].pv_system is pv_system_sql_1
+
+
 def test_get_latest_pv_yield_append_no_yields(db_session_pv, pv_systems):
     [pv_system_sql_1, pv_system_sql_2] = pv_systems
 
@@ -132,6 +173,17 @@ def test_read_pv_yield(db_session_pv, pv_yields_and_systems):
     assert len(get_pv_yield(session=db_session_pv, pv_systems_ids=[1, 2])) == 3
 
 
+def test_iter_pv_yield(db_session_pv, pv_yields_and_systems):
+    batches = list(iter_pv_yield(session=db_session_pv, pv_systems_ids=[1, 2], batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+    pv_yields = get_pv_yield(session=db_session_pv, pv_systems_ids=[1, 2])
+    assert [pv_yield.id for batch in batches for pv_yield in batch] == [
+        pv_yield.id for pv_yield in pv_yields
+    ]
+    assert batches[0][0].datetime_utc.tzinfo == timezone.utc
+
+
 def test_read_pv_yield_providers(db_session_pv, pv_yields_and_systems):
     assert len(get_pv_yield(session=db_session_pv, providers=[pv_output])) == 3
     assert len(get_pv_yield(session=db_session_pv, providers=[solar_sheffield_passiv])) == 0
@@ -162,3 +214,78 @@ def test_read_pv_yield_end_utc(db_session_pv, pv_yields_and_systems):
 
     assert pv_yields[0].datetime_utc == datetime(2022, 1, 1, tzinfo=timezone.utc)
     assert pv_yields[1].datetime_utc == datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+
+def test_pv_yield_latest_trigger(db_session_pv, pv_yields_and_systems):
+    [pv_system_sql_1, pv_system_sql_2] = pv_yields_and_systems["pv_systems"]
+
+    latest = db_session_pv.query(PVYieldLatestSQL).order_by(PVYieldLatestSQL.pv_system_id).all()
+    assert len(latest) == 2
+    assert latest[0].pv_system_id == pv_system_sql_1.id
+    assert latest[0].datetime_utc == datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+    # an older pv yield does not change the latest one, a newer one does
+    for datetime_utc, solar_generation_kw in [
+        (datetime(2021, 12, 31), 4),
+        (datetime(2022, 1, 3), 5),
+    ]:
+        pv_yield = PVYield(
+            datetime_utc=datetime_utc, solar_generation_kw=solar_generation_kw
+        ).to_orm()
+        pv_yield.pv_system = pv_system_sql_2
+        db_session_pv.add(pv_yield)
+        db_session_pv.commit()
+
+    pv_yields = get_latest_pv_yield(
+        session=db_session_pv, pv_systems=[pv_system_sql_1, pv_system_sql_2]
+    )
+    assert len(pv_yields) == 2
+    assert pv_yields[0].solar_generation_kw == 2
+    assert pv_yields[1].solar_generation_kw == 5
+    assert pv_yields[1].pv_system.id == pv_system_sql_2.id
+
+
+def test_pv_yield_latest_trigger_delete_and_update(db_session_pv, pv_yields_and_systems):
+    [pv_system_sql_1, _] = pv_yields_and_systems["pv_systems"]
+
+    def get_latest_rows():
+        latest = db_session_pv.query(PVYieldLatestSQL).order_by(PVYieldLatestSQL.pv_system_id)
+        return [(row.pv_system_id, row.pv_yield_id, row.datetime_utc) for row in latest.all()]
+
+    query = db_session_pv.query(PVYieldSQL.id)
+    query = query.filter(PVYieldSQL.pv_system_id == pv_system_sql_1.id)
+    query = query.order_by(PVYieldSQL.datetime_utc.desc())
+    pv_yield_ids = [row.id for row in query.all()]
+    assert get_latest_rows()[0][1] == pv_yield_ids[0]
+
+    # moving the latest yield backwards, makes the next yield the latest
+    db_session_pv.execute(
+        text("UPDATE pv_yield SET datetime_utc = '2021-12-31' WHERE id = :id"),
+        {"id": pv_yield_ids[0]},
+    )
+    db_session_pv.commit()
+    assert get_latest_rows()[0][1] == pv_yield_ids[1]
+
+    # deleting the latest yield, makes the next one the latest
+    db_session_pv.execute(text("DELETE FROM pv_yield WHERE id = :id"), {"id": pv_yield_ids[1]})
+    db_session_pv.commit()
+    latest_rows = get_latest_rows()
+    assert latest_rows[0][1] == pv_yield_ids[0]
+
+    # this is the same as making the table again
+    refresh_pv_yield_latest(session=db_session_pv)
+    assert get_latest_rows() == latest_rows
+
+
+def test_refresh_pv_yield_latest(db_session_pv, pv_yields_and_systems):
+    def get_latest_rows():
+        latest = db_session_pv.query(PVYieldLatestSQL).order_by(PVYieldLatestSQL.pv_system_id)
+        return [(row.pv_system_id, row.pv_yield_id) for row in latest.all()]
+
+    latest_rows = get_latest_rows()
+
+    db_session_pv.query(PVYieldLatestSQL).delete()
+    assert get_latest_rows() == []
+
+    refresh_pv_yield_latest(session=db_session_pv)
+    assert get_latest_rows() == latest_rows
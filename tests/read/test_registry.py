@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from nowcasting_datamodel.fake import make_fake_forecasts
+from nowcasting_datamodel.models import (
+    DatetimeIntervalSQL,
+    LocationSQL,
+    MetricSQL,
+    MLModelSQL,
+    national_gb_label,
+)
+from nowcasting_datamodel.models.api import UserSQL
+from nowcasting_datamodel.read.read import get_location, get_locations_for_gsp_ids
+from nowcasting_datamodel.read.read_metric import get_datetime_interval, get_metric
+from nowcasting_datamodel.read.read_models import get_model, get_models_for_names
+from nowcasting_datamodel.read.read_user import get_user
+from nowcasting_datamodel.read.registry import (
+    clear_registries,
+    get_registry,
+    load_registry,
+    location_key,
+)
+
+
+@pytest.fixture()
+def registry(db_session):
+    db_session.add_all(
+        [
+            LocationSQL(gsp_id=0, label=national_gb_label, installed_capacity_mw=13000),
+            LocationSQL(gsp_id=1, label="GSP_1", installed_capacity_mw=40),
+            MLModelSQL(name="model", version="0.1.2"),
+            MetricSQL(name="MAE"),
+            DatetimeIntervalSQL(
+                start_datetime_utc=datetime(2024, 1, 1), end_datetime_utc=datetime(2024, 1, 2)
+            ),
+        ]
+    )
+    db_session.commit()
+
+    yield load_registry(session=db_session)
+    clear_registries()
+
+
+def test_registry_not_loaded(db_session):
+    assert get_registry(db_session) is None
+
+
+def test_registry_lookups_use_no_queries(db_session, registry, statements):
+    location = get_location(session=db_session, gsp_id=1)
+    national = get_location(session=db_session, gsp_id=0, label=national_gb_label)
+    model = get_model(session=db_session, name="model", version="0.1.2")
+    model_latest = get_model(session=db_session, name="model")
+    metric = get_metric(session=db_session, name="MAE")
+    datetime_interval = get_datetime_interval(
+        session=db_session,
+        start_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        end_datetime_utc=datetime(2024, 1, 2, tzinfo=timezone.utc),
+    )
+
+    assert len(statements) == 0
+    assert location.gsp_id == 1
+    assert location.label == "GSP_1"
+    assert national.gsp_id == 0
+    assert model.version == "0.1.2"
+    assert model_latest is model
+    assert metric.name == "MAE"
+    assert datetime_interval.end_datetime_utc == datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def test_registry_new_rows(db_session, registry, statements):
+    location = get_location(session=db_session, gsp_id=2)
+    user = get_user(session=db_session, email="test@test.com")
+    n_statements = len(statements)
+    assert n_statements > 0
+
+    # second lookups come from the registry
+    assert get_location(session=db_session, gsp_id=2).id == location.id
+    assert get_user(session=db_session, email="test@test.com").uuid == user.uuid
+    assert len(statements) == n_statements
+
+    assert len(db_session.query(LocationSQL).all()) == 3
+    assert len(db_session.query(UserSQL).all()) == 1
+
+
+def test_registry_used_by_fake_forecasts(db_session, registry, statements):
+    forecasts = make_fake_forecasts(gsp_ids=[0, 1], session=db_session, model_name="model")
+
+    assert len(statements) == 0
+    assert forecasts[1].location.gsp_id == 1
+    assert forecasts[1].model.name == "model"
+
+
+def test_get_locations_for_gsp_ids(db_session, statements):
+    db_session.add(LocationSQL(gsp_id=1, label="GSP_1"))
+    db_session.commit()
+    statements.clear()
+
+    locations = get_locations_for_gsp_ids(
+        session=db_session, gsp_ids=[0, 1, 2, 3], installed_capacity_mw={2: 10}
+    )
+
+    # one select and one insert
+    assert len([s for s in statements if s.startswith("INSERT INTO location")]) == 1
+    assert len([s for s in statements if s.startswith("SELECT location")]) == 1
+
+    assert list(locations.keys()) == [0, 1, 2, 3]
+    assert locations[0].label == national_gb_label
+    assert locations[2].label == "GSP_2"
+    assert locations[2].installed_capacity_mw == 10
+    assert len(db_session.query(LocationSQL).all()) == 4
+
+    # nothing new is made
+    locations = get_locations_for_gsp_ids(session=db_session, gsp_ids=[1, 2])
+    assert len(locations) == 2
+    assert len(db_session.query(LocationSQL).all()) == 4
+
+
+def test_get_locations_for_gsp_ids_registry(db_session, registry, monkeypatch):
+    locations = get_locations_for_gsp_ids(session=db_session, gsp_ids=[1, 2, 3])
+    assert registry.get(session=db_session, table="location", key=location_key(3)).id == (
+        locations[3].id
+    )
+
+    # the new locations are not added to the registry if the commit fails
+    def commit():
+        raise ValueError("commit failed")
+
+    monkeypatch.setattr(db_session, "commit", commit)
+    with pytest.raises(ValueError):
+        get_locations_for_gsp_ids(session=db_session, gsp_ids=[4])
+    assert registry.get(session=db_session, table="location", key=location_key(4)) is None
+
+
+def test_get_models_for_names(db_session):
+    db_session.add(MLModelSQL(name="model_1", version="0.0.1"))
+    db_session.commit()
+
+    models = get_models_for_names(session=db_session, names=["model_1", "model_2"])
+    assert models["model_1"].version == "0.0.1"
+    assert models["model_2"].version is None
+    assert len(db_session.query(MLModelSQL).all()) == 2
+
+    models = get_models_for_names(session=db_session, names=["model_1"], version="0.0.2")
+    assert models["model_1"].version == "0.0.2"
+    assert len(db_session.query(MLModelSQL).all()) == 3
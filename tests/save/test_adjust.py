@@ -45,6 +45,33 @@ def test_add_adjust_to_forecasts(latest_me, db_session):
     assert forecasts[1].forecast_values[0].adjust_mw == 0.0
 
 
+@freeze_time("2023-01-09 16:25")
+def test_add_adjust_to_forecasts_two_national(latest_me, db_session):
+    """Test the first national forecast is adjusted, if there are more than one"""
+
+    datetime_now = datetime(2023, 1, 9, 16, 30, tzinfo=timezone.utc)
+    forecasts = make_fake_forecasts(
+        gsp_ids=[0, 0, 1], session=db_session, t0_datetime_utc=datetime_now
+    )
+    adjust_mw_before = forecasts[1].forecast_values[0].adjust_mw
+
+    add_adjust_to_forecasts(session=db_session, forecasts_sql=forecasts, max_adjust_percentage=None)
+
+    assert forecasts[0].forecast_values[0].adjust_mw == 16 * 60 + 30
+    assert forecasts[1].forecast_values[0].adjust_mw == adjust_mw_before
+
+
+@freeze_time("2023-01-09 16:25")
+def test_add_adjust_to_forecasts_no_national(latest_me, db_session):
+    datetime_now = datetime(2023, 1, 9, 16, 30, tzinfo=timezone.utc)
+    forecasts = make_fake_forecasts(gsp_ids=[1], session=db_session, t0_datetime_utc=datetime_now)
+    adjust_mw_before = forecasts[0].forecast_values[0].adjust_mw
+
+    add_adjust_to_forecasts(session=db_session, forecasts_sql=forecasts, max_adjust_percentage=None)
+
+    assert forecasts[0].forecast_values[0].adjust_mw == adjust_mw_before
+
+
 @freeze_time("2023-01-09 16:25")
 def test_add_adjust_to_national_forecast(latest_me, db_session):
     assert len(db_session.query(MetricValueSQL).all()) > 0
@@ -0,0 +1,76 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from nowcasting_datamodel.connection import make_async_url
+from nowcasting_datamodel.fake import N_FAKE_FORECASTS, make_fake_forecasts, make_fake_me_latest
+from nowcasting_datamodel.models.forecast import (
+    ForecastSQL,
+    ForecastValueLatestSQL,
+    ForecastValueSevenDaysSQL,
+    ForecastValueSQL,
+)
+from nowcasting_datamodel.save.async_save import save
+
+
+def make_forecasts(db_connection, gsp_ids, add_me_latest: bool = True):
+    """Make fake forecasts that are committed, as the async save uses new connections"""
+    with db_connection.Session(expire_on_commit=False) as session:
+        if add_me_latest:
+            session.add_all(make_fake_me_latest(session=session))
+        t0_datetime_utc = datetime.now(tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+        forecasts = make_fake_forecasts(
+            gsp_ids=gsp_ids, session=session, t0_datetime_utc=t0_datetime_utc
+        )
+        # the forecasts are saved by the async save, so they are taken out of the session
+        for forecast in forecasts:
+            session.expunge(forecast)
+            for forecast_value in forecast.forecast_values:
+                session.expunge(forecast_value)
+        session.commit()
+        session.expunge_all()
+    return forecasts
+
+
+async def async_save(db_connection, forecasts, **kwargs):
+    engine = create_async_engine(make_async_url(db_connection.url))
+    try:
+        await save(forecasts=forecasts, engine=engine, **kwargs)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.skipif(
+    not os.getenv("DB_URL", "").startswith("postgresql"), reason="async save needs postgres"
+)
+def test_async_save(db_connection):
+    forecasts = make_forecasts(db_connection=db_connection, gsp_ids=range(0, 10))
+    asyncio.run(async_save(db_connection=db_connection, forecasts=forecasts))
+
+    with db_connection.get_session() as session:
+        forecast_values = session.query(ForecastValueSQL).all()
+        assert max([fv.adjust_mw for fv in forecast_values]) != 0.0
+        assert forecast_values[0].horizon_minutes is not None
+
+        # 10 forecast, + 10 historic ones
+        assert len(session.query(ForecastSQL).all()) == 20
+        assert len(forecast_values) == 10 * N_FAKE_FORECASTS
+        assert len(session.query(ForecastValueLatestSQL).all()) == 10 * N_FAKE_FORECASTS
+        forecast_values_seven_days = session.query(ForecastValueSevenDaysSQL).all()
+        assert len(forecast_values_seven_days) == 10 * N_FAKE_FORECASTS
+        assert {fv.uuid for fv in forecast_values} == {fv.uuid for fv in forecast_values_seven_days}
+
+    # save again, the historic forecasts are reused
+    forecasts = make_forecasts(
+        db_connection=db_connection, gsp_ids=range(0, 10), add_me_latest=False
+    )
+    asyncio.run(async_save(db_connection=db_connection, forecasts=forecasts))
+
+    with db_connection.get_session() as session:
+        assert len(session.query(ForecastSQL).all()) == 30
+        assert len(session.query(ForecastValueSQL).all()) == 20 * N_FAKE_FORECASTS
+        assert len(session.query(ForecastValueLatestSQL).all()) == 10 * N_FAKE_FORECASTS
+        assert len(session.query(ForecastValueSevenDaysSQL).all()) == 20 * N_FAKE_FORECASTS
@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta, timezone
+
+from freezegun import freeze_time
+from sqlalchemy import text
+
+from nowcasting_datamodel.fake import make_fake_forecast
+from nowcasting_datamodel.models.forecast import ForecastValueSQL
+from nowcasting_datamodel.read.read import (
+    HORIZON_MINUTES_BACKFILLED_TTL,
+    clear_horizon_minutes_backfilled,
+    get_forecast_values,
+    horizon_minutes_backfilled,
+    is_horizon_minutes_backfilled,
+)
+from nowcasting_datamodel.save.backfill import backfill_horizon_minutes
+from nowcasting_datamodel.save.bulk import get_horizon_minutes
+
+
+def make_forecast_values_without_horizon(db_session) -> int:
+    """Save a forecast, and remove horizon_minutes, like rows saved before the column existed"""
+    forecast = make_fake_forecast(
+        gsp_id=1,
+        session=db_session,
+        t0_datetime_utc=datetime(2023, 1, 4, 12, tzinfo=timezone.utc),
+    )
+    db_session.add(forecast)
+    db_session.commit()
+
+    db_session.execute(text("UPDATE forecast_value SET horizon_minutes = NULL"))
+    db_session.commit()
+    clear_horizon_minutes_backfilled()
+
+    return len(forecast.forecast_values)
+
+
+def test_backfill_horizon_minutes(db_session):
+    n_forecast_values = make_forecast_values_without_horizon(db_session)
+    assert not is_horizon_minutes_backfilled(session=db_session, model=ForecastValueSQL)
+
+    n_rows = backfill_horizon_minutes(session=db_session, batch_size=10, sleep_seconds=0)
+    assert n_rows["forecast_value_2023_01"] == n_forecast_values
+    assert sum(n_rows.values()) == n_forecast_values
+
+    forecast_values = db_session.query(ForecastValueSQL).all()
+    for forecast_value in forecast_values:
+        assert forecast_value.horizon_minutes == get_horizon_minutes(
+            forecast_value.target_time, forecast_value.created_utc
+        )
+    assert is_horizon_minutes_backfilled(session=db_session, model=ForecastValueSQL)
+
+    # running again does not update anything
+    n_rows = backfill_horizon_minutes(session=db_session, batch_size=10, sleep_seconds=0)
+    assert sum(n_rows.values()) == 0
+
+
+def test_backfill_horizon_minutes_max_batches(db_session):
+    n_forecast_values = make_forecast_values_without_horizon(db_session)
+
+    n_rows = backfill_horizon_minutes(
+        session=db_session, batch_size=10, sleep_seconds=0, max_batches=2
+    )
+    assert sum(n_rows.values()) == 20
+
+    # carry on from where it stopped
+    n_rows = backfill_horizon_minutes(session=db_session, batch_size=10, sleep_seconds=0)
+    assert sum(n_rows.values()) == n_forecast_values - 20
+    assert (
+        db_session.query(ForecastValueSQL)
+        .filter(ForecastValueSQL.horizon_minutes.is_(None))
+        .count()
+        == 0
+    )
+
+
+@freeze_time("2023-01-03 12:00:00")
+def test_get_forecast_values_horizon_before_and_after_backfill(db_session):
+    make_forecast_values_without_horizon(db_session)
+    start_datetime = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    assert not is_horizon_minutes_backfilled(
+        session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+    )
+    forecast_values_before = get_forecast_values(
+        session=db_session, forecast_horizon_minutes=60, start_datetime=start_datetime
+    )
+    assert len(forecast_values_before) > 0
+
+    backfill_horizon_minutes(session=db_session, sleep_seconds=0)
+    assert is_horizon_minutes_backfilled(
+        session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+    )
+    # january is the current month, so the check expires
+    key = (
+        str(db_session.get_bind().engine.url),
+        ForecastValueSQL.__tablename__,
+        datetime(2023, 1, 1, tzinfo=timezone.utc),
+        datetime(2023, 2, 1, tzinfo=timezone.utc),
+    )
+    assert horizon_minutes_backfilled[key][0]
+    assert horizon_minutes_backfilled[key][1] is not None
+    forecast_values_after = get_forecast_values(
+        session=db_session, forecast_horizon_minutes=60, start_datetime=start_datetime
+    )
+
+    assert [f.uuid for f in forecast_values_after] == [f.uuid for f in forecast_values_before]
+
+
+def test_backfill_horizon_minutes_without_created_utc(db_session):
+    n_forecast_values = make_forecast_values_without_horizon(db_session)
+    forecast_value = db_session.query(ForecastValueSQL).first()
+    db_session.execute(
+        text("UPDATE forecast_value SET created_utc = NULL WHERE uuid = :uuid"),
+        {"uuid": forecast_value.uuid},
+    )
+    db_session.commit()
+
+    # the row without a created_utc is not updated, and does not stop the backfill finishing
+    n_rows = backfill_horizon_minutes(session=db_session, batch_size=1, sleep_seconds=0)
+    assert sum(n_rows.values()) == n_forecast_values - 1
+    assert is_horizon_minutes_backfilled(session=db_session, model=ForecastValueSQL)
+
+
+def test_is_horizon_minutes_backfilled_expires(db_session):
+    with freeze_time("2023-01-03 12:00:00") as frozen_time:
+        make_forecast_values_without_horizon(db_session)
+        start_datetime = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        assert not is_horizon_minutes_backfilled(
+            session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+        )
+
+        # filled by another process, so this process does not know until the check expires
+        db_session.execute(
+            text(
+                "UPDATE forecast_value SET horizon_minutes = "
+                "EXTRACT(EPOCH FROM target_time - created_utc) / 60"
+            )
+        )
+        db_session.commit()
+        assert not is_horizon_minutes_backfilled(
+            session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+        )
+
+        frozen_time.tick(HORIZON_MINUTES_BACKFILLED_TTL + timedelta(seconds=1))
+        assert is_horizon_minutes_backfilled(
+            session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+        )
+
+
+@freeze_time("2023-01-03 12:00:00")
+def test_get_forecast_values_horizon_rounded(db_session):
+    """horizon_minutes is rounded, but the same rows are read as with the interval filter"""
+    make_forecast_values_without_horizon(db_session)
+    forecast_value = db_session.query(ForecastValueSQL).first()
+    db_session.execute(
+        text(
+            "UPDATE forecast_value "
+            "SET created_utc = target_time - interval '59 minutes 40 seconds' WHERE uuid = :uuid"
+        ),
+        {"uuid": forecast_value.uuid},
+    )
+    db_session.commit()
+    start_datetime = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    forecast_values_before = get_forecast_values(
+        session=db_session, forecast_horizon_minutes=60, start_datetime=start_datetime
+    )
+    assert forecast_value.uuid not in [f.uuid for f in forecast_values_before]
+
+    # the row has a horizon of 59 minutes 40 seconds, which is rounded to 60 minutes
+    backfill_horizon_minutes(session=db_session, sleep_seconds=0)
+    db_session.refresh(forecast_value)
+    assert forecast_value.horizon_minutes == 60
+    assert is_horizon_minutes_backfilled(
+        session=db_session, model=ForecastValueSQL, start_datetime=start_datetime
+    )
+
+    forecast_values_after = get_forecast_values(
+        session=db_session, forecast_horizon_minutes=60, start_datetime=start_datetime
+    )
+    assert [f.uuid for f in forecast_values_after] == [f.uuid for f in forecast_values_before]
+
+
+def test_horizon_minutes_backfilled_by_database(db_session):
+    make_forecast_values_without_horizon(db_session)
+    url = str(db_session.get_bind().engine.url)
+    horizon_minutes_backfilled[
+        ("postgresql://other", ForecastValueSQL.__tablename__, None, None)
+    ] = (
+        True,
+        None,
+    )
+
+    # the check of another database is not used
+    assert not is_horizon_minutes_backfilled(session=db_session, model=ForecastValueSQL)
+    assert (url, ForecastValueSQL.__tablename__, None, None) in horizon_minutes_backfilled
+
+    # only the checks of this database are cleared
+    clear_horizon_minutes_backfilled(session=db_session)
+    assert list(horizon_minutes_backfilled.keys()) == [
+        ("postgresql://other", ForecastValueSQL.__tablename__, None, None)
+    ]
+    clear_horizon_minutes_backfilled()
+    assert len(horizon_minutes_backfilled) == 0
@@ -1,10 +1,13 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import os
 import numpy as np
 import pytest
 from freezegun import freeze_time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 
-from nowcasting_datamodel.fake import N_FAKE_FORECASTS, make_fake_forecasts
+import nowcasting_datamodel.save.save
+from nowcasting_datamodel.fake import N_FAKE_FORECASTS, make_fake_forecast, make_fake_forecasts
 from nowcasting_datamodel.models.forecast import (
     ForecastSQL,
     ForecastValueLatestSQL,
@@ -12,7 +15,14 @@ from nowcasting_datamodel.models.forecast import (
     ForecastValueSQL,
 )
 from nowcasting_datamodel.models.pv import PVSystem, PVSystemSQL
-from nowcasting_datamodel.save.save import save, save_all_forecast_values_seven_days, save_pv_system
+from nowcasting_datamodel.save.report import SaveReport
+from nowcasting_datamodel.save.save import (
+    save,
+    save_all_forecast_values_seven_days,
+    save_in_chunks,
+    save_pv_system,
+)
+from nowcasting_datamodel.save.update import get_forecast_value_seven_days_partitions
 
 
 @freeze_time("2024-01-01 00:00:00")
@@ -178,3 +188,221 @@ def test_save_dont_use_adjuster(db_session, latest_me, dont_use_adjuster):
 
     forecast_values = db_session.query(ForecastValueSQL).all()
     assert np.max([fv.adjust_mw for fv in forecast_values]) == 0.0
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_use_copy(db_session, latest_me):
+    # Make sure save works where no forecast already exists
+    forecasts = make_fake_forecasts(
+        gsp_ids=range(0, 10),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    save(session=db_session, forecasts=forecasts, use_copy=True)
+
+    forecast_values = db_session.query(ForecastValueSQL).all()
+    assert np.max([fv.adjust_mw for fv in forecast_values]) != 0.0
+    assert forecast_values[0].uuid is not None
+    assert forecast_values[0].horizon_minutes is not None
+
+    # 10 forecast, + 10 historic ones
+    assert len(db_session.query(ForecastSQL).all()) == 20
+    assert len(forecast_values) == 10 * N_FAKE_FORECASTS
+    assert len(db_session.query(ForecastValueLatestSQL).all()) == 10 * N_FAKE_FORECASTS
+    assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 10 * N_FAKE_FORECASTS
+
+    # Make sure save works where forecast exists already
+    forecasts = make_fake_forecasts(gsp_ids=range(0, 10), session=db_session)
+    save(session=db_session, forecasts=forecasts, use_copy=True)
+
+    # 20 forecast, + 10 historic ones
+    assert len(db_session.query(ForecastSQL).all()) == 30
+    forecast_values = db_session.query(ForecastValueSQL).all()
+    assert len(forecast_values) == 20 * N_FAKE_FORECASTS
+    assert forecast_values[0].properties is not None
+    assert len(forecasts[0].forecast_values) == N_FAKE_FORECASTS
+    assert forecasts[0].forecast_values[0].forecast_id == forecasts[0].id
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_last_seven_days_in_database(db_session, latest_me):
+    forecasts = make_fake_forecasts(
+        gsp_ids=range(0, 10),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    save(session=db_session, forecasts=forecasts, save_last_seven_days_in_database=True)
+
+    forecast_values = db_session.query(ForecastValueSQL).all()
+    forecast_values_seven_days = db_session.query(ForecastValueSevenDaysSQL).all()
+    assert len(forecast_values_seven_days) == 10 * N_FAKE_FORECASTS
+    assert {fv.uuid for fv in forecast_values} == {fv.uuid for fv in forecast_values_seven_days}
+    assert forecast_values_seven_days[0].properties is not None
+    assert forecast_values_seven_days[0].horizon_minutes is not None
+
+    # save again, with remove non distinct, so only the new values that are different are kept
+    forecasts = make_fake_forecasts(gsp_ids=range(0, 10), session=db_session)
+    save(
+        session=db_session,
+        forecasts=forecasts,
+        save_last_seven_days_in_database=True,
+        remove_non_distinct_last_seven_days=True,
+    )
+    assert len(db_session.query(ForecastValueSQL).all()) == 20 * N_FAKE_FORECASTS
+    n_forecast_values_seven_days = len(db_session.query(ForecastValueSevenDaysSQL).all())
+    assert 10 * N_FAKE_FORECASTS < n_forecast_values_seven_days <= 20 * N_FAKE_FORECASTS
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_in_chunks(db_session, latest_me):
+    n_objects_in_session = []
+
+    def generate_forecasts():
+        for gsp_id in range(0, 10):
+            n_objects_in_session.append(len(db_session.identity_map) + len(db_session.new))
+            yield make_fake_forecast(
+                gsp_id=gsp_id,
+                session=db_session,
+                t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            )
+
+    n_forecasts = save_in_chunks(forecasts=generate_forecasts(), session=db_session, chunk_size=3)
+    assert n_forecasts == 10
+
+    # the session is cleared after each chunk
+    assert n_objects_in_session[3] == 0
+    assert n_objects_in_session[6] == 0
+    assert n_objects_in_session[9] == 0
+    assert len(db_session.identity_map) == 0
+
+    # 10 forecast, + 10 historic ones
+    assert len(db_session.query(ForecastSQL).all()) == 20
+    assert len(db_session.query(ForecastValueSQL).all()) == 10 * N_FAKE_FORECASTS
+    assert len(db_session.query(ForecastValueLatestSQL).all()) == 10 * N_FAKE_FORECASTS
+    assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 10 * N_FAKE_FORECASTS
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_in_chunks_two_models(db_session, latest_me):
+    def generate_forecasts():
+        for model_name in ["fake_model", "fake_model_2"]:
+            for gsp_id in range(0, 3):
+                yield make_fake_forecast(
+                    gsp_id=gsp_id,
+                    session=db_session,
+                    t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    model_name=model_name,
+                )
+
+    n_forecasts = save_in_chunks(forecasts=generate_forecasts(), session=db_session, chunk_size=4)
+    assert n_forecasts == 6
+
+    # the latest values are saved for both models
+    forecast_values_latest = db_session.query(ForecastValueLatestSQL).all()
+    assert len(forecast_values_latest) == 6 * N_FAKE_FORECASTS
+    model_ids = [forecast_value.model_id for forecast_value in forecast_values_latest]
+    assert len(set(model_ids)) == 2
+    assert model_ids.count(model_ids[0]) == 3 * N_FAKE_FORECASTS
+
+
+def test_save_in_chunks_chunk_size(db_session):
+    with pytest.raises(ValueError):
+        save_in_chunks(forecasts=[], session=db_session, chunk_size=0)
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_partitions_kept_if_save_fails(db_session, latest_me, monkeypatch):
+    forecasts = make_fake_forecasts(
+        gsp_ids=range(0, 2),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+    def save_all_forecast_values_seven_days(*args, **kwargs):
+        raise ValueError("save failed")
+
+    monkeypatch.setattr(
+        nowcasting_datamodel.save.save,
+        "save_all_forecast_values_seven_days",
+        save_all_forecast_values_seven_days,
+    )
+    with pytest.raises(ValueError):
+        save(session=db_session, forecasts=forecasts)
+    db_session.rollback()
+
+    # the partitions were committed before the seven days values were saved
+    partitions = get_forecast_value_seven_days_partitions(session=db_session)
+    assert date(2024, 1, 1) in partitions
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_save_report(db_session, latest_me):
+    forecasts = make_fake_forecasts(
+        gsp_ids=range(0, 10),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    report = save(session=db_session, forecasts=forecasts, report=True, batch_update_latest=True)
+
+    stages = {stage["name"]: stage for stage in report["stages"]}
+    assert list(stages.keys()) == [
+        "adjuster",
+        "insert_forecasts",
+        "update_latest",
+        "make_last_seven_days_partitions",
+        "insert_last_seven_days",
+        "remove_old_last_seven_days",
+    ]
+    assert stages["insert_forecasts"]["rows"] == 10 * N_FAKE_FORECASTS
+    assert stages["update_latest"]["rows"] == 10 * N_FAKE_FORECASTS
+    assert stages["update_latest"]["rows_skipped"] == 0
+    for stage in stages.values():
+        assert stage["seconds"] >= 0
+        assert stage["statements"] > 0
+    assert report["total_seconds"] >= 0
+
+    # no report by default
+    forecasts = make_fake_forecasts(gsp_ids=range(0, 10), session=db_session)
+    assert save(session=db_session, forecasts=forecasts) is None
+
+
+def test_save_report_does_not_begin_a_transaction(db_session):
+    session = Session(db_session.get_bind().engine)
+    save_report = SaveReport(session=session)
+
+    with save_report.stage("nothing") as stage:
+        pass
+    assert not session.in_transaction()
+    assert stage["statements"] == 0
+
+    # the connection is counted, once the session begins a transaction in the stage
+    with save_report.stage("select") as stage:
+        session.execute(text("SELECT 1"))
+    assert stage["statements"] == 1
+
+    # the session is already in a transaction before this stage
+    with save_report.stage("select_again") as stage:
+        session.execute(text("SELECT 2"))
+    assert stage["statements"] == 1
+    session.close()
+
+
+def test_save_report_only_counts_the_session(db_session):
+    save_report = SaveReport(session=db_session)
+    engine = db_session.get_bind().engine
+
+    with save_report.stage("select") as stage:
+        db_session.execute(text("SELECT 1"))
+        db_session.commit()
+        db_session.execute(text("SELECT 2"))
+
+        # another connection, like another thread saving at the same time
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 3"))
+
+    assert stage["statements"] == 2
+    assert len(save_report.connections) == 0
+
+    # the listeners are removed after the stage
+    db_session.execute(text("SELECT 4"))
+    assert save_report.stages[0]["statements"] == 2
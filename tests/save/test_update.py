@@ -1,7 +1,8 @@
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 import pytest
 from freezegun import freeze_time
+from sqlalchemy import text
 
 from nowcasting_datamodel.fake import (
     N_FAKE_FORECASTS,
@@ -16,11 +17,20 @@ from nowcasting_datamodel.models.forecast import (
     ForecastValueLatestSQL,
     ForecastValueSQL,
 )
+from nowcasting_datamodel.save.bulk import make_forecast_value_rows
 from nowcasting_datamodel.save.update import (
     add_forecast_last_7_days_and_remove_old_data,
     change_forecast_value_to_forecast_last_7_days,
+    drop_forecast_value_seven_days_partitions,
+    get_forecast_value_seven_days_partitions,
+    make_forecast_value_seven_days_partitions,
+    remove_non_distinct_forecast_values,
     update_all_forecast_latest,
+    update_all_forecast_latest_from_rows,
     update_forecast_latest,
+    update_forecast_value_seven_days_partitions,
+    upsert,
+    upsert_in_batches,
 )
 
 
@@ -128,6 +138,184 @@ def test_update_all_forecast_latest(db_session):
     assert num_rows == 10 * N_FAKE_FORECASTS
 
 
+@freeze_time("2024-01-01 00:00:00")
+def test_update_all_forecast_latest_batch(db_session):
+    today_forecasts = make_fake_forecasts(
+        gsp_ids=list(range(0, 10)),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    today_update_forecasts = make_fake_forecasts(
+        gsp_ids=list(range(0, 10)),
+        session=db_session,
+        t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    old_forecasts = make_fake_forecasts(
+        gsp_ids=list(range(0, 10)),
+        t0_datetime_utc=datetime.now(timezone.utc) - timedelta(days=4),
+        session=db_session,
+    )
+
+    update_all_forecast_latest(forecasts=old_forecasts, session=db_session, batch=True)
+    update_all_forecast_latest(forecasts=today_forecasts, session=db_session, batch=True)
+    update_all_forecast_latest(
+        forecasts=today_update_forecasts, session=db_session, batch=True, batch_size=100
+    )
+
+    # Updated forecasts should replace today forecasts, old forecasts should be deleted
+    forecast_values_latest = db_session.query(ForecastValueLatestSQL).all()
+    assert len(forecast_values_latest) == 10 * N_FAKE_FORECASTS
+
+    # one historic forecast per gsp
+    forecasts_historic = db_session.query(ForecastSQL).filter(ForecastSQL.historic).all()
+    assert len(forecasts_historic) == 10
+
+    # values come from the last update
+    forecast_value_latest = [f for f in forecast_values_latest if f.gsp_id == 1][0]
+    forecast_value = [
+        f
+        for f in today_update_forecasts[1].forecast_values
+        if f.target_time == forecast_value_latest.target_time
+    ][0]
+    assert (
+        forecast_value_latest.expected_power_generation_megawatts
+        == forecast_value.expected_power_generation_megawatts
+    )
+
+
+def test_update_all_forecast_latest_from_rows_empty(db_session):
+    counts = update_all_forecast_latest_from_rows(session=db_session, forecasts_data=[])
+    assert counts == {"written": 0, "skipped": 0}
+    assert len(db_session.query(ForecastValueLatestSQL).all()) == 0
+
+
+@freeze_time("2024-01-01 00:00:00")
+def test_update_all_forecast_latest_from_rows_two_models(db_session):
+    forecasts = []
+    for model_name in ["fake_model", "fake_model_2"]:
+        forecasts += make_fake_forecasts(
+            gsp_ids=[0, 1],
+            session=db_session,
+            t0_datetime_utc=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            model_name=model_name,
+        )
+    db_session.add_all(forecasts)
+    db_session.flush()
+
+    forecasts_data = [
+        {
+            "gsp_id": forecast.location.gsp_id,
+            "location_id": forecast.location_id,
+            "model_id": forecast.model_id,
+            "model_name": forecast.model.name,
+            "input_data_last_updated_id": forecast.input_data_last_updated_id,
+            "rows": make_forecast_value_rows(
+                forecast_values=forecast.forecast_values, forecast_id=forecast.id
+            ),
+        }
+        for forecast in forecasts
+    ]
+    update_all_forecast_latest_from_rows(session=db_session, forecasts_data=forecasts_data)
+
+    # latest values for both models
+    forecast_values_latest = db_session.query(ForecastValueLatestSQL).all()
+    assert len(forecast_values_latest) == 4 * N_FAKE_FORECASTS
+
+    # one historic forecast per gsp and model
+    forecasts_historic = db_session.query(ForecastSQL).filter(ForecastSQL.historic).all()
+    assert len(forecasts_historic) == 4
+    assert {(f.location.gsp_id, f.model.name) for f in forecasts_historic} == {
+        (0, "fake_model"),
+        (1, "fake_model"),
+        (0, "fake_model_2"),
+        (1, "fake_model_2"),
+    }
+    for forecast_value_latest in forecast_values_latest:
+        forecast_historic = [
+            f for f in forecasts_historic if f.id == forecast_value_latest.forecast_id
+        ][0]
+        assert forecast_historic.model_id == forecast_value_latest.model_id
+
+
+def test_upsert_in_batches_duplicates(db_session):
+    rows = [
+        dict(gsp_id=1, target_time=datetime(2023, 1, 1), expected_power_generation_megawatts=1),
+        dict(gsp_id=1, target_time=datetime(2023, 1, 1), expected_power_generation_megawatts=2),
+        dict(gsp_id=2, target_time=datetime(2023, 1, 1), expected_power_generation_megawatts=3),
+    ]
+
+    upsert_in_batches(session=db_session, model=ForecastValueLatestSQL, rows=rows, batch_size=1)
+
+    forecast_values_latest = (
+        db_session.query(ForecastValueLatestSQL).order_by(ForecastValueLatestSQL.gsp_id).all()
+    )
+    assert len(forecast_values_latest) == 2
+    assert forecast_values_latest[0].expected_power_generation_megawatts == 2
+
+
+def test_upsert_skip_unchanged(db_session):
+    rows = [
+        dict(
+            gsp_id=gsp_id,
+            target_time=datetime(2023, 1, 1, tzinfo=timezone.utc),
+            expected_power_generation_megawatts=1,
+            properties={"10": 0.9},
+        )
+        for gsp_id in range(3)
+    ]
+
+    counts = upsert(
+        session=db_session, model=ForecastValueLatestSQL, rows=rows, skip_unchanged=True
+    )
+    assert counts == {"written": 3, "skipped": 0}
+
+    # nothing has changed
+    counts = upsert(
+        session=db_session, model=ForecastValueLatestSQL, rows=rows, skip_unchanged=True
+    )
+    assert counts == {"written": 0, "skipped": 3}
+
+    # change one value and one property
+    rows[0]["expected_power_generation_megawatts"] = 2
+    rows[1]["properties"] = {"10": 0.8}
+    counts = upsert_in_batches(
+        session=db_session, model=ForecastValueLatestSQL, rows=rows, skip_unchanged=True
+    )
+    assert counts == {"written": 2, "skipped": 1}
+
+    forecast_values_latest = (
+        db_session.query(ForecastValueLatestSQL).order_by(ForecastValueLatestSQL.gsp_id).all()
+    )
+    assert forecast_values_latest[0].expected_power_generation_megawatts == 2
+    assert forecast_values_latest[1].properties == {"10": 0.8}
+
+    # without skip_unchanged, all rows are written
+    counts = upsert(session=db_session, model=ForecastValueLatestSQL, rows=rows)
+    assert counts == {"written": 3, "skipped": 0}
+
+
+def test_update_all_forecast_latest_skip_unchanged(db_session):
+    forecasts = make_fake_forecasts(
+        gsp_ids=range(0, 3), session=db_session, t0_datetime_utc=datetime.now(tz=timezone.utc)
+    )
+    db_session.add_all(forecasts)
+
+    counts = update_all_forecast_latest(
+        session=db_session, forecasts=forecasts, batch=True, skip_unchanged=True
+    )
+    assert counts == {"written": 3 * N_FAKE_FORECASTS, "skipped": 0}
+
+    counts = update_all_forecast_latest(
+        session=db_session, forecasts=forecasts, batch=True, skip_unchanged=True
+    )
+    assert counts == {"written": 0, "skipped": 3 * N_FAKE_FORECASTS}
+
+    counts = update_all_forecast_latest(
+        session=db_session, forecasts=forecasts, skip_unchanged=True
+    )
+    assert counts == {"written": 0, "skipped": 3 * N_FAKE_FORECASTS}
+
+
 def test_update_one_gsp_wtih_time_step(db_session):
     with freeze_time("2023-01-01") as f:
         db_session.query(ForecastValueSQL).delete()
@@ -351,3 +539,111 @@ def test_forecast_last_7_days_old_data(db_session):
     )
 
     assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 0
+
+
+def test_remove_non_distinct_forecast_values(db_session):
+    now = datetime.now(tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    forecast = make_fake_forecasts(gsp_ids=[1], session=db_session, n_fake_forecasts=0)[0]
+
+    forecast_values = []
+    for i in range(3):
+        for target_time in [now, now + timedelta(minutes=30)]:
+            forecast_values.append(
+                ForecastValueSevenDaysSQL(
+                    target_time=target_time,
+                    expected_power_generation_megawatts=1,
+                    forecast=forecast,
+                    created_utc=now + timedelta(minutes=i),
+                )
+            )
+    # this one is distinct, so it is kept
+    forecast_values.append(
+        ForecastValueSevenDaysSQL(
+            target_time=now, expected_power_generation_megawatts=2, forecast=forecast
+        )
+    )
+    db_session.add_all(forecast_values)
+    db_session.commit()
+
+    # only look at the first target time
+    remove_non_distinct_forecast_values(
+        session=db_session, start_datetime=now - timedelta(days=1), target_times=[now]
+    )
+    assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 2 + 3
+
+    # look at all target times
+    remove_non_distinct_forecast_values(session=db_session, start_datetime=now - timedelta(days=1))
+    forecast_values = (
+        db_session.query(ForecastValueSevenDaysSQL)
+        .filter(ForecastValueSevenDaysSQL.expected_power_generation_megawatts == 1)
+        .all()
+    )
+    assert len(forecast_values) == 2
+    assert forecast_values[0].created_utc == now
+    assert forecast_values[1].created_utc == now
+
+
+def test_update_forecast_value_seven_days_partitions(db_session):
+    now = datetime(2024, 6, 10, 12, tzinfo=timezone.utc)
+
+    # this value is added before the partition exists, so it goes in the default partition
+    db_session.add(
+        ForecastValueSevenDaysSQL(target_time=now, expected_power_generation_megawatts=1)
+    )
+    db_session.flush()
+
+    update_forecast_value_seven_days_partitions(session=db_session, now=now, make_days_ahead=2)
+
+    partitions = get_forecast_value_seven_days_partitions(session=db_session)
+    assert sorted(day for day in partitions.keys() if day.year == 2024) == [
+        date(2024, 6, 3) + timedelta(days=i) for i in range(7 + 2 + 1)
+    ]
+    partition_name = "forecast_value_last_seven_days_2024_06_10"
+    n_values = db_session.execute(text(f"SELECT COUNT(*) FROM {partition_name}")).scalar()
+    assert n_values == 1
+
+    # a week later, the old partitions are dropped and new ones are made
+    db_session.add(
+        ForecastValueSevenDaysSQL(
+            target_time=now + timedelta(days=7), expected_power_generation_megawatts=1
+        )
+    )
+    update_forecast_value_seven_days_partitions(
+        session=db_session, now=now + timedelta(days=7), make_days_ahead=2
+    )
+
+    partitions = get_forecast_value_seven_days_partitions(session=db_session)
+    assert sorted(day for day in partitions.keys() if day.year == 2024) == [
+        date(2024, 6, 10) + timedelta(days=i) for i in range(7 + 2 + 1)
+    ]
+    assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 2
+
+    update_forecast_value_seven_days_partitions(
+        session=db_session, now=now + timedelta(days=8), make_days_ahead=2
+    )
+    assert len(db_session.query(ForecastValueSevenDaysSQL).all()) == 1
+
+
+def test_make_forecast_value_seven_days_partition_again(db_session):
+    day = date(2024, 6, 10)
+    partition_name = "forecast_value_last_seven_days_2024_06_10"
+
+    make_forecast_value_seven_days_partitions(session=db_session, days=[day])
+    drop_forecast_value_seven_days_partitions(
+        session=db_session, datetime_limit=datetime(2024, 6, 11, tzinfo=timezone.utc)
+    )
+    assert day not in get_forecast_value_seven_days_partitions(session=db_session)
+
+    # the partition can be made again in the same process
+    make_forecast_value_seven_days_partitions(session=db_session, days=[day])
+    assert get_forecast_value_seven_days_partitions(session=db_session)[day] == partition_name
+    assert "2024_06_10" not in ForecastValueSevenDaysSQL.partitions
+
+    db_session.add(
+        ForecastValueSevenDaysSQL(
+            target_time=datetime(2024, 6, 10, 12, tzinfo=timezone.utc),
+            expected_power_generation_megawatts=1,
+        )
+    )
+    db_session.flush()
+    assert db_session.execute(text(f"SELECT COUNT(*) FROM {partition_name}")).scalar() == 1
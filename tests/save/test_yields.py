@@ -0,0 +1,46 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from nowcasting_datamodel.models.gsp import GSPYieldSQL
+from nowcasting_datamodel.save.yields import get_gsp_yield_partitions, update_gsp_yield_partitions
+
+
+def test_update_gsp_yield_partitions(db_session):
+    now = datetime(2030, 1, 15, 12, tzinfo=timezone.utc)
+
+    # only the default partition is made with the table, so this value goes in it
+    db_session.add(
+        GSPYieldSQL(datetime_utc=datetime(2030, 2, 1, 12), solar_generation_kw=1, regime="in-day")
+    )
+    db_session.flush()
+    assert db_session.execute(text("SELECT COUNT(*) FROM gsp_yield_default")).scalar() == 1
+
+    update_gsp_yield_partitions(session=db_session, now=now, make_months_ahead=2)
+
+    partitions = get_gsp_yield_partitions(session=db_session)
+    assert sorted(partitions.keys()) == [date(2030, 1, 1), date(2030, 2, 1), date(2030, 3, 1)]
+    assert db_session.execute(text("SELECT COUNT(*) FROM gsp_yield_2030_02")).scalar() == 1
+    assert db_session.execute(text("SELECT COUNT(*) FROM gsp_yield_default")).scalar() == 0
+    assert len(db_session.query(GSPYieldSQL).all()) == 1
+
+    # running again does not make anything new
+    update_gsp_yield_partitions(session=db_session, now=now, make_months_ahead=2)
+    assert get_gsp_yield_partitions(session=db_session) == partitions
+
+
+def test_update_gsp_yield_partitions_for_the_default_partition(db_session):
+    now = datetime(2030, 1, 15, 12, tzinfo=timezone.utc)
+
+    # an old value, before the months that are made from now
+    db_session.add(
+        GSPYieldSQL(datetime_utc=datetime(2022, 6, 1, 12), solar_generation_kw=1, regime="in-day")
+    )
+    db_session.flush()
+
+    update_gsp_yield_partitions(session=db_session, now=now, make_months_ahead=0)
+
+    partitions = get_gsp_yield_partitions(session=db_session)
+    assert sorted(partitions.keys()) == [date(2022, 6, 1), date(2030, 1, 1)]
+    assert db_session.execute(text("SELECT COUNT(*) FROM gsp_yield_2022_06")).scalar() == 1
+    assert db_session.execute(text("SELECT COUNT(*) FROM gsp_yield_default")).scalar() == 0
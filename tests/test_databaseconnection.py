@@ -1,7 +1,13 @@
+import threading
 from typing import List
 
+import pytest
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import InternalError, TimeoutError
+
+from nowcasting_datamodel.connection import DatabaseConnection
 from nowcasting_datamodel.fake import N_FAKE_FORECASTS
-from nowcasting_datamodel.models import ForecastSQL
+from nowcasting_datamodel.models import ForecastSQL, LocationSQL
 
 
 def test_get_session(db_connection):
@@ -20,3 +26,141 @@ def test_read_forecast_one(db_session, forecast_sql):
     assert len(forecasts) == 1
     assert forecast_sql[0] == forecasts[0]
     assert len(forecasts[0].forecast_values) == N_FAKE_FORECASTS
+
+
+def make_replica_urls(url: str, n_replicas: int) -> List[str]:
+    """Make replica urls for the test database, with different application names"""
+    separator = "&" if "?" in url else "?"
+    return [f"{url}{separator}application_name=replica_{i}" for i in range(n_replicas)]
+
+
+def test_get_session_replica(db_connection):
+    replica_urls = make_replica_urls(db_connection.url, 2)
+    connection = DatabaseConnection(url=db_connection.url, echo=False, replica_urls=replica_urls)
+
+    # the replicas are used in turn
+    application_names = []
+    for _ in range(3):
+        with connection.get_session(replica=True) as session:
+            application_names.append(session.get_bind().url.query["application_name"])
+            assert session.query(LocationSQL).count() == 0
+    assert application_names == ["replica_0", "replica_1", "replica_0"]
+
+    # the sessions are read only
+    with connection.get_session(replica=True) as session:
+        session.add(LocationSQL(gsp_id=1))
+        with pytest.raises(InternalError, match="read-only transaction"):
+            session.commit()
+
+
+def test_get_session_replica_lag(db_connection):
+    replica_urls = make_replica_urls(db_connection.url, 1)
+    connection = DatabaseConnection(
+        url=db_connection.url, echo=False, replica_urls=replica_urls, max_replica_lag_seconds=-1
+    )
+
+    # the replica is too far behind, so a read only session for the primary is used
+    with connection.get_session(replica=True) as session:
+        assert session.get_bind().url == connection.engine.url
+        session.add(LocationSQL(gsp_id=1))
+        with pytest.raises(InternalError, match="read-only transaction"):
+            session.commit()
+
+
+def test_get_session_replica_not_available(db_connection):
+    replica_url = make_url(db_connection.url).set(database="not_a_database")
+    replica_urls = [replica_url.render_as_string(hide_password=False)]
+    connection = DatabaseConnection(url=db_connection.url, echo=False, replica_urls=replica_urls)
+
+    assert connection.get_replica_lag(0) == float("inf")
+    with connection.get_session(replica=True) as session:
+        assert session.get_bind().url == connection.engine.url
+
+
+def test_echo_default(db_connection):
+    connection = DatabaseConnection(url=db_connection.url)
+    assert connection.engine.echo is False
+
+
+def test_pool_options(db_connection):
+    connection = DatabaseConnection(
+        url=db_connection.url,
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.1,
+        pool_pre_ping=True,
+    )
+    pool = connection.engine.pool
+    assert pool.size() == 2
+    assert pool.timeout() == 0.1
+
+    # the pool and the overflow can be checked out, and then the pool is full
+    sa_connections = [connection.engine.connect() for _ in range(3)]
+    assert pool.checkedout() == 3
+    assert pool.overflow() == 1
+    with pytest.raises(TimeoutError):
+        connection.engine.connect()
+
+    # connections closed by the database are replaced, when they are checked out
+    with db_connection.engine.connect() as other_connection:
+        for sa_connection in sa_connections:
+            pid = sa_connection.execute(text("SELECT pg_backend_pid()")).scalar()
+            sa_connection.close()
+            other_connection.execute(text(f"SELECT pg_terminate_backend({pid})"))
+
+    with connection.engine.connect() as sa_connection:
+        assert sa_connection.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_pool_recycle(db_connection):
+    def get_n_connects(pool_recycle=None) -> int:
+        connection = DatabaseConnection(
+            url=db_connection.url, pool_size=1, pool_recycle=pool_recycle
+        )
+        for _ in range(3):
+            with connection.engine.connect() as sa_connection:
+                sa_connection.execute(text("SELECT 1"))
+        return connection.get_pool_metrics()["primary"]["connects"]
+
+    # the connection is older than 'pool_recycle', so new ones are made
+    assert get_n_connects() == 1
+    assert get_n_connects(pool_recycle=0) > 1
+
+
+def test_pool_metrics(db_connection):
+    connection = DatabaseConnection(
+        url=db_connection.url, pool_size=1, max_overflow=0, pool_timeout=0.2
+    )
+
+    with connection.engine.connect() as sa_connection:
+        sa_connection.execute(text("SELECT 1"))
+
+        # the pool is full, so this waits, and times out
+        with pytest.raises(TimeoutError):
+            connection.engine.connect()
+
+        # this waits until the other connection is returned
+        timer = threading.Timer(0.05, sa_connection.close)
+        timer.start()
+        with connection.engine.connect() as sa_connection_2:
+            sa_connection_2.invalidate()
+        timer.join()
+
+    metrics = connection.get_pool_metrics()["primary"]
+    assert metrics["connects"] == 1
+    assert metrics["checkouts"] == 2
+    assert metrics["checkins"] == 2
+    assert metrics["invalidations"] == 1
+    assert metrics["waits"] == 2
+    assert metrics["timeouts"] == 1
+    assert metrics["wait_seconds"] >= 0.25
+    assert metrics["max_wait_seconds"] >= 0.2
+    assert metrics["pool_size"] == 1
+    assert metrics["checked_out"] == 0
+
+    # the metrics are kept when the pool is recreated
+    connection.engine.dispose()
+    assert connection.get_pool_metrics()["primary"]["checkouts"] == 2
+    with connection.get_session() as session:
+        session.execute(text("SELECT 1"))
+    assert connection.get_pool_metrics()["primary"]["checkouts"] == 3